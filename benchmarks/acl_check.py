@@ -0,0 +1,78 @@
+# coding=utf-8
+"""Measures AclMixin._check_perform_action for users holding many permissions: permission name formatted on every
+request and looked up in a list (previous implementation), name precomputed per route with list, frozenset and bit mask.
+
+Usage: python benchmarks/acl_check.py [--permissions 500] [--number 200000] [--repeat 5]
+"""
+import sys
+import tempfile
+import timeit
+from argparse import ArgumentParser
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from tornado import httputil  # noqa: E402
+from tornado.web import url  # noqa: E402
+
+from maio.core.configs import AppConfig  # noqa: E402
+from maio.core.handlers import AclMixin, RestHandler  # noqa: E402
+from maio.core.restapi import RestAPIApp  # noqa: E402
+
+
+class _Connection:
+    def set_close_callback(self, callback):
+        pass
+
+
+class _Handler(AclMixin, RestHandler):
+    async def get(self):
+        pass
+
+
+class _LegacyHandler(_Handler):
+    def _check_perform_action(self, method, available_permissions):
+        if not self._permission:
+            return True
+        real_perm = self.full_permission_name(self._permission, method)
+
+        if not available_permissions or (real_perm and real_perm not in available_permissions):
+            self._access_denied_exception(real_perm)
+
+
+def main():
+    parser = ArgumentParser(description='AclMixin permission check benchmark')
+    parser.add_argument('--permissions', type=int, default=500)
+    parser.add_argument('--number', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    config = AppConfig(tempfile.gettempdir())
+    config.logging.output_console = False
+    routes = [url(f'/resource{i}', _Handler, {'permission': f'resource{i}'}) for i in range(args.permissions)]
+    app = RestAPIApp(config, {r'/.*': routes}, [])
+    request = httputil.HTTPServerRequest('GET', '/resource0', connection=_Connection())
+
+    # the user holds every permission, the one checked is at the end of the list
+    kwargs = routes[-1].kwargs
+    user_permissions = sorted(app.acl_list, key=lambda name: name == routes[-1].kwargs['permission'] + '_fetch')
+    handler = _Handler(app, request, **kwargs)
+    legacy = _LegacyHandler(app, request, **{k: v for k, v in kwargs.items() if k != 'acl'})
+
+    print(f'user permissions: {len(user_permissions)}, application permissions: {len(app.permission_index)}')
+    cases = (
+        ('format name + list', legacy, user_permissions),
+        ('precomputed name + list', handler, user_permissions),
+        ('precomputed name + frozenset', handler, frozenset(user_permissions)),
+        ('bit mask', handler, handler.permission_mask(user_permissions)),
+    )
+    base_time = None
+    for name, instance, permissions in cases:
+        check = instance._check_perform_action
+        best = min(timeit.repeat(lambda: check('GET', permissions), number=args.number, repeat=args.repeat)) / args.number
+        base_time = base_time or best
+        print(f'  {name:<30} {best * 1e9:>10.1f} ns/check  x{base_time / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Measures DI.get of a registered service (what every MongoRepository query does) against the previous implementation
+converting the key with str() and checking callable() on every lookup, and against a plain attribute access.
+
+Usage: python benchmarks/di_lookup.py [--number 1000000] [--repeat 5]
+"""
+import sys
+import timeit
+from argparse import ArgumentParser
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from maio.core.di import DI, NoBinding, SINGLETON  # noqa: E402
+
+
+class _Connection:
+    pass
+
+
+class _LegacyDI:
+    _container = {}
+
+    @classmethod
+    def get(cls, name):
+        name = str(name)
+        container = cls._container.get(name, NoBinding)
+
+        if container == NoBinding:
+            raise RuntimeError(f"No binding defined for name [{name}]")
+        else:
+            if isinstance(container, type) or callable(container):
+                return container()
+            else:
+                return container
+
+
+class _Holder:
+    connection = _Connection()
+
+
+def main():
+    parser = ArgumentParser(description='DI lookup benchmark')
+    parser.add_argument('--number', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    connection = _Holder.connection
+    _LegacyDI._container['mongo'] = connection
+    _LegacyDI._container[str(_Connection)] = connection
+    DI.add('mongo', connection)
+    DI.add(_Connection, _Connection, SINGLETON)
+
+    cases = (
+        ('legacy str key', lambda: _LegacyDI.get('mongo')),
+        ('legacy class key', lambda: _LegacyDI.get(_Connection)),
+        ('DI.get str key', lambda: DI.get('mongo')),
+        ('DI.get class key', lambda: DI.get(_Connection)),
+        ('attribute access', lambda: _Holder.connection),
+    )
+    base_time = None
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat)) / args.number
+        base_time = base_time or best
+        print(f'  {name:<20} {best * 1e9:>8.1f} ns/lookup  x{base_time / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Measures per-request RestHandler setup cost (constructor + clear()) with cached header templates
+against the previous implementation which rebuilt all default headers on every request.
+
+Usage: python benchmarks/handler_setup.py [--number 20000] [--repeat 5]
+"""
+import sys
+import tempfile
+import time
+import timeit
+from argparse import ArgumentParser
+from http import HTTPStatus
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from tornado import httputil  # noqa: E402
+
+from maio.core.configs import AppConfig  # noqa: E402
+from maio.core.handlers import RestHandler  # noqa: E402
+from maio.core.restapi import RestAPIApp  # noqa: E402
+
+
+class _Connection:
+    def set_close_callback(self, callback):
+        pass
+
+
+class _Handler(RestHandler):
+    pass
+
+
+class _LegacyHandler(RestHandler):
+    def clear(self):
+        self._headers = httputil.HTTPHeaders({
+            'Server': self.config.web.get('name'),
+            'Content-Type': 'application/json; charset=UTF-8',
+            'Date': httputil.format_timestamp(time.time()),
+        })
+        self.set_default_headers()
+        self._write_buffer = []
+        self._status_code = HTTPStatus.OK.value
+        self._reason = HTTPStatus.OK.value
+
+    def set_default_headers(self):
+        if self.config.cors.get('allowed_origin'):
+            self._build_cors_origin(self.config.cors.get('allowed_origin'))
+        if self.config.cors.get('allowed_headers'):
+            self.set_header('Access-Control-Allow-Headers', ', '.join(self.config.cors.get('allowed_headers') + self.CORS_HEADERS))
+
+        self.set_header('Access-Control-Max-Age', 86400)
+        self.set_header('Access-Control-Allow-Credentials', 'true')
+
+    def _build_cors_origin(self, allow_origin=None):
+        cors = None
+        if allow_origin == '*':
+            cors = '*'
+        elif self.request.headers.get('Origin') and isinstance(allow_origin, (tuple, set, list)):
+            o = self.request.headers.get('Origin')
+            cors = o if o in allow_origin else allow_origin[0]
+
+        if cors:
+            self.set_header('Access-Control-Allow-Origin', cors)
+
+
+def main():
+    parser = ArgumentParser(description='RestHandler setup benchmark')
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    request = httputil.HTTPServerRequest('GET', '/bench', headers=httputil.HTTPHeaders({'Origin': 'http://localhost'}), connection=_Connection())
+
+    for origin in ('*', ['http://localhost', 'http://example.com']):
+        config = AppConfig(tempfile.gettempdir())
+        config.logging.output_console = False
+        config.cors.allowed_origin = origin
+        app = RestAPIApp(config, {}, [])
+        assert dict(_Handler(app, request)._headers, Date='') == dict(_LegacyHandler(app, request)._headers, Date='')
+
+        print(f'\nallowed_origin = {origin!r}')
+        base_time = None
+        for name, clazz in (('rebuild on every request', _LegacyHandler), ('cached template', _Handler)):
+            best = min(timeit.repeat(lambda: clazz(app, request), number=args.number, repeat=args.repeat)) / args.number
+            base_time = base_time or best
+            print(f'  {name:<26} {best * 1e6:>8.2f} us/request  x{base_time / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
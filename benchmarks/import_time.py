@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Measures cold import time of maio modules with ``python -X importtime`` and fails when it exceeds the budget.
+
+Every round imports the module in a fresh interpreter. Import time is the sum of self times of modules the interpreter
+does not load on its own (``python -c pass``), the best of ``--repeat`` rounds is compared with ``--budget-ms``.
+Modules listed by ``--forbid`` are optional dependencies imported on first use, loading any of them fails the check too.
+
+Usage: python benchmarks/import_time.py [--module maio.core.restapi] [--repeat 7] [--budget-ms 200] [--top 15]
+"""
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os import path
+from typing import Dict, List, Tuple
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+FORBIDDEN = ('gridfs', 'pymongo', 'bson', 'motor', 'cProfile', 'pstats', 'concurrent.futures.process')
+
+
+def _import_times(code: str) -> List[Tuple[str, int, int]]:
+    """Returns (module, self us, cumulative us) of every module imported while running ``code``"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (ROOT, env.get('PYTHONPATH'))))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            universal_newlines=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def main():
+    parser = ArgumentParser(description='Import time budget check')
+    parser.add_argument('--module', default='maio.core.restapi')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=200.0)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--forbid', nargs='*', default=FORBIDDEN)
+    args = parser.parse_args()
+
+    startup = {name for name, _, _ in _import_times('pass')}
+    best: Dict[str, Tuple[int, int]] = {}
+    best_total = None
+    for _ in range(args.repeat):
+        rows = [row for row in _import_times(f'import {args.module}') if row[0] not in startup]
+        total = sum(own for _, own, _ in rows)
+        if best_total is None or total < best_total:
+            best_total = total
+            best = {name: (own, cumulative) for name, own, cumulative in rows}
+
+    print(f'{args.module}: {best_total / 1000:.1f} ms in {len(best)} modules (best of {args.repeat}, budget {args.budget_ms:.0f} ms)')
+    print(f'  {"self ms":>8} {"cumulative ms":>14}  module')
+    for name, (own, cumulative) in sorted(best.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {own / 1000:>8.1f} {cumulative / 1000:>14.1f}  {name}')
+
+    failed = False
+    loaded = [name for name in args.forbid if name in best]
+    if loaded:
+        print(f'FAIL: optional dependencies imported eagerly: {", ".join(loaded)}')
+        failed = True
+    if best_total / 1000 > args.budget_ms:
+        print(f'FAIL: import takes {best_total / 1000:.1f} ms, budget is {args.budget_ms:.0f} ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
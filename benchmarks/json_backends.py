@@ -0,0 +1,87 @@
+# coding=utf-8
+"""Compares JSON backends used by RestHandler.return_ok on typical list endpoint payloads.
+
+Usage: python benchmarks/json_backends.py [--rows 50 500 5000] [--repeat 5]
+"""
+import json
+import sys
+import timeit
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import path
+from uuid import uuid4
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+
+from maio.core.data import CustomJsonEncoder, Document  # noqa: E402
+from maio.core.encoders import BACKEND_ORJSON, BACKEND_STDLIB, BACKEND_UJSON, _create_backend  # noqa: E402
+
+
+class _Address(Document):
+    __slots__ = ('uuid', 'city', 'street', 'country')
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.city = None
+        self.street = None
+        self.country = None
+
+
+def build_payload(rows: int):
+    now = datetime.utcnow()
+    data = []
+    for i in range(rows):
+        address = _Address.create()
+        address.city = 'Warszawa'
+        address.street = f'Marszałkowska {i}'
+        address.country = 'POL'
+        data.append({
+            'uuid': uuid4(),
+            'ownerId': ObjectId(),
+            'name': f'Item number {i}',
+            'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit </b>',
+            'price': i * 1.25,
+            'quantity': i,
+            'active': i % 2 == 0,
+            'tags': {'new', 'sale'},
+            'created': now - timedelta(minutes=i),
+            'address': address,
+        })
+    return {'status': 'OK', 'data': data, 'totalCount': rows}
+
+
+def _stdlib_baseline(payload):
+    return json.dumps(payload, cls=CustomJsonEncoder, ensure_ascii=False).replace("</", "<\\/").encode('utf-8')
+
+
+def main():
+    parser = ArgumentParser(description='JSON backend benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    backends = [('json.dumps (before)', _stdlib_baseline)]
+    for name in (BACKEND_STDLIB, BACKEND_ORJSON, BACKEND_UJSON):
+        backend = _create_backend(name)
+        if backend is None:
+            print(f'{name}: not installed, skipped')
+        else:
+            backends.append((name, lambda p, b=backend: b.dumps(p).replace(b"</", b"<\\/")))
+
+    for rows in args.rows:
+        payload = build_payload(rows)
+        expected = json.loads(_stdlib_baseline(payload))
+        number = max(1, 20000 // rows)
+        print(f'\n{rows} rows, {number} calls per run, best of {args.repeat}')
+        base_time = None
+        for name, fn in backends:
+            assert json.loads(fn(payload)) == expected, f'{name} output differs'
+            best = min(timeit.repeat(lambda: fn(payload), number=number, repeat=args.repeat)) / number
+            base_time = base_time or best
+            print(f'  {name:<22} {best * 1e6:>10.1f} us/call  x{base_time / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# coding=utf-8
+"""Measures requests per second of a single RestAPIApp worker with and without keep-alive connections.
+
+Server runs in a child process, clients are asyncio connections sending requests one after another, reconnecting for every
+request when the server closes the connection.
+
+Usage: python benchmarks/keep_alive.py [--requests 5000] [--clients 20] [--max-requests-per-connection 0]
+"""
+import asyncio
+import multiprocessing
+import socket
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from tornado.ioloop import IOLoop  # noqa: E402
+from tornado.web import url  # noqa: E402
+
+from maio.core.configs import AppConfig  # noqa: E402
+from maio.core.handlers import RestHandler  # noqa: E402
+from maio.core.restapi import RestAPIApp, RestHTTPServer  # noqa: E402
+
+
+class _PingHandler(RestHandler):
+    async def get(self):
+        self.return_ok({'pong': True})
+
+
+def _serve(sock: socket.socket, keep_alive: bool, max_requests: int) -> None:
+    # forked after asyncio.run() of the previous round closed the parent loop
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    config = AppConfig(tempfile.gettempdir())
+    config.logging.output_console = False
+    config.metrics.enabled = False
+    config.web.keep_alive = keep_alive
+    config.web.max_requests_per_connection = max_requests
+    app = RestAPIApp(config, {r'/.*': [url(r'/ping', _PingHandler)]}, [])
+    server = RestHTTPServer(app, **app.server_options())
+    server.add_sockets([sock])
+    IOLoop.current().start()
+
+
+async def _client(port: int, requests: int) -> int:
+    request = b'GET /ping HTTP/1.1\r\nHost: localhost\r\n\r\n'
+    reader = writer = None
+    connections = 0
+    for _ in range(requests):
+        if writer is None:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            connections += 1
+        writer.write(request)
+        head = await reader.readuntil(b'\r\n\r\n')
+        headers = dict(line.split(b': ', 1) for line in head.split(b'\r\n')[1:-2])
+        await reader.readexactly(int(headers[b'Content-Length']))
+        if headers.get(b'Connection', b'').lower() == b'close':
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+    return connections
+
+
+async def _run(port: int, requests: int, clients: int):
+    started = time.perf_counter()
+    connections = await asyncio.gather(*(_client(port, requests // clients) for _ in range(clients)))
+    return requests // clients * clients / (time.perf_counter() - started), sum(connections)
+
+
+def main():
+    parser = ArgumentParser(description='Keep-alive benchmark')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--max-requests-per-connection', type=int, default=0)
+    args = parser.parse_args()
+
+    base_rate = None
+    for name, keep_alive in (('no keep-alive', False), ('keep-alive', True)):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(2048)
+        sock.setblocking(False)
+        server = multiprocessing.Process(target=_serve, args=(sock, keep_alive, args.max_requests_per_connection), daemon=True)
+        server.start()
+        try:
+            rate, connections = asyncio.run(_run(sock.getsockname()[1], args.requests, args.clients))
+        finally:
+            server.terminate()
+            server.join()
+            sock.close()
+        base_rate = base_rate or rate
+        print(f'  {name:<14} {rate:>10.0f} req/s  {connections:>6} connections  x{rate / base_rate:.2f}')
+
+
+if __name__ == '__main__':
+    main()
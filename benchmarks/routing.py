@@ -0,0 +1,74 @@
+# coding=utf-8
+"""Measures route lookup of RestAPIApp with regex rules matched in order and with the trie router (``config.web.trie_router``).
+
+Routes are ``/resource<i>``, ``/resource<i>/(?P<id>[^/]+)`` and ``/resource<i>/(?P<id>[^/]+)/items``, looked up paths
+hit random routes of the table and a path not routed at all.
+
+Usage: python benchmarks/routing.py [--routes 50 500 5000] [--paths 200] [--repeat 5]
+"""
+import random
+import sys
+import tempfile
+import time
+import timeit
+from argparse import ArgumentParser
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from tornado import httputil  # noqa: E402
+
+from maio.core.configs import AppConfig  # noqa: E402
+from maio.core.handlers import RestHandler  # noqa: E402
+from maio.core.restapi import RestAPIApp  # noqa: E402
+from maio.core.routing import url  # noqa: E402
+
+
+class _Connection:
+    def set_close_callback(self, callback):
+        pass
+
+
+class _Handler(RestHandler):
+    async def get(self, id=None):
+        pass
+
+
+_PATTERNS = (r'/resource{}', r'/resource{}/(?P<id>[^/]+)', r'/resource{}/(?P<id>[^/]+)/items')
+_PATHS = ('/resource{}', '/resource{}/5f1a', '/resource{}/5f1a/items')
+
+
+def _build(routes: int, trie: bool) -> RestAPIApp:
+    config = AppConfig(tempfile.gettempdir())
+    config.logging.output_console = False
+    config.web.trie_router = trie
+    # handlers named after routes, reverse routing requires unique names
+    handlers = [url(_PATTERNS[i % 3].format(i // 3), type(f'_Handler{i}', (_Handler,), {})) for i in range(routes)]
+    return RestAPIApp(config, {r'/.*': handlers}, [])
+
+
+def main():
+    parser = ArgumentParser(description='Route lookup benchmark')
+    parser.add_argument('--routes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--paths', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    for routes in args.routes:
+        paths = [_PATHS[i % 3].format(i // 3) for i in (rnd.randrange(routes) for _ in range(args.paths))] + ['/missing/route']
+        requests = [httputil.HTTPServerRequest('GET', p, connection=_Connection()) for p in paths]
+        print(f'{routes} routes, {len(requests)} paths')
+        base_time = None
+        for name, trie in (('regex rules', False), ('trie', True)):
+            started = time.perf_counter()
+            app = _build(routes, trie)
+            build = time.perf_counter() - started
+            find = app.find_handler
+            best = min(timeit.repeat(lambda: [find(request) for request in requests], number=1, repeat=args.repeat)) / len(requests)
+            base_time = base_time or best
+            print(f'  {name:<12} {best * 1e6:>10.2f} us/lookup  app built in {build * 1e3:>8.1f} ms  x{base_time / best:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# coding=utf-8
+from typing import Dict, Iterable, List, Union
+
+
+class PermissionIndex:
+    """Assigns every permission name known to the application one bit of an int mask.
+
+    Permissions of a user converted once with `mask` are checked with a single ``&`` no matter how many of them the user has.
+    Names not known to the index are left out of the mask. Bits follow the sorted names of the current routing, so a mask
+    is only valid in the process that built it and must never be stored, adding or removing a route moves the bits.
+    """
+    __slots__ = ('_bits', '_names')
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self._names = tuple(sorted(set(names)))
+        self._bits: Dict[str, int] = {name: 1 << position for position, name in enumerate(self._names)}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._bits
+
+    def bit(self, name: str) -> int:
+        return self._bits.get(name, 0)
+
+    def mask(self, permissions: Union[int, Iterable[str], None]) -> int:
+        if isinstance(permissions, bool):
+            raise TypeError('Permissions expected as names or mask, got bool')
+        if not permissions:
+            return 0
+        if isinstance(permissions, int):
+            return permissions
+        bits = self._bits
+        mask = 0
+        for name in permissions:
+            mask |= bits.get(name, 0)
+        return mask
+
+    def names(self, mask: int) -> List[str]:
+        return [name for position, name in enumerate(self._names) if mask >> position & 1]
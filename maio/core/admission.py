@@ -0,0 +1,81 @@
+# coding=utf-8
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from maio.core.metrics import REGISTRY as METRICS
+
+ROUTE_PARAMS = ('max_in_flight', 'queue_size', 'queue_timeout', 'retry_after')
+
+ADMISSION_DECISIONS = METRICS.counter('admission_decisions_total', 'Requests admitted, admitted after waiting or rejected by limiter', ('limiter', 'decision'))
+ADMISSION_WAIT = METRICS.histogram('admission_wait_seconds', 'Time requests waited for a free slot', ('limiter',), buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+
+
+class AdmissionLimiter:
+    """Limits requests processed at once by a worker, optionally letting a few of them wait for a free slot.
+
+    Released slot is handed over directly to the oldest waiting request, so waiting ones cannot be overtaken by new arrivals.
+    """
+    __slots__ = ('name', 'max_in_flight', 'queue_size', 'queue_timeout', 'retry_after', 'in_flight', '_waiters')
+
+    def __init__(self, name: str, max_in_flight: int, queue_size: int = 0, queue_timeout: float = 0, retry_after: int = 1) -> None:
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @classmethod
+    def from_params(cls, name: str, params: Dict[str, Any], defaults: Optional[Any] = None) -> 'AdmissionLimiter':
+        def param(key, default):
+            value = params.pop(key, None)
+            if value is None and defaults is not None:
+                value = getattr(defaults, key, None)
+            return default if value is None else value
+
+        return cls(name, param('max_in_flight', 0), param('queue_size', 0), param('queue_timeout', 0), param('retry_after', 1))
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def try_acquire(self) -> bool:
+        if self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            ADMISSION_DECISIONS.inc((self.name, 'admitted'))
+            return True
+        return False
+
+    async def wait(self) -> bool:
+        """Waits in the queue for a slot released by another request, to be called after `try_acquire` failed"""
+        if len(self._waiters) >= self.queue_size or self.queue_timeout <= 0:
+            ADMISSION_DECISIONS.inc((self.name, 'rejected'))
+            return False
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_DECISIONS.inc((self.name, 'rejected'))
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_WAIT.observe((self.name,), time.perf_counter() - started)
+
+        ADMISSION_DECISIONS.inc((self.name, 'queued'))
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # slot goes to the waiting request, in_flight stays the same
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
@@ -0,0 +1,143 @@
+# coding=utf-8
+import logging
+import time
+from collections import deque
+from contextvars import Context
+from datetime import timedelta
+from inspect import isawaitable
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Union
+
+from tornado.ioloop import IOLoop
+from tornado.locks import Event
+from tornado.util import TimeoutError
+
+from maio.core.data import VO
+from maio.core.di import ApiService
+from maio.core.log import LOG_MAIN
+from maio.core.metrics import REGISTRY as METRICS
+
+POLICY_REJECT = 'reject'
+POLICY_DROP_NEW = 'drop_new'
+POLICY_DROP_OLDEST = 'drop_oldest'
+
+BACKGROUND_TASKS = METRICS.counter('background_tasks_total', 'Background tasks by outcome', ('task', 'status'))
+BACKGROUND_TASK_DURATION = METRICS.histogram('background_task_duration_seconds', 'Background task run time', ('task',))
+BACKGROUND_TASKS_PENDING = METRICS.gauge('background_tasks_pending', 'Background tasks running or waiting in queue')
+
+
+class BackgroundQueueFullError(RuntimeError):
+    pass
+
+
+class BackgroundExecutorConfig(VO):
+    __slots__ = ('concurrency', 'queue_size', 'rejection_policy')
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.concurrency = 16
+        # tasks waiting for a free slot, the ones over the limit are handled according to rejection_policy
+        self.queue_size = 1000
+        # reject raises BackgroundQueueFullError, drop_new and drop_oldest drop a task and log a warning
+        self.rejection_policy = POLICY_REJECT
+        if config:
+            self.update_object(config)
+
+
+class _Task(NamedTuple):
+    name: str
+    fn: Callable
+    args: tuple
+    kwargs: Dict[str, Any]
+
+
+class BackgroundExecutor(ApiService):
+    """Runs fire-and-forget functions and coroutines on the IOLoop with limited concurrency.
+
+    Registered with ``app.registerService(BackgroundExecutor, {'concurrency': 8})`` it is used by
+    `ReqUtils.run_in_background` and drained on SIGTERM before the IOLoop stops.
+    """
+    __slots__ = ('_config', '_io_loop', '_queue', '_running', '_idle', 'failed', 'dropped')
+
+    def __init__(self, config: Optional[Union[BackgroundExecutorConfig, Dict[str, Any]]] = None, io_loop: Optional[IOLoop] = None) -> None:
+        super().__init__()
+        self._config = config if isinstance(config, BackgroundExecutorConfig) else BackgroundExecutorConfig(config)
+        self._io_loop = io_loop
+        self._queue: Deque[_Task] = deque()
+        self._running = 0
+        self._idle = Event()
+        self._idle.set()
+        self.failed = 0
+        self.dropped = 0
+
+    @classmethod
+    def getDIKey(cls) -> str:
+        return 'background.executor'
+
+    @property
+    def pending(self) -> int:
+        return self._running + len(self._queue)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> bool:
+        task = _Task(getattr(fn, '__qualname__', None) or type(fn).__name__, fn, args, kwargs)
+
+        if self._running < self._config.concurrency:
+            self._start(task)
+            return True
+
+        if len(self._queue) >= self._config.queue_size:
+            policy = self._config.rejection_policy
+            if policy == POLICY_DROP_OLDEST:
+                self._drop(self._queue.popleft())
+                BACKGROUND_TASKS_PENDING.dec()
+            elif policy == POLICY_DROP_NEW:
+                self._drop(task)
+                return False
+            else:
+                BACKGROUND_TASKS.inc((task.name, 'rejected'))
+                raise BackgroundQueueFullError(f'Background queue is full ({self._config.queue_size} tasks)')
+
+        self._queue.append(task)
+        BACKGROUND_TASKS_PENDING.inc()
+        return True
+
+    def _drop(self, task: _Task) -> None:
+        self.dropped += 1
+        BACKGROUND_TASKS.inc((task.name, 'rejected'))
+        logging.getLogger(LOG_MAIN).warning('Background queue is full, task %s dropped', task.name)
+
+    def _start(self, task: _Task) -> None:
+        self._running += 1
+        self._idle.clear()
+        BACKGROUND_TASKS_PENDING.inc()
+        # tasks outlive the request submitting them, so they see neither its DI scope nor its timer
+        Context().run((self._io_loop or IOLoop.current()).spawn_callback, self._run, task)
+
+    async def _run(self, task: _Task) -> None:
+        while task is not None:
+            started = time.perf_counter()
+            status = 'ok'
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+                if isawaitable(result):
+                    await result
+            except Exception:
+                status = 'failed'
+                self.failed += 1
+                logging.getLogger(LOG_MAIN).exception('Background task %s failed', task.name)
+            BACKGROUND_TASK_DURATION.observe((task.name,), time.perf_counter() - started)
+            BACKGROUND_TASKS.inc((task.name, status))
+            BACKGROUND_TASKS_PENDING.dec()
+
+            task = self._queue.popleft() if self._queue else None
+
+        self._running -= 1
+        if not self._running:
+            self._idle.set()
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all running and queued tasks finish, returns False when timeout passed first"""
+        try:
+            await self._idle.wait(timedelta(seconds=timeout) if timeout is not None else None)
+        except TimeoutError:
+            logging.getLogger(LOG_MAIN).warning('Background executor not drained, %d tasks left', self.pending)
+            return False
+        return True
@@ -0,0 +1,166 @@
+# coding=utf-8
+import contextvars
+from datetime import timedelta
+from http import HTTPStatus
+from typing import Any, Dict, Tuple
+
+from tornado import gen, httputil
+from tornado.concurrent import Future, future_set_result_unless_cancelled
+from tornado.locks import Semaphore
+from tornado.util import TimeoutError
+
+from maio.core.exceptions import BasicErrorCodes, ErrorEntry, HTTP400BadRequestError
+from maio.core.handlers import RestHandler, _build_error_response
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# connection and body specific headers of the batch request are not passed to its items
+_SKIPPED_HEADERS = ('Content-Length', 'Content-Type', 'Transfer-Encoding', 'Accept-Encoding', 'If-None-Match', 'If-Modified-Since', 'Expect')
+
+
+class _BatchConnection:
+    """Collects response of a handler dispatched in-process instead of writing it to the socket, up to max_size bytes"""
+    __slots__ = ('context', 'max_size', 'status', 'headers', 'chunks', 'size', 'finished')
+
+    def __init__(self, context, max_size: int) -> None:
+        self.context = context
+        self.max_size = max_size
+        self.status = None
+        self.headers = None
+        self.chunks = []
+        self.size = 0
+        self.finished = Future()
+
+    def set_close_callback(self, callback) -> None:
+        pass
+
+    def write_headers(self, start_line, headers, chunk=None, callback=None) -> Future:
+        self.status = start_line.code
+        self.headers = headers
+        return self.write(chunk, callback)
+
+    def write(self, chunk, callback=None) -> Future:
+        if chunk:
+            self.size += len(chunk)
+            if self.size <= self.max_size:
+                self.chunks.append(chunk)
+            elif self.chunks:
+                # response is replaced with an error, nothing more is kept in memory
+                self.chunks = []
+        if callback is not None:
+            callback()
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def finish(self) -> None:
+        future_set_result_unless_cancelled(self.finished, None)
+
+
+class BatchHandler(RestHandler):
+    """Runs API calls listed in the body in-process and returns all their responses at once.
+
+    Add to routing with ``url(r'/batch', BatchHandler)`` and POST ``{"requests": [{"method": "GET", "path": "/users/1"}, ...]}``.
+    Items are dispatched through the application router with headers of the batch request, so authorization, rate limits
+    and admission apply to each of them. They run concurrently, so they must not depend on each other.
+    Response is ``{"status": "OK", "data": [{"status": 200, "body": {...}}, ...]}`` in order of the requests.
+    """
+
+    async def post(self):
+        items = self.request.json_body
+        if isinstance(items, dict):
+            items = items.get('requests')
+        if not isinstance(items, list) or not items:
+            raise HTTP400BadRequestError(BasicErrorCodes.VALIDATION_ERROR, details={'requests': 'List of requests is required'})
+
+        cfg = self.config.batch
+        if len(items) > cfg.max_items:
+            raise HTTP400BadRequestError(BasicErrorCodes.PAYLOAD_TOO_BIG, details={'requests': f'At most {cfg.max_items} requests allowed'})
+
+        semaphore = Semaphore(cfg.concurrency)
+        results = await gen.multi([self._run_item(item, semaphore) for item in items])
+
+        body = bytearray(b'{"status":"OK","data":[')
+        for position, (status, content) in enumerate(results):
+            if position:
+                body += b','
+            body += b'{"status":%d,"body":' % status
+            body += content
+            body += b'}'
+        body += b']}'
+        self.finish(bytes(body))
+
+    def _item_error(self, status: HTTPStatus, response: ErrorEntry, details: Any = None) -> Tuple[int, bytes]:
+        return status.value, self.application.json_backend.dumps(_build_error_response(response.message, details, response.status))
+
+    async def _run_item(self, item: Dict[str, Any], semaphore: Semaphore) -> Tuple[int, bytes]:
+        request = self._build_item_request(item)
+        if not isinstance(request, httputil.HTTPServerRequest):
+            return self._item_error(HTTPStatus.BAD_REQUEST, BasicErrorCodes.VALIDATION_ERROR, request)
+
+        delegate = self.application.find_handler(request)
+        handler_class = getattr(delegate, 'handler_class', None)
+        if handler_class is not None and issubclass(handler_class, BatchHandler):
+            return self._item_error(HTTPStatus.BAD_REQUEST, BasicErrorCodes.METHOD_NOT_SUPPORTED, 'Batch requests cannot be nested')
+
+        timeout = timedelta(seconds=self.config.batch.timeout)
+        try:
+            await semaphore.acquire(timeout)
+        except TimeoutError:
+            # slots are held by items still running, this one is not started at all
+            return self._item_error(HTTPStatus.GATEWAY_TIMEOUT, BasicErrorCodes.REQUEST_TIMEOUT)
+
+        finished = request.connection.finished
+        try:
+            # every item gets own copy of context variables, e.g. request timer
+            contextvars.copy_context().run(delegate.execute)
+            await gen.with_timeout(timeout, finished)
+        except TimeoutError:
+            # handler cannot be cancelled, it keeps its slot until it finishes so concurrency holds for slow items too
+            finished.add_done_callback(lambda future: semaphore.release())
+            return self._item_error(HTTPStatus.GATEWAY_TIMEOUT, BasicErrorCodes.REQUEST_TIMEOUT)
+        except BaseException:
+            semaphore.release()
+            raise
+        semaphore.release()
+
+        return self._item_response(request.connection)
+
+    def _build_item_request(self, item: Any):
+        """Returns request of the item or description of what is wrong with it"""
+        if not isinstance(item, dict):
+            return 'Request has to be an object'
+        method = str(item.get('method') or 'GET').upper()
+        path = item.get('path')
+        if method not in BATCH_METHODS:
+            return {'method': f'One of {", ".join(BATCH_METHODS)} required'}
+        if not isinstance(path, str) or not path.startswith('/'):
+            return {'path': 'Absolute path required'}
+
+        parent = self.request
+        headers = httputil.HTTPHeaders()
+        for name, value in parent.headers.get_all():
+            if name not in _SKIPPED_HEADERS:
+                headers.add(name, value)
+
+        body = b''
+        if item.get('body') is not None:
+            body = self.application.json_backend.dumps(item['body'])
+            if len(body) > self.config.batch.max_body_size:
+                return {'body': f'Body larger than {self.config.batch.max_body_size} bytes'}
+        if body or method in ('POST', 'PUT', 'PATCH'):
+            headers['Content-Type'] = 'application/json'
+
+        return httputil.HTTPServerRequest(method, path, parent.version, headers, body, parent.host, connection=_BatchConnection(parent.connection.context, self.config.batch.max_response_size))
+
+    def _item_response(self, connection: _BatchConnection) -> Tuple[int, bytes]:
+        if connection.size > connection.max_size:
+            return self._item_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, BasicErrorCodes.PAYLOAD_TOO_BIG, f'Response larger than {connection.max_size} bytes')
+
+        content = b''.join(connection.chunks)
+        if not content:
+            return connection.status, b'null'
+        content_type = connection.headers.get('Content-Type', '') if connection.headers else ''
+        if content_type.startswith('application/json'):
+            # JSON responses are embedded as they are, without decoding
+            return connection.status, content
+        return connection.status, self.application.json_backend.dumps(content.decode('utf-8', 'replace')).replace(b"</", b"<\\/")
@@ -0,0 +1,237 @@
+# coding=utf-8
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple, Union
+
+from maio.core.data import VO
+from maio.core.di import DI, ApiService
+
+
+class _CacheEntry(NamedTuple):
+    expires_at: float
+    size: int
+    value: Any
+
+
+class LRUCache:
+    """Bounded mapping with least recently used eviction and per entry time to live.
+
+    Limits apply both to the number of entries and to the sum of entry sizes given to ``set``.
+    """
+    __slots__ = ('_entries', '_max_entries', '_max_size', '_ttl', '_size', '_on_remove', 'hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 60, max_size: Optional[int] = None,
+                 on_remove: Optional[Callable[[Hashable, Any], None]] = None) -> None:
+        self._entries: 'OrderedDict[Hashable, _CacheEntry]' = OrderedDict()
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._ttl = ttl
+        self._size = 0
+        self._on_remove = on_remove
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry.expires_at and entry.expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: int = 1) -> bool:
+        if self._max_size is not None and size > self._max_size:
+            # would evict everything else and still not fit
+            self.pop(key)
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+
+        ttl = self._ttl if ttl is None else ttl
+        self._entries[key] = _CacheEntry(time.monotonic() + ttl if ttl else 0, size, value)
+        self._size += size
+
+        while len(self._entries) > self._max_entries or (self._max_size is not None and self._size > self._max_size):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key in self._entries:
+            return self._remove(key).value
+        return default
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> _CacheEntry:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        if self._on_remove is not None:
+            self._on_remove(key, entry.value)
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'size': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class ResponseCacheConfig(VO):
+    __slots__ = ('ttl', 'max_entries', 'max_size')
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.ttl = 30
+        self.max_entries = 4096
+        # bytes of cached response bodies
+        self.max_size = 64 * 1024 * 1024
+        if config:
+            self.update_object(config)
+
+
+class _CachedResponse(NamedTuple):
+    body: bytes
+    tags: Tuple[str, ...]
+
+
+class ResponseCache(ApiService):
+    """In-process cache of encoded GET responses.
+
+    Entries are tagged with collection names and dropped whenever any `MongoRepository` writes to one of them
+    in this process, from service start until it is stopped. Other worker processes only see the change after the entry TTL passes.
+    """
+    __slots__ = ('_config', '_cache', '_tags', '_generations', 'invalidations')
+
+    def __init__(self, config: Optional[Union[ResponseCacheConfig, Dict[str, Any]]] = None) -> None:
+        super().__init__()
+        self._config = config if isinstance(config, ResponseCacheConfig) else ResponseCacheConfig(config)
+        self._cache = LRUCache(self._config.max_entries, self._config.ttl, self._config.max_size, self._on_remove)
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._generations: Dict[str, int] = {}
+        self.invalidations = 0
+
+    @classmethod
+    def getDIKey(cls) -> str:
+        return 'response.cache'
+
+    async def start(self) -> None:
+        from maio.core.mongo import MongoRepository
+
+        MongoRepository.add_write_listener(self.invalidate_tag)
+
+    def close(self) -> None:
+        from maio.core.mongo import MongoRepository
+
+        MongoRepository.remove_write_listener(self.invalidate_tag)
+        self.clear()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._cache.get(key)
+        return entry.body if entry is not None else None
+
+    def generation(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: Hashable, body: bytes, tags: Tuple[str, ...] = (), ttl: Optional[float] = None, generation: Optional[Tuple[int, ...]] = None) -> None:
+        # response built from data read before a write to one of its collections finished would be stale
+        if generation is not None and generation != self.generation(tags):
+            return
+        if self._cache.set(key, _CachedResponse(body, tags), ttl, len(body)):
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate_tag(self, tag: str) -> None:
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        keys = self._tags.pop(tag, None)
+        if keys:
+            for key in keys:
+                self._cache.pop(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._tags.clear()
+
+    def _on_remove(self, key: Hashable, entry: _CachedResponse) -> None:
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        stats = self._cache.stats()
+        stats['invalidations'] = self.invalidations
+        return stats
+
+
+def _build_cache_key(handler, args: Tuple, kwargs: Dict[str, Any], vary: Tuple[str, ...]) -> Hashable:
+    query = handler.request.query_arguments
+    return (
+        handler.get_rev_name(),
+        args,
+        tuple(sorted(kwargs.items())) if kwargs else (),
+        tuple(sorted((k, tuple(v)) for k, v in query.items())) if query else (),
+        tuple(handler.request.headers.get(h) for h in vary),
+    )
+
+
+def cached_response(ttl: Optional[float] = None, tags: Iterable[Union[str, type]] = (), vary: Iterable[str] = ()):
+    """Caches encoded ``return_ok`` body of decorated ``RestHandler.get``.
+
+    :param ttl: seconds, defaults to ResponseCacheConfig.ttl
+    :param tags: collection names or `MongoRepository` subclasses, writes to them invalidate cached responses
+    :param vary: request headers which change the response, e.g. ``('Authorization', 'X-Lang')``
+
+    Works only when `ResponseCache` service is registered, otherwise decorated method is called as is.
+    """
+    tag_names = tuple(t if isinstance(t, str) else t.__collection__ for t in tags)
+    vary = tuple(vary)
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                cache: ResponseCache = DI.get(ResponseCache.getDIKey())
+            except RuntimeError:
+                return await method(self, *args, **kwargs)
+
+            key = _build_cache_key(self, args, kwargs, vary)
+            body = cache.get(key)
+            if body is not None:
+                self._finish_encoded(body)
+                return
+
+            self._response_cache = (cache, key, tag_names, ttl, cache.generation(tag_names))
+            return await method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,6 +1,6 @@
 # coding=utf-8
 from datetime import datetime
-from typing import Any, Optional, Union, NamedTuple, Type, Callable, Dict, Awaitable, List, Tuple
+from typing import Any, Optional, Union, NamedTuple, Type, Callable, Dict, Awaitable, List, Tuple, AsyncIterator
 from uuid import UUID
 
 from maio.core.data import Result
@@ -190,6 +190,9 @@ class ListBuilder:
     def fetch_with_count(self) -> Awaitable[Tuple]:
         return self._main_clazz.execute_with_count(self)
 
+    def stream_data(self) -> AsyncIterator[Any]:
+        return self._main_clazz.stream(self)
+
 
 class AbstractListCommand(object):
     @classmethod
@@ -246,12 +249,15 @@ class AbstractListCommand(object):
         return cls.get_repo_clazz().find(**params)
 
     @classmethod
-    async def execute(cls, builder: ListBuilder) -> Union[List, Dict]:
-
+    def _get_builder_cursor(cls, builder: ListBuilder):
         if builder.pagination:
-            cursor = cls.get_cursor(builder.filtering, builder.sorting, builder.pagination.limit, builder.pagination.offset, builder.projection)
+            return cls.get_cursor(builder.filtering, builder.sorting, builder.pagination.limit, builder.pagination.offset, builder.projection)
         else:
-            cursor = cls.get_cursor(builder.filtering, builder.sorting, None, None, builder.projection)
+            return cls.get_cursor(builder.filtering, builder.sorting, None, None, builder.projection)
+
+    @classmethod
+    async def execute(cls, builder: ListBuilder) -> Union[List, Dict]:
+        cursor = cls._get_builder_cursor(builder)
 
         serializer = cls._get_serializer(builder.fn_serialize, builder.row_as_dict)
         if builder.return_as_map:
@@ -266,6 +272,17 @@ class AbstractListCommand(object):
 
         return result
 
+    @classmethod
+    async def stream(cls, builder: ListBuilder) -> AsyncIterator[Any]:
+        # rows are serialized one by one as cursor fetches them, to be used with RestHandler.return_stream
+        if builder.return_as_map:
+            raise ValueError('Streaming results as map is not supported')
+
+        cursor = cls._get_builder_cursor(builder)
+        serializer = cls._get_serializer(builder.fn_serialize, builder.row_as_dict)
+        async for row in cursor:
+            yield serializer(row)
+
     @classmethod
     async def execute_with_count(cls, builder: ListBuilder) -> Tuple[Union[List, Dict], int]:
         result = await cls.execute(builder)
@@ -136,17 +136,56 @@ class TornadoSettings(object):
 
 
 class WebSettings(_BaseConfig):
-    __slots__ = ('name', 'port', 'host')
+    __slots__ = ('name', 'port', 'host', 'server_timing', 'keep_alive', 'idle_connection_timeout', 'max_requests_per_connection', 'backlog', 'max_buffer_size',
+                 'max_body_size', 'startup_timeout', 'health_timeout', 'shutdown_timeout', 'trie_router')
 
     def __init__(self) -> None:
         super().__init__()
         self.name = 'Rest API Server'
         self.port = 8080
         self.host = '0.0.0.0'
+        # keep-alive connections save a TCP handshake per request, keep idle_connection_timeout above the idle timeout of the load balancer
+        self.keep_alive = False
+        self.idle_connection_timeout = 3600
+        # connection is closed after this amount of requests, so load balancer spreads clients again over workers. 0 means no limit
+        self.max_requests_per_connection = 0
+        # listen queue of the socket, capped by net.core.somaxconn
+        self.backlog = 2048
+        # bytes buffered per connection and maximum request body, tornado defaults
+        self.max_buffer_size = 100 * 1024 * 1024
+        self.max_body_size = 100 * 1024 * 1024
+        # seconds services have to start and warm up before the worker accepts requests anyway
+        self.startup_timeout = 30
+        # seconds every health check of ReadinessHandler may take
+        self.health_timeout = 2
+        # seconds SIGTERM waits for active requests and background tasks before services are stopped
+        self.shutdown_timeout = 3
+        # adds Server-Timing header with time spent in request stages, meant for load tests
+        self.server_timing = False
+        # routes looked up by path segments in a trie instead of matching their regexes one by one, pays off with hundreds of routes
+        self.trie_router = False
+
+
+class WorkersConfig(_BaseConfig):
+    __slots__ = ('processes', 'supervisor', 'cpu_affinity', 'respawn_backoff', 'max_respawn_backoff', 'stop_timeout')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # forked worker processes, 0 means one per CPU
+        self.processes = 0
+        # workers forked by Supervisor instead of tornado: respawn with backoff, rolling restart on SIGHUP, status on SIGUSR2
+        self.supervisor = False
+        # pins every worker to one CPU, supervisor mode only
+        self.cpu_affinity = False
+        # seconds before crashed worker is started again, doubled with every crash in a row
+        self.respawn_backoff = 1
+        self.max_respawn_backoff = 30
+        # seconds a stopped worker has to finish, then it is killed
+        self.stop_timeout = 10
 
 
 class LoggerConfig(_BaseConfig):
-    __slots__ = ('level', 'output_console', 'output_file', 'relpath', 'logformat', 'exceptions')
+    __slots__ = ('level', 'output_console', 'output_file', 'relpath', 'logformat', 'exceptions', 'slow_requests', 'queued', 'queue_size', 'queue_drop_policy')
 
     def __init__(self) -> None:
         super().__init__()
@@ -160,6 +199,16 @@ class LoggerConfig(_BaseConfig):
             'enabled': True,
             'codes': (500, 501, 502, 503)
         }
+        # requests taking longer than threshold seconds are logged to app.slow with time spent in each stage
+        self.slow_requests = {
+            'enabled': False,
+            'threshold': 0.5
+        }
+        # handlers only enqueue records, files and console are written by single listener thread of the main process
+        self.queued = False
+        self.queue_size = 10000
+        # drop_new or drop_oldest, applied when listener cannot keep up and queue is full
+        self.queue_drop_policy = 'drop_new'
 
 
 class CorsConfig(_BaseConfig):
@@ -171,6 +220,112 @@ class CorsConfig(_BaseConfig):
         self.allowed_origin = '*'
 
 
+class JsonConfig(_BaseConfig):
+    __slots__ = ('backend', 'stream_chunk_size', 'etag_min_size')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # one of: auto, stdlib, orjson, ujson. Unavailable backends fall back to the first available one
+        self.backend = 'auto'
+        # streamed responses are flushed to the client every time buffered rows exceed this amount of bytes
+        self.stream_chunk_size = 64 * 1024
+        # routes with etag enabled skip hashing of responses smaller than this amount of bytes
+        self.etag_min_size = 512
+
+
+class FilesConfig(_BaseConfig):
+    __slots__ = ('chunk_size', 'read_ahead')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # bytes read from GridFS and written to the client at once, default GridFS chunk is 255 KiB
+        self.chunk_size = 255 * 1024
+        # read next chunk from GridFS while current one is being sent
+        self.read_ahead = True
+
+
+class AdmissionConfig(_BaseConfig):
+    __slots__ = ('max_in_flight', 'queue_size', 'queue_timeout', 'retry_after')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # requests processed at once by a worker, 0 disables global limit. Routes set own limits with url() parameters of the same names
+        self.max_in_flight = 0
+        # requests over the limit waiting up to queue_timeout seconds for a free slot before being rejected with 503
+        self.queue_size = 0
+        self.queue_timeout = 0.1
+        # Retry-After seconds sent with 503 responses
+        self.retry_after = 1
+
+
+class RateLimitConfig(_BaseConfig):
+    __slots__ = ('slots', 'ways', 'stripes')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # token buckets shared by all workers, created only when a route sets {'rate_limit': {'rate': .., 'burst': ..}}
+        self.slots = 65536
+        # slots searched for a client key, when all of them are taken the least recently used bucket is replaced
+        self.ways = 8
+        # locks guarding the table, every one of them covers 1/stripes of slot groups
+        self.stripes = 64
+
+
+class BatchConfig(_BaseConfig):
+    __slots__ = ('max_items', 'concurrency', 'timeout', 'max_body_size', 'max_response_size')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # requests accepted in one call of BatchHandler, and how many of them run at once
+        self.max_items = 20
+        self.concurrency = 10
+        # seconds after which a request still running is answered with 504, it keeps its slot of concurrency until it finishes
+        self.timeout = 10
+        # bytes of a single encoded request body and a single response, larger responses are replaced with 413 error
+        self.max_body_size = 64 * 1024
+        self.max_response_size = 1024 * 1024
+
+
+class OffloadConfig(_BaseConfig):
+    __slots__ = ('threads', 'processes', 'json_threshold', 'validate_threshold')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # pools created by RestAPIApp.start in every worker, 0 threads means IOLoop default executor, 0 processes disables process pool
+        self.threads = 4
+        self.processes = 0
+        # request bodies of at least this amount of bytes are parsed in process pool, in the request otherwise as json.loads holds the GIL
+        self.json_threshold = 256 * 1024
+        # ReqUtils.validate_async runs validation in thread pool for data of at least this amount of bytes
+        self.validate_threshold = 256 * 1024
+
+
+class MetricsConfig(_BaseConfig):
+    __slots__ = ('enabled', 'directory', 'flush_interval')
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.enabled = True
+        # workers forked by RestAPIApp.start share their metrics through files in this directory, defaults to temp dir per port
+        self.directory = None
+        # seconds between dumps of worker metrics, worker serving the scrape always dumps its own fresh values
+        self.flush_interval = 5
+
+
+class ProfilingConfig(_BaseConfig):
+    __slots__ = ('enabled', 'sample_rate', 'dump_interval', 'signal')
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.enabled = False
+        # fraction of requests profiled while enabled, at most one request per worker at a time
+        self.sample_rate = 0.01
+        # seconds between dumps of per route stats to logging relpath directory
+        self.dump_interval = 60
+        # SIGUSR1 sent to worker processes toggles profiling
+        self.signal = True
+
+
 class SecurityConfig(_BaseConfig):
     __slots__ = ('session_timeout', 'single_session', 'password_salt', 'use_https')
 
@@ -200,7 +355,7 @@ class AppConfig:
     BASE_PATH = None
     TEMPLATE_PATH = None
 
-    __slots__ = ('tornado', 'web', 'logging', 'cors', 'security', 'locale', 'apiVersion')
+    __slots__ = ('tornado', 'web', 'workers', 'logging', 'cors', 'security', 'locale', 'json', 'files', 'admission', 'rate_limit', 'batch', 'offload', 'metrics', 'profiling', 'apiVersion')
 
     def __init__(self, base_path: str, template_path: Optional[str] = None, api_version: Optional[str] = None) -> None:
         super().__init__()
@@ -213,10 +368,19 @@ class AppConfig:
         self._load_version()
         self.tornado = TornadoSettings()
         self.web = WebSettings()
+        self.workers = WorkersConfig()
         self.logging = LoggerConfig()
         self.cors = CorsConfig()
         self.security = SecurityConfig()
         self.locale = LocaleConfig()
+        self.json = JsonConfig()
+        self.files = FilesConfig()
+        self.admission = AdmissionConfig()
+        self.rate_limit = RateLimitConfig()
+        self.batch = BatchConfig()
+        self.offload = OffloadConfig()
+        self.metrics = MetricsConfig()
+        self.profiling = ProfilingConfig()
 
     @property
     def env(self) -> str:
@@ -240,6 +404,8 @@ class AppConfig:
             self.cors.allowed_origin = data['cors']['allowed_origin']
         if data.get('web') and data['web'].get('port'):
             self.web.port = data['web']['port']
+        if data.get('json') and data['json'].get('backend'):
+            self.json.backend = data['json']['backend']
 
     def enrich_with_json_file(self, config_path: Optional[str] = None) -> int:
         if not config_path:
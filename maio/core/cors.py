@@ -0,0 +1,29 @@
+# coding=utf-8
+import re
+from typing import Iterable, Optional
+
+_SUBDOMAIN = r'(?:[A-Za-z0-9-]+\.)*[A-Za-z0-9-]+'
+
+
+class OriginMatcher:
+    """Matches request Origin against `config.cors.allowed_origin` list.
+
+    Plain entries are looked up in a set, entries with ``*`` like ``https://*.example.com`` are compiled into one pattern
+    where ``*`` stands for one or more subdomain labels.
+    """
+    __slots__ = ('_exact', '_pattern', 'fallback')
+
+    def __init__(self, allowed: Iterable[str]) -> None:
+        allowed = list(allowed)
+        self._exact = frozenset(origin for origin in allowed if '*' not in origin)
+        wildcards = ['(?:%s)' % re.escape(origin).replace(r'\*', _SUBDOMAIN) for origin in allowed if '*' in origin]
+        self._pattern = re.compile('|'.join(wildcards), re.IGNORECASE) if wildcards else None
+        # not allowed origins are answered with the first allowed one, browser rejects such response
+        self.fallback = next((origin for origin in allowed if '*' not in origin), None)
+
+    def match(self, origin: str) -> bool:
+        return origin in self._exact or (self._pattern is not None and self._pattern.fullmatch(origin) is not None)
+
+    def resolve(self, origin: str) -> Optional[str]:
+        """Returns value of Access-Control-Allow-Origin header for the request Origin"""
+        return origin if self.match(origin) else self.fallback
@@ -1,11 +1,10 @@
 # coding=utf-8
 import json
+import sys
 from datetime import date
 from typing import Any, Dict, Optional, Tuple, Union, TypeVar, Generic, Type
 from uuid import UUID, uuid4
 
-from bson import ObjectId
-
 
 class VO:
     def to_dict(self, fields: Optional[Tuple] = None) -> Dict:
@@ -95,19 +94,33 @@ class Document(VO):
         return uuid4()
 
 
+def __getattr__(name: str):
+    # bson (part of pymongo) is imported on first use, see benchmarks/import_time.py
+    if name == 'ObjectId':
+        from bson import ObjectId
+        return ObjectId
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def json_default(obj):
+    # ObjectId can exist only once bson was imported, checking sys.modules keeps bson out of the import
+    bson = sys.modules.get('bson')
+    if isinstance(obj, UUID) or (bson is not None and isinstance(obj, bson.ObjectId)):
+        return str(obj)
+    elif isinstance(obj, date):
+        return str(obj.isoformat())
+    elif isinstance(obj, set):
+        return list(obj)
+    elif isinstance(obj, bytes):
+        return obj.decode()
+    elif isinstance(obj, VO):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
 class CustomJsonEncoder(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, (UUID, ObjectId)):
-            return str(obj)
-        elif isinstance(obj, date):
-            return str(obj.isoformat())
-        elif isinstance(obj, set):
-            return list(obj)
-        elif isinstance(obj, bytes):
-            return obj.decode()
-        elif isinstance(obj, VO):
-            return obj.to_dict()
-        return json.JSONEncoder.default(self, obj)
+        return json_default(obj)
 
 
 def convert_to_dict_with_mapping(mapping: Dict[str, Type[VO]], source: VO, target: Dict[str, Any]) -> Dict[str, Any]:
@@ -1,5 +1,21 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from inspect import isawaitable
 from typing import Any, Dict, Optional
 
+from maio.core.log import LOG_MAIN
+
+# one instance for the process, factory called on first get
+SINGLETON = 'singleton'
+# one instance for the request being handled, closed when the request is finished
+REQUEST = 'request'
+# new instance on every get
+TRANSIENT = 'transient'
+LIFETIMES = (SINGLETON, REQUEST, TRANSIENT)
+
+_SCOPE: ContextVar[Optional['RequestScope']] = ContextVar('maio_di_scope', default=None)
+
 
 class ApiService:
 
@@ -10,33 +26,115 @@ class ApiService:
     def getDIKey(cls):
         return None
 
+    async def start(self) -> None:
+        """Called for all services at once when the worker starts, before it accepts requests"""
+
+    async def warmup(self) -> None:
+        """Called for all services at once after they started, e.g. to open connections the first requests would wait for"""
+
+    async def health(self) -> bool:
+        """Checked by `ReadinessHandler`, return False or raise when the service cannot handle requests"""
+        return True
+
+    async def stop(self) -> None:
+        """Called on shutdown in reverse order of registration after requests finished, calls `close` by default"""
+        result = self.close()
+        if isawaitable(result):
+            await result
+
+    def close(self):
+        """Releases resources of the service, may return awaitable"""
+        return None
+
 
 class NoBinding:
     pass
 
 
+class RequestScope:
+    """Instances of `REQUEST` bindings created while handling one request, `RestHandler` opens it and the application closes it"""
+    __slots__ = ('_instances', '_closed')
+
+    def __init__(self) -> None:
+        self._instances: Dict[str, Any] = {}
+        self._closed = False
+
+    def get(self, name: str, factory: Any) -> Any:
+        # work spawned by the request may outlive it, instances created after close would never be closed
+        if self._closed:
+            raise RuntimeError(f"Binding [{name}] lives in request scope, but its request was finished")
+        instance = self._instances.get(name, NoBinding)
+        if instance is NoBinding:
+            instance = self._instances[name] = factory()
+        return instance
+
+    def close(self) -> None:
+        """Calls ``close()`` of created instances in reverse order of creation, the scope cannot be used afterwards"""
+        self._closed = True
+        instances = list(self._instances.values())
+        self._instances.clear()
+        for instance in reversed(instances):
+            close = getattr(instance, 'close', None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception:
+                logging.getLogger(LOG_MAIN).exception('Closing request scoped %s failed', type(instance).__name__)
+
+
 class DI:
     _container: Dict[str, Any] = {}
+    # explicit lifetimes, bindings without one are singletons when registered as instance and transient when callable
+    _lifetimes: Dict[str, str] = {}
+    # key as passed to get -> (name, lifetime, container), so str() of class keys runs once
+    _resolved: Dict[Any, tuple] = {}
+    # key as passed to get -> instance of singleton binding, the common lookup path
+    _singletons: Dict[Any, Any] = {}
+    _request_bindings: int = 0
     _initialized: bool = False
 
     def __init__(self):
         pass
 
     @classmethod
-    def add(cls, name: str, container: Any):
+    def add(cls, name: str, container: Any, lifetime: Optional[str] = None):
         name = str(name)
         if name in cls._container:
             raise NameError('Container with given name "%s" already registered' % name)
-        cls._container[name] = container
-        return cls
+        return cls._bind(name, container, lifetime)
 
     @classmethod
-    def replace(cls, name: str, container: Any):
-        name = str(name)
+    def replace(cls, name: str, container: Any, lifetime: Optional[str] = None):
+        return cls._bind(str(name), container, lifetime)
 
+    @classmethod
+    def _bind(cls, name: str, container: Any, lifetime: Optional[str]):
+        if lifetime is not None and lifetime not in LIFETIMES:
+            raise ValueError(f'Unknown lifetime [{lifetime}], one of {", ".join(LIFETIMES)} expected')
+        # drop what was resolved for the previous binding of the name
+        for key in [key for key, resolved in cls._resolved.items() if resolved[0] == name]:
+            del cls._resolved[key]
+            cls._singletons.pop(key, None)
+        cls._singletons.pop(name, None)
         cls._container[name] = container
+        if lifetime is None:
+            cls._lifetimes.pop(name, None)
+        else:
+            cls._lifetimes[name] = lifetime
+        cls._request_bindings = sum(1 for value in cls._lifetimes.values() if value == REQUEST)
         return cls
 
+    @classmethod
+    def clear(cls):
+        cls._container.clear()
+        cls._lifetimes.clear()
+        cls._resolved.clear()
+        cls._singletons.clear()
+        cls._request_bindings = 0
+
     @classmethod
     def initialize(cls):
         cls._initialized = True
@@ -47,13 +145,52 @@ class DI:
 
     @classmethod
     def get(cls, name: str) -> Any:
-        name = str(name)
-        container = cls._container.get(name, NoBinding)
+        try:
+            return cls._singletons[name]
+        except KeyError:
+            pass
+
+        resolved = cls._resolved.get(name)
+        if resolved is None:
+            resolved = cls._resolve(name)
+        key, lifetime, container = resolved
+        if lifetime == TRANSIENT:
+            return container()
+        if lifetime == REQUEST:
+            scope = _SCOPE.get()
+            if scope is None:
+                raise RuntimeError(f"Binding [{key}] lives in request scope, but no request is handled")
+            return scope.get(key, container)
+
+        # other keys of the same name, e.g. class and its str(), share the instance
+        instance = cls._singletons.get(key, NoBinding)
+        if instance is NoBinding:
+            instance = container() if key in cls._lifetimes and callable(container) else container
+        cls._singletons[name] = cls._singletons[key] = instance
+        return instance
 
-        if container == NoBinding:
-            raise RuntimeError(f"No binding defined for name [{name}]")
-        else:
-            if isinstance(container, type) or callable(container):
-                return container()
-            else:
-                return container
+    @classmethod
+    def _resolve(cls, name: Any) -> tuple:
+        key = str(name)
+        container = cls._container.get(key, NoBinding)
+        if container is NoBinding:
+            raise RuntimeError(f"No binding defined for name [{key}]")
+
+        lifetime = cls._lifetimes.get(key)
+        if lifetime is None:
+            lifetime = TRANSIENT if isinstance(container, type) or callable(container) else SINGLETON
+        resolved = cls._resolved[name] = (key, lifetime, container)
+        return resolved
+
+    @classmethod
+    def beginRequestScope(cls) -> Optional[RequestScope]:
+        """Opens scope of the request being handled, None while there are no `REQUEST` bindings"""
+        scope = RequestScope() if cls._request_bindings else None
+        _SCOPE.set(scope)
+        return scope
+
+    @classmethod
+    def endRequestScope(cls, scope: Optional[RequestScope]) -> None:
+        if scope is not None:
+            scope.close()
+        _SCOPE.set(None)
@@ -0,0 +1,133 @@
+# coding=utf-8
+import logging
+from typing import Any, Dict, Optional
+
+from maio.core.data import CustomJsonEncoder, json_default
+from maio.core.log import LOG_MAIN
+
+BACKEND_AUTO = 'auto'
+BACKEND_STDLIB = 'stdlib'
+BACKEND_ORJSON = 'orjson'
+BACKEND_UJSON = 'ujson'
+
+# ujson calls back into python for every UUID, ObjectId and date which makes it slower than stdlib on our payloads
+# (see benchmarks/json_backends.py), so it is used only when requested explicitly
+_AUTO_ORDER = (BACKEND_ORJSON, BACKEND_STDLIB)
+
+
+class JsonBackend:
+    """Encodes response payloads to UTF-8 JSON bytes.
+
+    Every backend has to produce the same document as ``json.dumps(obj, cls=CustomJsonEncoder, ensure_ascii=False)``,
+    only the whitespace between tokens is allowed to differ.
+    """
+    __slots__ = ()
+
+    name: str = None
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError()
+
+
+class StdlibJsonBackend(JsonBackend):
+    __slots__ = ('_encoder',)
+
+    name = BACKEND_STDLIB
+
+    def __init__(self) -> None:
+        super().__init__()
+        # encoder is stateless, so single instance can be shared instead of creating new one on every json.dumps call
+        self._encoder = CustomJsonEncoder(ensure_ascii=False)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode('utf-8')
+
+
+class _FallbackJsonBackend(JsonBackend):
+    __slots__ = ('_fallback',)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._fallback = StdlibJsonBackend()
+
+    def _dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError()
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self._dumps(obj)
+        except (TypeError, OverflowError):
+            # things like integers bigger than 64 bits are handled by stdlib only
+            return self._fallback.dumps(obj)
+
+
+class OrjsonBackend(_FallbackJsonBackend):
+    __slots__ = ('_orjson_dumps', '_options')
+
+    name = BACKEND_ORJSON
+
+    def __init__(self) -> None:
+        super().__init__()
+        import orjson
+
+        self._orjson_dumps = orjson.dumps
+        # dates and dataclasses go through json_default to keep CustomJsonEncoder output
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def _dumps(self, obj: Any) -> bytes:
+        return self._orjson_dumps(obj, default=json_default, option=self._options)
+
+
+class UjsonBackend(_FallbackJsonBackend):
+    __slots__ = ('_ujson_dumps',)
+
+    name = BACKEND_UJSON
+
+    def __init__(self) -> None:
+        super().__init__()
+        import ujson
+
+        # older ujson releases do not support default hook at all
+        ujson.dumps(None, default=json_default)
+        self._ujson_dumps = ujson.dumps
+
+    def _dumps(self, obj: Any) -> bytes:
+        return self._ujson_dumps(obj, ensure_ascii=False, escape_forward_slashes=False, reject_bytes=False, default=json_default).encode('utf-8')
+
+
+_BACKENDS = {
+    BACKEND_STDLIB: StdlibJsonBackend,
+    BACKEND_ORJSON: OrjsonBackend,
+    BACKEND_UJSON: UjsonBackend,
+}
+
+_instances: Dict[str, JsonBackend] = {}
+
+
+def _create_backend(name: str) -> Optional[JsonBackend]:
+    try:
+        return _BACKENDS[name]()
+    except (ImportError, TypeError):
+        return None
+
+
+def get_json_backend(name: Optional[str] = BACKEND_AUTO) -> JsonBackend:
+    name = name or BACKEND_AUTO
+    backend = _instances.get(name)
+    if backend is not None:
+        return backend
+
+    if name != BACKEND_AUTO and name not in _BACKENDS:
+        raise ValueError(f'Unknown JSON backend "{name}". Expected one of: {BACKEND_AUTO}, {", ".join(_BACKENDS)}')
+
+    backend = _create_backend(name) if name != BACKEND_AUTO else None
+    if backend is None:
+        if name != BACKEND_AUTO:
+            logging.getLogger(LOG_MAIN).warning('JSON backend "%s" is not available, falling back to first available one', name)
+        for candidate in _AUTO_ORDER:
+            backend = _create_backend(candidate)
+            if backend is not None:
+                break
+
+    _instances[name] = backend
+    return backend
@@ -1,6 +1,6 @@
 # coding=utf-8
 from http import HTTPStatus
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 import tornado.web
 
@@ -28,6 +28,8 @@ class BasicErrorCodes(object):
     EMAIL_REGISTERED = ErrorEntry(4011, 'Email address already taken')
 
     STORE_TO_DATABASE = ErrorEntry(4012, 'Error storing result in database')
+    TOO_MANY_REQUESTS = ErrorEntry(4013, 'Too many requests')
+    REQUEST_TIMEOUT = ErrorEntry(4014, 'Request timed out')
     PAYLOAD_TOO_BIG = ErrorEntry(4050, 'Payload size is too big')
 
     SERVICE_UNAVAILABLE = ErrorEntry(9999, 'Service unavailable')
@@ -130,6 +132,18 @@ class HTTP409Conflict(HTTPBaseError):
         )
 
 
+class HTTP429TooManyRequestsError(HTTPBaseError):
+    def __init__(self, response: ErrorEntry = BasicErrorCodes.TOO_MANY_REQUESTS, details=None, retry_after: Optional[int] = None):
+        HTTPBaseError.__init__(
+            self,
+            response,
+            HTTPStatus.TOO_MANY_REQUESTS.value,
+            HTTPStatus.TOO_MANY_REQUESTS.name,
+            details
+        )
+        self.retry_after = retry_after
+
+
 class HTTP500InternalServerError(HTTPBaseError):
     def __init__(self, details=None):
         HTTPBaseError.__init__(
@@ -150,3 +164,15 @@ class HTTP501NotImplemented(HTTPBaseError):
             HTTPStatus.NOT_IMPLEMENTED.name,
             details
         )
+
+
+class HTTP503ServiceUnavailableError(HTTPBaseError):
+    def __init__(self, response: ErrorEntry = BasicErrorCodes.SERVICE_UNAVAILABLE, details=None, retry_after: Optional[int] = None):
+        HTTPBaseError.__init__(
+            self,
+            response,
+            HTTPStatus.SERVICE_UNAVAILABLE.value,
+            HTTPStatus.SERVICE_UNAVAILABLE.name,
+            details
+        )
+        self.retry_after = retry_after
@@ -4,25 +4,39 @@ import json
 import logging
 import time
 import traceback
+import zlib
+from contextvars import Context
 from datetime import datetime, timedelta
 from http import HTTPStatus
-from typing import Optional, Dict, Any
+from inspect import isawaitable
+from typing import Optional, Dict, Any, AsyncIterable, Callable, Iterable, Union, Type, TYPE_CHECKING
 from uuid import UUID
 
 import tornado
 import tornado.httputil
 import tornado.web
-from gridfs import GridOut
 from tornado import httputil
+from tornado.gen import convert_yielded
 from tornado.ioloop import IOLoop
 from tornado.web import RequestHandler
 
-from maio.core.data import CustomJsonEncoder
-from maio.core.exceptions import HTTPBaseError, HTTP400BadRequestError, HTTP406NotAcceptable, BasicErrorCodes, HTTP403ForbiddenError, HTTP404NotFoundError
+from maio.core.background import BackgroundExecutor
+from maio.core.data import VO
+from maio.core.di import DI
+from maio.core.exceptions import HTTPBaseError, HTTP400BadRequestError, HTTP406NotAcceptable, BasicErrorCodes, HTTP403ForbiddenError, HTTP404NotFoundError, \
+    HTTP429TooManyRequestsError, HTTP503ServiceUnavailableError
 from maio.core.helpers import parse_uuid, parse_bool, parse_date_to_unix_ts
 from maio.core.log import LOG_EXCEPTIONS, LOG_MAIN
+from maio.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_IN_FLIGHT, REGISTRY as METRICS
+from maio.core.offload import has_process_pool, run_in_process, run_in_thread
+from maio.core.profiling import PROFILER
+from maio.core.timing import STAGE_ENCODE, STAGE_PREPARE, STAGE_VALIDATE, start_timer, timed_stage
 from maio.core.validators import SimpleValidator
 
+if TYPE_CHECKING:
+    from gridfs import GridOut
+    from maio.core.mongo import MongoFileStorage
+
 
 def _log_exception(exception, uri, headers_iter, body, trace_log):
     detail_dict = {
@@ -40,6 +54,56 @@ def _log_exception(exception, uri, headers_iter, body, trace_log):
     ))
 
 
+async def _read_chunk(fp: 'GridOut', size: int) -> bytes:
+    # works with both motor and pymongo GridOut
+    chunk = fp.read(size)
+    if isawaitable(chunk):
+        chunk = await chunk
+    return chunk
+
+
+async def _iterate_async(rows: Iterable):
+    for row in rows:
+        yield row
+
+
+def _parse_json(content: bytes) -> Any:
+    # runs in offload process, ValueError is turned into HTTP 400 by the caller
+    return json.loads(content.decode(encoding='UTF-8'))
+
+
+def _estimate_size(data) -> int:
+    # only top level str and bytes values are counted, enough to tell uploads apart from regular requests
+    if isinstance(data, VO):
+        values = (getattr(data, field, None) for field in data.get_fields())
+    elif isinstance(data, dict):
+        values = data.values()
+    else:
+        return 0
+    return sum(len(value) for value in values if isinstance(value, (str, bytes)))
+
+
+class _DateHeader:
+    """HTTP Date header value, formatted at most once per second."""
+    __slots__ = ('_second', '_value')
+
+    def __init__(self) -> None:
+        self._second = 0
+        self._value = None
+
+    def get(self) -> str:
+        now = time.time()
+        second = int(now)
+        if second != self._second:
+            self._value = httputil.format_timestamp(now)
+            self._second = second
+        return self._value
+
+
+_DATE_HEADER = _DateHeader()
+_CORS_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
 def _build_error_response(message: str, details=None, error_code: int = HTTPStatus.INTERNAL_SERVER_ERROR.value):
     response = {
         'status': u'ERROR',
@@ -74,11 +138,13 @@ class AclMixin:
         'delete': 'remove'
     }
 
-    __slots__ = ['_permission', '_user']
+    __slots__ = ['_permission', '_acl', '_user']
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self._permission = kwargs.get('permission')
+        # {METHOD: (permission name, bit)} built by RestAPIApp once the whole routing is known
+        self._acl = kwargs.get('acl')
         self._user = None
 
     @classmethod
@@ -90,12 +156,31 @@ class AclMixin:
         method = method.lower()
         return '%s_%s' % (permission, cls.METHOD_MAP[method]) if method in cls.METHOD_MAP else permission
 
+    def permission_mask(self, permissions) -> int:
+        """Converts user permission names to the mask accepted by `_check_perform_action`.
+
+        Mask is valid only for the routing of this process, keep it in memory (e.g. with the session cached by the worker)
+        and never persist it, bits move when routes change.
+        """
+        return self.application.permission_index.mask(permissions)
+
     def _check_perform_action(self, method, available_permissions):
         if not self._permission:
             return True
-        real_perm = self.full_permission_name(self._permission, method)
+        required = self._acl.get(method.upper()) if self._acl else None
+        if required is None:
+            real_perm = self.full_permission_name(self._permission, method)
+            if not available_permissions or (real_perm and real_perm not in available_permissions):
+                self._access_denied_exception(real_perm)
+            return
 
-        if not available_permissions or (real_perm and real_perm not in available_permissions):
+        real_perm, bit = required
+        if isinstance(available_permissions, bool):
+            raise TypeError('Permissions expected as names or mask, got bool')
+        if isinstance(available_permissions, int):
+            if not available_permissions & bit:
+                self._access_denied_exception(real_perm)
+        elif not available_permissions or real_perm not in available_permissions:
             self._access_denied_exception(real_perm)
 
     @staticmethod
@@ -112,6 +197,8 @@ def get_available_permissions(app):
 
 class RestHandler(RequestHandler):
     CORS_HEADERS = []
+    # can be enabled per route with {'etag': True} parameter
+    AUTO_ETAG = False
     _LOG_INST = logging.getLogger(LOG_MAIN)
 
     def __init__(self, application, request, **kwargs):
@@ -125,6 +212,23 @@ class RestHandler(RequestHandler):
         self._headers = None  # type: httputil.HTTPHeaders
         self.path_args = None
         self.path_kwargs = None
+        self._auto_etag = kwargs.pop('etag', self.AUTO_ETAG)
+        self._admission = kwargs.pop('admission', None)  # route limiter built by RestAPIApp from url() parameters
+        self._admitted = ()
+        self._rate_limit = kwargs.pop('rate_limit', None)  # RateLimit built by RestAPIApp, buckets shared by all workers
+        self._response_cache = None  # set by cached_response decorator
+        self._in_flight_route = None
+        if METRICS.enabled:
+            self._in_flight_route = self.get_rev_name()
+            HTTP_IN_FLIGHT.inc((self._in_flight_route,))
+        self._timer = start_timer() if self.application.request_timing else None
+        # counted by the application until the request is logged, shutdown waits for it
+        self._active = True
+        self._disconnected = False
+        self.application.request_started()
+        # instances of REQUEST bindings resolved by DI.get while handling the request, closed once it is finished
+        self._di_scope = DI.beginRequestScope()
+        self._profile = PROFILER.start_request() if PROFILER.enabled else None
         self.clear()
         self.request.connection.set_close_callback(self.on_connection_close)
         self.initialize(**kwargs)
@@ -170,17 +274,73 @@ class RestHandler(RequestHandler):
     def initialize(self, **kwargs):
         super(RestHandler, self).initialize()
 
-    def clear(self):
-        self._headers = httputil.HTTPHeaders({
-            'Server': self.config.web.get('name'),
+    @classmethod
+    def build_default_headers(cls, config) -> Dict[str, str]:
+        # static part of response headers, built once per application and handler class
+        headers = {
+            'Server': config.web.get('name'),
             'Content-Type': 'application/json; charset=UTF-8',
-            'Date': httputil.format_timestamp(time.time()),
-        })
+        }
+        if config.cors.get('allowed_origin') == '*':
+            headers['Access-Control-Allow-Origin'] = '*'
+        if config.cors.get('allowed_headers'):
+            headers['Access-Control-Allow-Headers'] = ', '.join(config.cors.get('allowed_headers') + cls.CORS_HEADERS)
+
+        headers['Access-Control-Max-Age'] = '86400'
+        headers['Access-Control-Allow-Credentials'] = 'true'
+        return headers
+
+    def clear(self):
+        # template is built once per handler class, only the Date header changes between requests
+        headers = httputil.HTTPHeaders(self.application.get_default_headers(self.__class__))
+        headers['Date'] = _DATE_HEADER.get()
+        self._headers = headers
+
         self.set_default_headers()
         self._write_buffer = []
         self._status_code = HTTPStatus.OK.value
         self._reason = HTTPStatus.OK.value
 
+    def on_connection_close(self):
+        super(RestHandler, self).on_connection_close()
+        # handler keeps running, so its admission slots and in-flight count are released only once it finished
+        self._disconnected = True
+
+    @property
+    def client_disconnected(self) -> bool:
+        """True once the client closed the connection, long running handlers may check it to stop early"""
+        return self._disconnected
+
+    def on_request_done(self):
+        # called when the request is logged, after the handler finished even if the client disconnected before
+        route = self._in_flight_route
+        if route is not None:
+            self._in_flight_route = None
+            HTTP_IN_FLIGHT.dec((route,))
+
+        profile = self._profile
+        if profile is not None:
+            self._profile = None
+            PROFILER.finish_request(self.get_rev_name(), profile)
+
+        admitted = self._admitted
+        if admitted:
+            self._admitted = ()
+            for limiter in admitted:
+                limiter.release()
+
+    async def _admit(self):
+        admitted = []
+        for limiter in (self._admission, self.application.admission):
+            if limiter is None:
+                continue
+            if not limiter.try_acquire() and not await limiter.wait():
+                for acquired in admitted:
+                    acquired.release()
+                raise HTTP503ServiceUnavailableError(retry_after=limiter.retry_after)
+            admitted.append(limiter)
+        self._admitted = admitted
+
     def get_request_ip(self):
         if self.request.remote_ip == '127.0.0.1' and 'X-Forwarded-For' in self.request.headers:
             return self.request.headers.get('X-Forwarded-For')
@@ -188,36 +348,22 @@ class RestHandler(RequestHandler):
             return self.request.remote_ip
 
     def set_default_headers(self):
-        if self.config.cors.get('allowed_origin'):
-            self._build_cors_origin(self.config.cors.get('allowed_origin'))
-        if self.config.cors.get('allowed_headers'):
-            self.set_header('Access-Control-Allow-Headers', ', '.join(self.config.cors.get('allowed_headers') + self.CORS_HEADERS))
-
-        self.set_header('Access-Control-Max-Age', 86400)
-        self.set_header('Access-Control-Allow-Credentials', 'true')
-
-    def _build_cors_origin(self, allow_origin=None):
-        cors = None
-        if allow_origin == '*':
-            cors = '*'
-        elif self.request.headers.get('Origin') and isinstance(allow_origin, (tuple, set, list)):
-            o = self.request.headers.get('Origin')
-            if o in allow_origin:
-                cors = o
-            else:
-                cors = allow_origin[0]
+        # everything except origin matched against the list of allowed ones comes from build_default_headers
+        matcher = self.application.origin_matcher
+        if matcher is not None:
+            origin = self.request.headers.get('Origin')
+            cors = matcher.resolve(origin) if origin else None
+            if cors:
+                self.set_header('Access-Control-Allow-Origin', cors)
 
-        if cors:
-            self.set_header('Access-Control-Allow-Origin', cors)
+    @classmethod
+    def allowed_methods(cls) -> str:
+        # value of Access-Control-Allow-Methods, methods overridden by the handler class
+        return ', '.join(name.upper() for name in _CORS_METHODS if getattr(cls, name) is not getattr(RequestHandler, name))
 
     def options(self, *args, **kwargs):
-        methods = set()
-        clazz = RequestHandler.__name__
-        for method in (self.post, self.put, self.delete, self.get, self.patch):
-            if not method.__qualname__.startswith(clazz):
-                methods.add(method.__name__.upper())
-
-        self.set_header('Access-Control-Allow-Methods', ', '.join(methods))
+        # preflight answer is built from headers precomputed by RestAPIApp for the handler class
+        self.set_header('Access-Control-Allow-Methods', self.application.get_allowed_methods(self.__class__))
         self.set_status(HTTPStatus.NO_CONTENT.value)
         self.finish()
 
@@ -226,6 +372,11 @@ class RestHandler(RequestHandler):
         exception = exc_info[1] if exc_info else None
         trace_log = None
 
+        # load shedding and rate limit rejections are expected under overload, logging each of them would only add to it
+        shed = isinstance(exception, (HTTP429TooManyRequestsError, HTTP503ServiceUnavailableError)) and exception.retry_after is not None
+        if shed:
+            self.set_header('Retry-After', exception.retry_after)
+
         if isinstance(exception, tornado.web.HTTPError):
             if isinstance(exception, HTTPBaseError):
                 response = _build_error_response(exception.message, exception.details, exception.code)
@@ -236,7 +387,7 @@ class RestHandler(RequestHandler):
             trace_log = u''.join(traceback.format_exception(*exc_info)) if exc_info else None
 
         ex_cfg = self.config.logging.get('exceptions')
-        if ex_cfg and ex_cfg.get('enabled') and (status_code == 500 or (ex_cfg.get('codes') and status_code in ex_cfg.get('codes'))):
+        if not shed and ex_cfg and ex_cfg.get('enabled') and (status_code == 500 or (ex_cfg.get('codes') and status_code in ex_cfg.get('codes'))):
             _log_exception(exception, self.request.uri, self.request.headers.get_all(), self.request.body, trace_log)
 
         if self.settings.get('debug'):
@@ -248,7 +399,7 @@ class RestHandler(RequestHandler):
                 body = str(self.request.body)
             _error_response_append_debug(response, self.request.arguments, body, self.request.headers.get_all(), trace_log)
 
-        self.finish(json.dumps(response, cls=CustomJsonEncoder, ensure_ascii=False))
+        self.finish(self.application.json_backend.dumps(response))
 
     def return_ok(self, dict_response=None, total_count=None, status: HTTPStatus = HTTPStatus.OK):
         self.set_status(status.value)
@@ -260,25 +411,117 @@ class RestHandler(RequestHandler):
         if total_count is not None:
             response['totalCount'] = int(total_count)
 
-        self.finish(json.dumps(response, cls=CustomJsonEncoder, ensure_ascii=False).replace("</", "<\\/"))
+        if self._timer is not None:
+            with self._timer.stage(STAGE_ENCODE):
+                body = self.application.json_backend.dumps(response).replace(b"</", b"<\\/")
+        else:
+            body = self.application.json_backend.dumps(response).replace(b"</", b"<\\/")
+        self._finish_encoded(body)
+
+    def _finish_encoded(self, body: bytes):
+        if self._response_cache is not None and self._status_code == HTTPStatus.OK.value:
+            cache, key, tags, ttl, generation = self._response_cache
+            cache.set(key, body, tags, ttl, generation)
+
+        if self._auto_etag and self._status_code == HTTPStatus.OK.value and len(body) >= self.config.json.etag_min_size \
+                and self.request.method in ('GET', 'HEAD'):
+            self.set_header('Etag', '"%x-%08x"' % (len(body), zlib.crc32(body)))
+            if RequestHandler.check_etag_header(self):
+                self.set_status(HTTPStatus.NOT_MODIFIED.value)
+                self.finish()
+                return
+        self.finish(body)
+
+    async def return_stream(self, rows: Union[AsyncIterable, Iterable], serializer: Optional[Callable[[Any], Any]] = None, total_count: Optional[int] = None,
+                            chunk_size: Optional[int] = None):
+        """Writes {"status": "OK", "data": [...]} response row by row.
+
+        Rows are encoded one at a time and sent in chunks of about ``chunk_size`` bytes, every chunk waits for the previous
+        one to be written to the socket, so memory usage does not depend on the number of rows. When rows fail after the
+        first chunk was sent, the connection is closed without the final chunk, so the client sees an incomplete response.
+        """
+        dumps = self.application.json_backend.dumps
+        if chunk_size is None:
+            chunk_size = self.config.json.stream_chunk_size
+
+        self.set_status(HTTPStatus.OK.value)
+        buffer = bytearray(b'{"status":"OK",')
+        if total_count is not None:
+            buffer += b'"totalCount":%d,' % int(total_count)
+        buffer += b'"data":['
+
+        separator = b''
+        try:
+            async for row in (rows if hasattr(rows, '__aiter__') else _iterate_async(rows)):
+                buffer += separator
+                buffer += dumps(serializer(row) if serializer else row).replace(b"</", b"<\\/")
+                separator = b','
+                if len(buffer) >= chunk_size:
+                    self.write(bytes(buffer))
+                    buffer.clear()
+                    await self.flush()
+        except Exception:
+            if self._headers_written:
+                # error response cannot be sent anymore and finishing would end the chunked body as if the list was complete
+                self.request.connection.close()
+            raise
+
+        buffer += b']}'
+        self.finish(bytes(buffer))
 
     async def prepare(self):
         super(RestHandler, self).prepare()
+        # preflight is answered from precomputed headers, it neither spends tokens of the route nor takes its slot
+        if self.request.method != 'OPTIONS':
+            if self._rate_limit is not None:
+                retry_after = self._rate_limit.check(self.get_request_ip())
+                if retry_after:
+                    raise HTTP429TooManyRequestsError(retry_after=retry_after)
+            if self._admission is not None or self.application.admission is not None:
+                await self._admit()
         if self.request.method in ('POST', 'PUT', 'PATCH'):
             if 'application/json' in self.request.headers.get('Content-Type', ''):
-                self.request.json_body = ReqUtils.processJsonBody(self.request.body)
+                with timed_stage(STAGE_PREPARE):
+                    body = self.request.body
+                    # json.loads holds the GIL for the whole call, in a thread it would stall the IOLoop just the same
+                    if len(body) >= self.config.offload.json_threshold and has_process_pool():
+                        try:
+                            self.request.json_body = await run_in_process(_parse_json, body)
+                        except ValueError:
+                            raise HTTP400BadRequestError(BasicErrorCodes.INVALID_CONTENT)
+                    else:
+                        self.request.json_body = ReqUtils.processJsonBody(body)
             else:
                 raise HTTP406NotAcceptable(BasicErrorCodes.INVALID_CONTENT)
 
+    def finish(self, chunk=None):
+        if self._timer is not None and not self._headers_written and self.config.web.server_timing:
+            self.set_header('Server-Timing', self._timer.server_timing())
+        return super(RestHandler, self).finish(chunk)
+
+    @property
+    def timer(self):
+        return self._timer
+
+    def compute_etag(self):
+        # disable hashing of every response in finish(), etag is set by _finish_encoded only for routes that enabled it
+        return None
+
     def check_etag_header(self):
-        # disable etag checking
+        # disable etag checking, routes with etag enabled compare If-None-Match in _finish_encoded
         pass
 
 
 class ReqUtils:
     @staticmethod
     def run_in_background(fn, *args, **kwargs):
-        IOLoop.current().spawn_callback(fn, args, **kwargs)
+        try:
+            executor: BackgroundExecutor = DI.get(BackgroundExecutor.getDIKey())
+        except RuntimeError:
+            # like BackgroundExecutor, the callback runs without the DI scope and timer of the request
+            Context().run(IOLoop.current().spawn_callback, fn, *args, **kwargs)
+            return
+        executor.submit(fn, *args, **kwargs)
 
     @staticmethod
     def processJsonBody(content) -> Dict:
@@ -292,11 +535,30 @@ class ReqUtils:
 
     @staticmethod
     def validate(data, validators) -> Dict[str, Any]:
-        val_res = SimpleValidator.validate(data, validators)
+        with timed_stage(STAGE_VALIDATE):
+            val_res = SimpleValidator.validate(data, validators)
         if val_res.has_errors():
             raise HTTP400BadRequestError(BasicErrorCodes.VALIDATION_ERROR, details=val_res.errors)
         return val_res.result
 
+    @staticmethod
+    async def validate_async(data, validators, size: Optional[int] = None) -> Dict[str, Any]:
+        """`validate` which runs in offload thread pool when ``size`` (estimated from data by default) reaches offload.validate_threshold"""
+        if size is None:
+            size = _estimate_size(data)
+        if size < DI.get('app_config').offload.validate_threshold:
+            return ReqUtils.validate(data, validators)
+        with timed_stage(STAGE_VALIDATE):
+            return await run_in_thread(ReqUtils.validate, data, validators)
+
+    @staticmethod
+    def run_in_thread(fn, *args, **kwargs):
+        return run_in_thread(fn, *args, **kwargs)
+
+    @staticmethod
+    def run_in_process(fn, *args, **kwargs):
+        return run_in_process(fn, *args, **kwargs)
+
     @staticmethod
     def tryParseUuid(uuid_str: str, raise_error=True) -> UUID:
         uuid_obj = parse_uuid(uuid_str)
@@ -305,17 +567,34 @@ class ReqUtils:
         return uuid_obj
 
     @staticmethod
-    async def send_file(h_request: RequestHandler, fp: GridOut, cache_time: int = 0):
+    async def send_file(h_request: RequestHandler, fp: 'GridOut', cache_time: int = 0, chunk_size: Optional[int] = None, read_ahead: Optional[bool] = None):
+        mime_type = fp.content_type
+        if not mime_type:
+            mime_type = fp.metadata.get('contentType')
+
+        await ReqUtils._send_file(h_request, fp.upload_date, fp.md5, fp.length, mime_type, lambda: fp, cache_time, chunk_size, read_ahead)
+
+    @staticmethod
+    async def send_stored_file(h_request: RequestHandler, storage: Type['MongoFileStorage'], file_id: Any, cache_time: int = 0,
+                               chunk_size: Optional[int] = None, read_ahead: Optional[bool] = None):
+        # conditional requests are answered from cached file metadata, GridOut is opened only when contents are sent
+        meta = await storage.getFileMeta(file_id)
+        if meta is None:
+            raise HTTP404NotFoundError(BasicErrorCodes.GENERAL_NOT_FOUND)
+
+        await ReqUtils._send_file(h_request, meta.upload_date, meta.md5, meta.length, meta.content_type, lambda: storage.openVerifiedFile(meta), cache_time,
+                                  chunk_size, read_ahead)
+
+    @staticmethod
+    async def _send_file(h_request: RequestHandler, upload_date: datetime, md5: str, size: int, mime_type: Optional[str], open_file: Callable[[], Any],
+                         cache_time: int, chunk_size: Optional[int], read_ahead: Optional[bool]):
         # If-Modified-Since header is only good to the second.
-        modified = fp.upload_date.replace(microsecond=0)
+        modified = upload_date.replace(microsecond=0)
         h_request.set_header("Last-Modified", modified)
 
         # MD5 is calculated on the MongoDB server when GridFS file is created
-        h_request.set_header("Etag", f'"{fp.md5}"')
-
-        mime_type = fp.content_type
-        if not mime_type:
-            mime_type = fp.metadata.get('contentType')
+        h_request.set_header("Etag", f'"{md5}"')
+        h_request.set_header("Accept-Ranges", "bytes")
 
         # Starting from here, largely a copy of StaticFileHandler
         if mime_type:
@@ -343,14 +622,87 @@ class ReqUtils:
 
         # Same for Etag
         etag = h_request.request.headers.get("If-None-Match")
-        if etag is not None and etag.strip('"') == fp.md5:
+        if etag is not None and etag.strip('"') == md5:
             h_request.set_status(304)
             return
 
-        h_request.set_header("Content-Length", fp.length)
-        await fp.stream_to_handler(h_request)
+        start, end = 0, size
+        range_header = h_request.request.headers.get("Range")
+        if range_header and ReqUtils._if_range_matches(h_request.request.headers.get("If-Range"), md5, modified):
+            # As per RFC 2616 14.16, if an invalid Range header is specified,
+            # the request will be treated as if the header didn't exist.
+            request_range = httputil._parse_request_range(range_header)
+            if request_range:
+                range_start, range_end = request_range
+                if (range_start is not None and range_start >= size) or range_end == 0:
+                    h_request.set_status(416)  # Range Not Satisfiable
+                    h_request.set_header("Content-Type", "text/plain")
+                    h_request.set_header("Content-Range", f"bytes */{size}")
+                    return
+                if range_start is not None and range_start < 0:
+                    range_start = max(0, range_start + size)
+                if range_end is not None and range_end > size:
+                    range_end = size
+                start, end = range_start or 0, range_end or size
+                # only return HTTP 206 if less than the entire file has been requested
+                if end - start != size:
+                    h_request.set_status(206)  # Partial Content
+                    h_request.set_header("Content-Range", httputil._get_content_range(start, end, size))
+
+        h_request.set_header("Content-Length", end - start)
+        if h_request.request.method != 'HEAD':
+            fp = open_file()
+            if isawaitable(fp):
+                fp = await fp
+            if fp is None:
+                # deleted since its metadata was read
+                raise HTTP404NotFoundError(BasicErrorCodes.GENERAL_NOT_FOUND)
+            if fp.length != size or fp.md5 != md5:
+                # replaced since its metadata was read, headers are built again from the file itself
+                h_request.clear()
+                return await ReqUtils.send_file(h_request, fp, cache_time, chunk_size, read_ahead)
+            files_config = h_request.config.files if isinstance(h_request, RestHandler) else None
+            if chunk_size is None:
+                chunk_size = files_config.chunk_size if files_config else fp.chunk_size
+            if read_ahead is None:
+                read_ahead = files_config.read_ahead if files_config else False
+            await ReqUtils._stream_file(h_request, fp, start, end, chunk_size, read_ahead)
         h_request.finish()
 
+    @staticmethod
+    def _if_range_matches(if_range: Optional[str], md5: str, modified: datetime) -> bool:
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/"')):
+            # weak validators are not allowed for If-Range
+            return if_range == f'"{md5}"'
+
+        date_tuple = email.utils.parsedate(if_range)
+        if date_tuple is None:
+            return False
+        return datetime.fromtimestamp(time.mktime(date_tuple)).replace(tzinfo=modified.tzinfo) == modified
+
+    @staticmethod
+    async def _stream_file(h_request: RequestHandler, fp: 'GridOut', start: int, end: int, chunk_size: int, read_ahead: bool):
+        # At most two chunks are kept in memory: one being written to the client and, with read_ahead, the next one being read from GridFS.
+        # Every chunk waits for flush(), so a slow client slows down reading instead of piling up data in the write buffer.
+        if start:
+            fp.seek(start)
+        remaining = end - start
+        pending = convert_yielded(_read_chunk(fp, min(chunk_size, remaining))) if remaining > 0 else None
+
+        while pending is not None:
+            chunk = await pending
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+            pending = convert_yielded(_read_chunk(fp, min(chunk_size, remaining))) if read_ahead and remaining > 0 else None
+            h_request.write(chunk)
+            await h_request.flush()
+            if pending is None and remaining > 0:
+                pending = convert_yielded(_read_chunk(fp, min(chunk_size, remaining)))
+
 
 class NotFoundRestHandler(RestHandler):
     async def prepare(self):
@@ -358,3 +710,28 @@ class NotFoundRestHandler(RestHandler):
 
     def check_xsrf_cookie(self):
         pass
+
+
+class MetricsHandler(RestHandler):
+    """Metrics of all worker processes in Prometheus text format, add to routing with ``url(r'/metrics', MetricsHandler)``"""
+
+    async def get(self):
+        self.set_header('Content-Type', METRICS_CONTENT_TYPE)
+        self.finish(METRICS.render().encode('utf-8'))
+
+
+class ReadinessHandler(RestHandler):
+    """Readiness of the worker for load balancer, add to routing with ``url(r'/ready', ReadinessHandler)``.
+
+    Answers 200 once services started and warmed up and health checks of all of them pass, 503 with errors of the failing
+    ones by their DI key otherwise, as well as before services started and during shutdown.
+    """
+
+    async def get(self):
+        app = self.application
+        if not app.ready:
+            raise HTTP503ServiceUnavailableError(details={'ready': False}, retry_after=1)
+        errors = await app.check_services(self.config.web.health_timeout)
+        if errors:
+            raise HTTP503ServiceUnavailableError(details={'ready': True, 'services': errors}, retry_after=1)
+        self.return_ok({'ready': True})
@@ -9,13 +9,14 @@ import unicodedata
 from calendar import timegm
 from datetime import datetime, timedelta
 from random import randint
-from typing import Optional, Union
+from typing import Optional, Union, TYPE_CHECKING
 from uuid import uuid4, UUID
 
-from bson import ObjectId
-
 from maio.core import iso8601
 
+if TYPE_CHECKING:
+    from bson import ObjectId
+
 PHONE_RE = re.compile(r'^\+?([0-9 ])+$')
 PHONE_9_RE = re.compile(r'^\+?([0-9 ]){9}$')
 TAG_RE = re.compile(r'(<!--.*?-->|<[^>]*>)')
@@ -34,7 +35,16 @@ def parse_uuid(str_uuid: str, default=None) -> UUID:
         return default
 
 
-def parse_objectId(str_objectId: str, default=None) -> ObjectId:
+def __getattr__(name: str):
+    # bson (part of pymongo) is imported on first use, see benchmarks/import_time.py
+    if name == 'ObjectId':
+        from bson import ObjectId
+        return ObjectId
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def parse_objectId(str_objectId: str, default=None) -> 'ObjectId':
+    from bson import ObjectId
     try:
         return ObjectId(str_objectId.decode() if isinstance(str_objectId, bytes) else str_objectId)
     except (ValueError, TypeError, AttributeError):
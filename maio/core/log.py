@@ -1,8 +1,12 @@
 # coding=utf-8
+import atexit
 import logging.handlers
-from logging import Formatter
+import multiprocessing
+import os
+import queue
+from logging import Formatter, Handler, LogRecord
 from os import path
-from typing import Union, Tuple, List
+from typing import Union, Tuple, List, Dict, Optional
 
 LOG_TORNADO_ACCESS = 'tornado.access'
 LOG_TORNADO_APPLICATION = 'tornado.application'
@@ -11,35 +15,151 @@ LOG_TORNADO_GENERAL = 'tornado.general'
 LOG_EXCEPTIONS = 'app.exception'
 LOG_MAIN = 'app.main'
 LOG_EMAIL = 'app.email'
+LOG_SLOW = 'app.slow'
 
-_DEFAULT_LOGS = (LOG_TORNADO_ACCESS, LOG_TORNADO_APPLICATION, LOG_TORNADO_GENERAL, LOG_MAIN, LOG_EXCEPTIONS)
+_DEFAULT_LOGS = (LOG_TORNADO_ACCESS, LOG_TORNADO_APPLICATION, LOG_TORNADO_GENERAL, LOG_MAIN, LOG_EXCEPTIONS, LOG_SLOW)
 _ALL_LOGS = _DEFAULT_LOGS + (LOG_EMAIL,)
 
+QUEUE_DROP_NEW = 'drop_new'
+QUEUE_DROP_OLDEST = 'drop_oldest'
+
+
+class _QueueStats:
+    __slots__ = ('enqueued', 'dropped')
+
+    def __init__(self) -> None:
+        self.enqueued = 0
+        self.dropped = 0
+
+
+# counters of the current process, forked workers start from the values of the parent
+_QUEUE_STATS = _QueueStats()
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Puts records to the bounded queue without ever blocking, records which do not fit are dropped and counted."""
+
+    def __init__(self, log_queue, log_name: str, drop_policy: str) -> None:
+        super().__init__(log_queue)
+        self._log_name = log_name
+        self._drop_oldest = drop_policy == QUEUE_DROP_OLDEST
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record = super().prepare(record)
+        # records from child loggers are written to the file of the logger this handler is attached to
+        record.log_route = self._log_name
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            _QUEUE_STATS.enqueued += 1
+            return
+        except queue.Full:
+            pass
+
+        if self._drop_oldest:
+            try:
+                self.queue.get_nowait()
+                _QUEUE_STATS.dropped += 1
+            except queue.Empty:
+                pass
+            # another worker sharing the queue may take the freed slot first, then the new record is lost as well
+            try:
+                self.queue.put_nowait(record)
+                _QUEUE_STATS.enqueued += 1
+                return
+            except queue.Full:
+                pass
+        _QUEUE_STATS.dropped += 1
+
+
+class _RoutingQueueListener(logging.handlers.QueueListener):
+    def __init__(self, log_queue, routes: Dict[str, List[Handler]]) -> None:
+        super().__init__(log_queue, respect_handler_level=True)
+        self._routes = routes
+
+    def enqueue_sentinel(self) -> None:
+        # queue may be full at exit, listener keeps draining it so waiting here is safe
+        self.queue.put(self._sentinel, timeout=5)
+
+    def handle(self, record: LogRecord) -> None:
+        record = self.prepare(record)
+        for handler in self._routes.get(getattr(record, 'log_route', record.name), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _QueuedLogging:
+    """Single listener thread writing records of all worker processes.
+
+    Queue is created before `RestAPIApp.start` forks workers, so every worker only enqueues records and the listener
+    running in the parent process is the only one writing and rotating log files.
+    """
+    __slots__ = ('queue', 'routes', 'listener', '_pid')
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue = multiprocessing.Queue(queue_size)
+        self.routes: Dict[str, List[Handler]] = {}
+        self.listener = _RoutingQueueListener(self.queue, self.routes)
+        self.listener.start()
+        self._pid = os.getpid()
+        atexit.register(self.stop)
+        # feeder thread of the queue does not survive os.fork, without a new one records of a worker stay in its buffer forever
+        os.register_at_fork(after_in_child=self.queue._after_fork)
+
+    def stop(self) -> None:
+        # atexit handlers are inherited by forked workers, only the process which started the listener can stop it
+        if os.getpid() == self._pid and self.listener._thread is not None:
+            self.listener.stop()
+
+
+_QUEUED_LOGGING: Optional[_QueuedLogging] = None
+
+
+def get_logging_stats() -> Dict[str, int]:
+    return {'enqueued': _QUEUE_STATS.enqueued, 'dropped': _QUEUE_STATS.dropped}
+
 
 def defineLogging(log_config, logs_to_define: Union[List, Tuple, str] = None):
+    global _QUEUED_LOGGING
+
     formatter = logging.Formatter(log_config.logformat)
     to_file = log_config.output_file is True
     to_console = log_config.output_console is True
 
+    pipeline = None
+    if log_config.queued:
+        if _QUEUED_LOGGING is None:
+            _QUEUED_LOGGING = _QueuedLogging(log_config.queue_size)
+        pipeline = _QUEUED_LOGGING
+
     if not logs_to_define:
         logs_to_define = _DEFAULT_LOGS
 
     if logs_to_define:
-        if isinstance(logs_to_define, (list, set, tuple)):
-            for log_name in logs_to_define:
-                _init_single_log(formatter, log_config.level, log_name, log_config.relpath, to_console, to_file)
-        else:
-            _init_single_log(formatter, log_config.level, logs_to_define, log_config.relpath, to_console, to_file)
+        if not isinstance(logs_to_define, (list, set, tuple)):
+            logs_to_define = (logs_to_define,)
+        for log_name in logs_to_define:
+            handlers = _init_single_log(formatter, log_config.level, log_name, log_config.relpath, to_console, to_file, pipeline is None)
+            if pipeline is not None and handlers:
+                pipeline.routes.setdefault(log_name, []).extend(handlers)
+                logging.getLogger(log_name).addHandler(_BoundedQueueHandler(pipeline.queue, log_name, log_config.queue_drop_policy))
 
 
-def _init_single_log(formatter: Formatter, log_level: int, log_name: str, log_path: str, to_console: bool, to_file: bool):
+def _init_single_log(formatter: Formatter, log_level: int, log_name: str, log_path: str, to_console: bool, to_file: bool, attach: bool = True) -> List[Handler]:
     logger = logging.getLogger(log_name)
     logger.setLevel(log_level)
+    handlers = []
     if to_file:
         lh = logging.handlers.RotatingFileHandler(path.join(log_path, '{}.log'.format(log_name)), maxBytes=10000000, backupCount=5)
         lh.setFormatter(formatter)
-        logger.addHandler(lh)
+        handlers.append(lh)
     if to_console:
         lh = logging.StreamHandler()
         lh.setFormatter(formatter)
-        logger.addHandler(lh)
+        handlers.append(lh)
+    if attach:
+        for lh in handlers:
+            logger.addHandler(lh)
+    return handlers
@@ -0,0 +1,257 @@
+# coding=utf-8
+import json
+import os
+from bisect import bisect_left
+from glob import glob
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_SNAPSHOT_PATTERN = 'metrics_*.json'
+
+Number = Union[int, float]
+
+
+class _Metric:
+    """Values are kept in plain dict keyed by tuple of label values.
+
+    Every worker process has its own registry and updates it only from the IOLoop thread, so no locking is needed.
+    """
+    __slots__ = ('name', 'help', 'labels', '_values')
+
+    TYPE: str = None
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, Any] = {}
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def get(self, labels: Tuple = ()) -> Any:
+        return self._values.get(labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'help': self.help, 'labels': self.labels, 'values': [[list(k), v] for k, v in self._values.items()]}
+
+
+class Counter(_Metric):
+    __slots__ = ()
+
+    TYPE = 'counter'
+
+    def inc(self, labels: Tuple = (), amount: Number = 1) -> None:
+        values = self._values
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    __slots__ = ()
+
+    TYPE = 'gauge'
+
+    def inc(self, labels: Tuple = (), amount: Number = 1) -> None:
+        values = self._values
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, labels: Tuple = (), amount: Number = 1) -> None:
+        values = self._values
+        values[labels] = values.get(labels, 0) - amount
+
+    def set(self, labels: Tuple = (), value: Number = 0) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    __slots__ = ('buckets',)
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        # per bucket (not cumulative) counts, last bucket is +Inf, followed by the sum of observed values
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot['buckets'] = self.buckets
+        return snapshot
+
+
+class MetricsRegistry:
+    """Per-process metrics with optional aggregation over forked workers.
+
+    With ``directory`` set every worker periodically dumps its values to ``metrics_<pid>.json`` file there and
+    `collect` merges files of all workers: counters and histograms are summed, including workers which already exited,
+    gauges only for the living ones.
+    """
+    __slots__ = ('_metrics', 'directory', 'enabled')
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self.directory: Optional[str] = None
+        self.enabled = True
+
+    def _register(self, clazz, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = clazz(name, *args, **kwargs)
+        elif not isinstance(metric, clazz):
+            raise ValueError(f'Metric "{name}" is already registered as {metric.TYPE}')
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def set_directory(self, directory: Optional[str], clean: bool = False) -> None:
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if directory and clean:
+            for file_path in glob(os.path.join(directory, _SNAPSHOT_PATTERN)):
+                os.remove(file_path)
+
+    def write_snapshot(self) -> None:
+        if not self.directory:
+            return
+        pid = os.getpid()
+        file_path = os.path.join(self.directory, f'metrics_{pid}.json')
+        tmp_path = f'{file_path}.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({'pid': pid, 'metrics': self.snapshot()}, fp)
+        os.replace(tmp_path, file_path)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        if not self.directory:
+            return self.snapshot()
+
+        self.write_snapshot()
+        snapshots = []
+        for file_path in glob(os.path.join(self.directory, _SNAPSHOT_PATTERN)):
+            try:
+                with open(file_path) as fp:
+                    snapshots.append(json.load(fp))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+    def render(self) -> str:
+        return render_text(self.collect())
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    merged: Dict[str, Dict[str, Any]] = {}
+    current_pid = os.getpid()
+    for snapshot in snapshots:
+        alive = None
+        for name, metric in snapshot['metrics'].items():
+            if metric['type'] == Gauge.TYPE:
+                if alive is None:
+                    alive = snapshot['pid'] == current_pid or _is_alive(snapshot['pid'])
+                if not alive:
+                    continue
+
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = dict(metric, values={})
+            values = target['values']
+            for labels, value in metric['values']:
+                labels = tuple(labels)
+                current = values.get(labels)
+                if current is None:
+                    values[labels] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    for i, v in enumerate(value):
+                        current[i] += v
+                else:
+                    values[labels] = current + value
+
+    for metric in merged.values():
+        metric['values'] = list(metric['values'].items())
+    return merged
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: Number) -> str:
+    return str(int(value)) if value == int(value) else repr(float(value))
+
+
+def _le_label(bound: Optional[float]) -> str:
+    return 'le="%s"' % ('+Inf' if bound is None else _format_value(bound))
+
+
+def render_text(metrics: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text exposition format, version 0.0.4"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        names = tuple(metric['labels'])
+        for labels, value in sorted(metric['values'], key=lambda item: tuple(map(str, item[0]))):
+            labels = tuple(labels)
+            if metric['type'] != Histogram.TYPE:
+                lines.append(f'{name}{_format_labels(names, labels)} {_format_value(value)}')
+                continue
+
+            total = 0
+            for bound, count in zip(metric['buckets'], value):
+                total += count
+                lines.append(f'{name}_bucket{_format_labels(names, labels, _le_label(bound))} {total}')
+            total += value[-2]
+            lines.append(f'{name}_bucket{_format_labels(names, labels, _le_label(None))} {total}')
+            lines.append(f'{name}_sum{_format_labels(names, labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(names, labels)} {total}')
+    lines.append('')
+    return '\n'.join(lines)
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', 'Finished HTTP requests', ('route', 'method', 'status'))
+HTTP_REQUEST_DURATION = REGISTRY.histogram('http_request_duration_seconds', 'HTTP request processing time', ('route', 'method', 'status'))
+HTTP_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'HTTP requests being processed', ('route',))
+MONGO_OPERATION_DURATION = REGISTRY.histogram('mongo_operation_duration_seconds', 'MongoRepository operation time', ('collection', 'operation'))
@@ -1,9 +1,13 @@
 # coding=utf-8
+import functools
+import time
+from datetime import datetime
+from inspect import isawaitable
 from io import BytesIO, StringIO
-from typing import Any, AsyncIterable, Awaitable, Dict, List, Optional, Tuple, Type, TypeVar, Union, ClassVar
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Type, TypeVar, Union, ClassVar
 
 from bson import ObjectId
-from gridfs import GridFS, GridFSBucket
+from gridfs import GridFS, GridFSBucket, NoFile
 from motor import MotorClient, MotorDatabase, MotorGridFSBucket
 from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument
 from pymongo.collection import Collection
@@ -11,9 +15,14 @@ from pymongo.command_cursor import CommandCursor
 from pymongo.cursor import Cursor
 from pymongo.database import Database
 from pymongo.results import DeleteResult, InsertOneResult, UpdateResult
+from tornado import gen
 
+from maio.core.cache import LRUCache
 from maio.core.data import Document, VO
 from maio.core.di import DI, ApiService
+from maio.core.metrics import MONGO_OPERATION_DURATION, REGISTRY as METRICS
+from maio.core.offload import run_in_thread
+from maio.core.timing import STAGE_MONGO, RequestTimer, current_timer
 
 T = TypeVar('T')
 
@@ -73,12 +82,14 @@ class DocumentMongoMapper(AbstractMapper):
 
 
 class MongoConfig(VO):
-    __slots__ = ('uri', 'params', 'database')
+    __slots__ = ('uri', 'params', 'database', 'warmup_connections')
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.uri = None
         self.params = None
         self.database = None
+        # pool connections opened by warmup before the worker accepts requests
+        self.warmup_connections = 4
         if config:
             self.from_dict(config)
 
@@ -100,6 +111,24 @@ class AbstractMongoConnection(ApiService):
     def getClient(self, refresh: bool = False):
         raise NotImplementedError()
 
+    async def ping(self) -> None:
+        raise NotImplementedError()
+
+    async def warmup(self) -> None:
+        # concurrent commands check out separate sockets, so they stay open in the pool for the first requests
+        connections = getattr(self._config, 'warmup_connections', None) or 1
+        await gen.multi([self.ping() for _ in range(connections)])
+
+    async def health(self) -> bool:
+        await self.ping()
+        return True
+
+    def close(self) -> None:
+        if self._db_client is not None:
+            self._db_client.close()
+            self._db_client = None
+        self._file_client = None
+
     def getDatabase(self):
         raise NotImplementedError()
 
@@ -168,10 +197,31 @@ class MongoUtils(object):
             db[collection].drop()
 
 
+class FileMeta(NamedTuple):
+    """GridFS file document fields needed to answer conditional and range requests."""
+    file_id: Any
+    filename: str
+    length: int
+    chunk_size: int
+    upload_date: datetime
+    md5: Optional[str]
+    content_type: Optional[str]
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> 'FileMeta':
+        content_type = doc.get('contentType')
+        if not content_type and doc.get('metadata'):
+            content_type = doc['metadata'].get('contentType')
+        return cls(doc['_id'], doc.get('filename'), doc['length'], doc.get('chunkSize'), doc['uploadDate'], doc.get('md5'), content_type)
+
+
 class MongoFileStorage(object):
     __bucket__ = None
     __grid_fs__ = None
     __bucketName__: str = 'fs'
+    # file metadata cache, kept per worker process
+    __metaCacheSize__: int = 1024
+    __metaCacheTTL__: int = 300
 
     @classmethod
     def connection(cls) -> AbstractMongoConnection:
@@ -190,7 +240,59 @@ class MongoFileStorage(object):
         return cls.__grid_fs__
 
     @classmethod
-    def uploadFile(cls, filename: str, file_data: Union[bytes, str], content_type: str, metadata: dict = None) -> Union[ObjectId, Awaitable[ObjectId]]:
+    def _meta_cache(cls) -> LRUCache:
+        cache = cls.__dict__.get('_file_meta_cache')
+        if cache is None:
+            cache = LRUCache(cls.__metaCacheSize__, cls.__metaCacheTTL__)
+            cls._file_meta_cache = cache
+        return cache
+
+    @classmethod
+    def _invalidate_meta(cls, file_id: Any, result: Any = None) -> None:
+        cls._meta_cache().pop(file_id)
+        if hasattr(result, 'add_done_callback'):
+            # drop metadata cached by requests that were served while the operation was running
+            result.add_done_callback(lambda _: cls._meta_cache().pop(file_id))
+
+    @classmethod
+    async def getFileMeta(cls, file_id: Any) -> Optional[FileMeta]:
+        cache = cls._meta_cache()
+        meta = cache.get(file_id)
+        if meta is None:
+            doc = cls.connection().getDatabase()[f'{cls.__bucketName__}.files'].find_one({'_id': file_id})
+            if isawaitable(doc):
+                doc = await doc
+            if doc is None:
+                return None
+            meta = FileMeta.from_document(doc)
+            cache.set(file_id, meta)
+        return meta
+
+    @classmethod
+    def openFile(cls, file_id: Any):
+        return cls.bucket().open_download_stream(file_id)
+
+    @classmethod
+    async def openVerifiedFile(cls, meta: FileMeta):
+        """Opens file of cached ``meta``, None when it was deleted meanwhile.
+
+        Other workers invalidate only their own cache, so metadata of a file they replaced or deleted is dropped here and the
+        caller has to use values of the returned file.
+        """
+        try:
+            fp = cls.openFile(meta.file_id)
+            if isawaitable(fp):
+                fp = await fp
+        except NoFile:
+            cls._invalidate_meta(meta.file_id)
+            return None
+        if fp.length != meta.length or fp.md5 != meta.md5:
+            cls._invalidate_meta(meta.file_id)
+        return fp
+
+    @classmethod
+    def uploadFile(cls, filename: str, file_data: Union[bytes, str], content_type: str, metadata: dict = None,
+                   file_id: Any = None) -> Union[ObjectId, Awaitable[ObjectId]]:
         if content_type:
             if metadata:
                 metadata['contentType'] = content_type
@@ -199,11 +301,137 @@ class MongoFileStorage(object):
                     'contentType': content_type
                 }
         stream = BytesIO(file_data) if isinstance(file_data, bytes) else StringIO(file_data)
-        return cls.bucket().upload_from_stream(filename, source=stream, metadata=metadata)
+        if file_id is None:
+            return cls.bucket().upload_from_stream(filename, source=stream, metadata=metadata)
+
+        result = cls.bucket().upload_from_stream_with_id(file_id, filename, source=stream, metadata=metadata)
+        cls._invalidate_meta(file_id, result)
+        return result
 
     @classmethod
     def delete(cls, file_id: ObjectId):
-        return cls.bucket().delete(file_id)
+        result = cls.bucket().delete(file_id)
+        cls._invalidate_meta(file_id, result)
+        return result
+
+
+_WRITE_LISTENERS: List[Callable[[str], None]] = []
+
+
+def _operation(write: bool = False):
+    # times the operation by collection and, for writes, notifies write listeners with the collection name when operation is issued
+    # and, for async operations, once more when it completes
+    def decorator(fn):
+        operation = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(cls, *args, **kwargs):
+            timer = current_timer()
+            started = time.perf_counter() if METRICS.enabled or timer is not None else None
+            result = fn(cls, *args, **kwargs)
+            if write and _WRITE_LISTENERS:
+                cls._notify_write(result)
+            if started is not None:
+                cls._observe_operation(operation, started, result, timer)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+_read_operation = _operation()
+_write_operation = _operation(write=True)
+
+
+class _TimedCursor:
+    """Cursor of find or aggregate, time of fetching rows is added to the request timer as they are fetched and observed by
+    operation metrics once the cursor is exhausted. Other attributes come from the wrapped cursor.
+    """
+    __slots__ = ('_cursor', '_iterator', '_labels', '_timer', '_elapsed', '_observed')
+
+    def __init__(self, cursor: Any, labels: Tuple[str, str], timer: Optional[RequestTimer]) -> None:
+        self._cursor = cursor
+        self._iterator = None
+        self._labels = labels
+        self._timer = timer
+        self._elapsed = 0.0
+        self._observed = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._cursor)
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = next(self._iterator)
+        except Exception:
+            self._add(started, True)
+            raise
+        self._add(started, False)
+        return row
+
+    def _add(self, started: float, exhausted: bool) -> None:
+        elapsed = time.perf_counter() - started
+        self._elapsed += elapsed
+        if self._timer is not None:
+            self._timer.add(STAGE_MONGO, elapsed)
+        if exhausted and not self._observed and METRICS.enabled:
+            self._observed = True
+            MONGO_OPERATION_DURATION.observe(self._labels, self._elapsed)
+
+
+class _TimedAsyncCursor(_TimedCursor):
+    """`_TimedCursor` of motor cursors"""
+    __slots__ = ()
+
+    def __aiter__(self):
+        if self._iterator is None:
+            self._iterator = self._cursor.__aiter__()
+        return self
+
+    async def __anext__(self):
+        started = time.perf_counter()
+        try:
+            row = await self._iterator.__anext__()
+        except Exception:
+            self._add(started, True)
+            raise
+        self._add(started, False)
+        return row
+
+    async def to_list(self, length: Optional[int]) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            rows = await self._cursor.to_list(length)
+        except Exception:
+            self._add(started, True)
+            raise
+        self._add(started, not length or len(rows) < length)
+        return rows
+
+
+def _cursor_operation(fn):
+    # find and aggregate return lazy cursors, so besides the call the cursor is timed while rows are fetched
+    operation = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(cls, *args, **kwargs):
+        timer = current_timer()
+        if timer is None and not METRICS.enabled:
+            return fn(cls, *args, **kwargs)
+        started = time.perf_counter()
+        cursor = fn(cls, *args, **kwargs)
+        timed = (_TimedAsyncCursor if hasattr(cursor, '__aiter__') else _TimedCursor)(cursor, (cls.__collection__, operation), timer)
+        timed._add(started, False)
+        return timed
+
+    return wrapper
 
 
 class MongoRepository:
@@ -236,6 +464,7 @@ class MongoRepository:
         return cls.connection().getDatabase()[cls.__collection__]
 
     @classmethod
+    @_write_operation
     def dropCollection(cls) -> None:
         cls.getCollection().drop()
 
@@ -247,20 +476,58 @@ class MongoRepository:
     def _set(data: Dict) -> Dict[str, Dict]:
         return {'$set': data}
 
+    @staticmethod
+    def add_write_listener(listener: Callable[[str], None]) -> None:
+        if listener not in _WRITE_LISTENERS:
+            _WRITE_LISTENERS.append(listener)
+
+    @staticmethod
+    def remove_write_listener(listener: Callable[[str], None]) -> None:
+        if listener in _WRITE_LISTENERS:
+            _WRITE_LISTENERS.remove(listener)
+
+    @classmethod
+    def _notify_write(cls, result: Any) -> None:
+        collection = cls.__collection__
+        for listener in tuple(_WRITE_LISTENERS):
+            listener(collection)
+
+        if hasattr(result, 'add_done_callback'):
+            result.add_done_callback(lambda _: [listener(collection) for listener in tuple(_WRITE_LISTENERS)])
+
+    @classmethod
+    def _observe_operation(cls, operation: str, started: float, result: Any, timer: Optional[RequestTimer] = None) -> None:
+        labels = (cls.__collection__, operation)
+
+        def observe(_=None):
+            elapsed = time.perf_counter() - started
+            if METRICS.enabled:
+                MONGO_OPERATION_DURATION.observe(labels, elapsed)
+            if timer is not None:
+                timer.add(STAGE_MONGO, elapsed)
+
+        if hasattr(result, 'add_done_callback'):
+            result.add_done_callback(observe)
+        else:
+            observe()
+
     # aggregate
 
     @classmethod
+    @_cursor_operation
     def aggregate(cls, pipeline: List, **kwargs) -> CommandCursor:
         return cls.getCollection().aggregate(pipeline, **kwargs)
 
     # find methods
 
     @classmethod
+    @_read_operation
     def findOne(cls, filtering: Dict[str, Any], sort: Optional[List[Tuple[str, int]]] = None, projection: Optional[Dict[str, bool]] = None) \
             -> Optional[Union[Awaitable[Dict[str, Any]], Document]]:
         return cls.connection().find_one(cls, filtering, sort=sort, projection=projection)
 
     @classmethod
+    @_cursor_operation
     def find(cls, filtering=None, sort: Optional[List[Tuple[str, int]]] = None, limit: Optional[int] = None, skip: Optional[int] = None,
              collation: Optional[str] = None, projection: Optional[Dict[str, bool]] = None) -> Cursor:
         cursor = cls.getCollection().find(filtering, projection=projection)
@@ -303,18 +570,21 @@ class MongoRepository:
         return cls.findOneAndUpdateEx(filtering, cls._set(set_changes), return_first)
 
     @classmethod
+    @_write_operation
     def findOneAndUpdateEx(cls, filtering: Dict[str, Any], update: Dict[str, Any],
                            return_first: bool = True, upsert: bool = False) -> Optional[Union[Awaitable[Dict[str, Any]], Dict[str, Any]]]:
         r = ReturnDocument.BEFORE if return_first else ReturnDocument.AFTER
         return cls.getCollection().find_one_and_update(filtering, update, return_document=r, upsert=upsert)
 
     @classmethod
+    @_read_operation
     def count(cls, filtering: Dict[str, Any]) -> Union[Awaitable[int], int]:
         return cls.getCollection().count_documents(filtering)
 
     # insert
 
     @classmethod
+    @_write_operation
     def insert(cls, data: Document, enforce_id: bool = True) -> Union[Awaitable[InsertOneResult], InsertOneResult]:
         m_data = cls.__mapper__.serialize(data)
 
@@ -334,6 +604,7 @@ class MongoRepository:
         return cls.updateOrInsertEx(filtering, cls._set(set_changes), set_on_insert)
 
     @classmethod
+    @_write_operation
     def updateOrInsertEx(cls, filtering: Dict[str, Any], changes: Dict[str, Any],
                          set_on_insert: Dict[str, Any]) -> Union[Awaitable[UpdateResult], UpdateResult]:
         if set_on_insert:
@@ -355,6 +626,7 @@ class MongoRepository:
         return cls.updateOneEx(filtering, cls._set(set_changes))
 
     @classmethod
+    @_write_operation
     def updateOneEx(cls, filtering: Dict[str, Any], changes: Dict[str, Any]) -> Union[Awaitable[UpdateResult], UpdateResult]:
         return cls.getCollection().update_one(filtering, changes)
 
@@ -363,28 +635,34 @@ class MongoRepository:
         return cls.updateManyEx(filtering, cls._set(set_changes))
 
     @classmethod
+    @_write_operation
     def updateManyEx(cls, filtering: Dict[str, Any], changes: Dict[str, Any]) -> Union[Awaitable[UpdateResult], UpdateResult]:
         return cls.getCollection().update_many(filtering, changes)
 
     # delete
 
     @classmethod
+    @_write_operation
     def delete(cls, key_id: Any) -> Union[Awaitable[DeleteResult], DeleteResult]:
         return cls.getCollection().delete_one({cls.getIdName(): key_id})
 
     @classmethod
+    @_write_operation
     def deleteOne(cls, filtering: Dict[str, Any]) -> Union[Awaitable[DeleteResult], DeleteResult]:
         return cls.getCollection().delete_one(filtering)
 
     @classmethod
+    @_write_operation
     def deleteKeys(cls, key_ids: List[Any]) -> Union[Awaitable[DeleteResult], DeleteResult]:
-        return cls.getCollection().delete_many({cls.getIdName(): cls._in(key_ids)})
+        return cls.getCollection().delete_many({cls.getIdName(): MongoUtils.match_in(key_ids)})
 
     @classmethod
+    @_write_operation
     def deleteManyEx(cls, filtering: Dict[str, Any]) -> Union[Awaitable[DeleteResult], DeleteResult]:
         return cls.getCollection().delete_many(filtering)
 
     @classmethod
+    @_write_operation
     def purge(cls) -> Union[Awaitable[DeleteResult], DeleteResult]:
         return cls.getCollection().delete_many({})
 
@@ -406,6 +684,9 @@ class MongoAsyncConnection(AbstractMongoConnection):
     def getDatabase(self) -> MotorDatabase:
         return self.getClient()[self._config.database]
 
+    async def ping(self) -> None:
+        await self.getClient().admin.command('ping')
+
     def getFileBucket(self, bucket_name: str = 'fs') -> MotorGridFSBucket:
         return MotorGridFSBucket(self.getDatabase(), collection=bucket_name)
 
@@ -438,6 +719,9 @@ class MongoSyncConnection(AbstractMongoConnection):
     def getDatabase(self) -> Database:
         return self.getClient()[self._config.database]
 
+    async def ping(self) -> None:
+        await run_in_thread(self.getClient().admin.command, 'ping')
+
     def getFileBucket(self, bucket_name: str = 'fs') -> GridFSBucket:
         return GridFSBucket(self.getDatabase(), bucket_name=bucket_name)
 
@@ -0,0 +1,52 @@
+# coding=utf-8
+import functools
+# executors are loaded by concurrent.futures on first attribute access, ProcessPoolExecutor pulls in multiprocessing
+from concurrent import futures
+from typing import Any, Callable, Optional
+
+from tornado.ioloop import IOLoop
+
+
+class _Pools:
+    thread: Optional[futures.Executor] = None
+    process: Optional[futures.Executor] = None
+
+
+def start_pools(threads: int = 0, processes: int = 0) -> None:
+    """Creates executors of the current process, `RestAPIApp.start` calls it in every worker after fork"""
+    shutdown_pools()
+    if threads:
+        _Pools.thread = futures.ThreadPoolExecutor(threads, thread_name_prefix='offload')
+    if processes:
+        _Pools.process = futures.ProcessPoolExecutor(processes)
+
+
+def shutdown_pools(wait: bool = False) -> None:
+    for pool in (_Pools.thread, _Pools.process):
+        if pool is not None:
+            pool.shutdown(wait=wait)
+    _Pools.thread = None
+    _Pools.process = None
+
+
+def has_process_pool() -> bool:
+    return _Pools.process is not None
+
+
+def run_in_thread(fn: Callable, *args, **kwargs) -> Any:
+    """Runs ``fn`` in offload thread pool, or in the IOLoop default one when pools were not started.
+
+    Helps only work which releases the GIL (I/O, hashlib, zlib) or pure python code, which gives it back to the IOLoop every
+    switch interval. A single C call holding the GIL, like ``json.loads``, stalls the IOLoop until it returns, use `run_in_process`.
+    """
+    return IOLoop.current().run_in_executor(_Pools.thread, functools.partial(fn, *args, **kwargs))
+
+
+def run_in_process(fn: Callable, *args, **kwargs) -> Any:
+    """Runs ``fn`` in offload process pool, falls back to `run_in_thread` without one.
+
+    Function and arguments have to be picklable, worth it only when the work outweighs copying of arguments and result.
+    """
+    if _Pools.process is None:
+        return run_in_thread(fn, *args, **kwargs)
+    return IOLoop.current().run_in_executor(_Pools.process, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,80 @@
+# coding=utf-8
+import logging
+import os
+import random
+from typing import Dict, Optional, TYPE_CHECKING
+
+from maio.core.log import LOG_MAIN
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+
+class RequestProfiler:
+    """Profiles sampled requests with cProfile and aggregates the stats by route name.
+
+    At most one request per worker is profiled at a time. cProfile records everything the worker executes, so callbacks of
+    other requests interleaved on the IOLoop while the sampled one awaits are included in its stats as well.
+
+    Stats are dumped to ``profile.<route>.<pid>.pstats`` files, dumps of all workers can be loaded at once with
+    ``pstats.Stats(*glob('logs/profile.UsersHandler.*.pstats'))``.
+    """
+    __slots__ = ('enabled', 'sample_rate', 'directory', '_active', '_stats', '_requests', '_dirty')
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sample_rate = 0.01
+        self.directory: Optional[str] = None
+        self._active: Optional['cProfile.Profile'] = None
+        self._stats: Dict[str, 'pstats.Stats'] = {}
+        self._requests: Dict[str, int] = {}
+        self._dirty = False
+
+    def start_request(self) -> Optional['cProfile.Profile']:
+        if not self.enabled or self._active is not None or random.random() >= self.sample_rate:
+            return None
+        import cProfile
+        profile = self._active = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish_request(self, route: str, profile: 'cProfile.Profile') -> None:
+        profile.disable()
+        if self._active is profile:
+            self._active = None
+
+        stats = self._stats.get(route)
+        if stats is None:
+            import pstats
+            self._stats[route] = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+        self._requests[route] = self._requests.get(route, 0) + 1
+        self._dirty = True
+
+    def toggle(self) -> None:
+        self.enabled = not self.enabled
+        logging.getLogger(LOG_MAIN).warning('Request profiling %s in process %d', 'enabled' if self.enabled else 'disabled', os.getpid())
+        if not self.enabled:
+            self.dump()
+
+    def dump(self) -> None:
+        if not self._dirty or not self.directory:
+            return
+        pid = os.getpid()
+        for route, stats in self._stats.items():
+            stats.dump_stats(os.path.join(self.directory, f'profile.{route}.{pid}.pstats'))
+        self._dirty = False
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self._requests.clear()
+        self._dirty = False
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        return dict(self._requests)
+
+
+PROFILER = RequestProfiler()
@@ -0,0 +1,116 @@
+# coding=utf-8
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+from hashlib import blake2b
+from typing import Any, Dict, Optional, Tuple, Union
+
+from maio.core.metrics import REGISTRY as METRICS
+
+RATE_LIMIT_DECISIONS = METRICS.counter('rate_limit_decisions_total', 'Requests allowed or limited by route rate limit', ('route', 'decision'))
+
+_SLOT = struct.Struct('=Qdd')
+
+
+class SharedBucketTable:
+    """Token buckets of all worker processes in anonymous shared memory.
+
+    Table has to be created before workers are forked. Slots are split into groups of ``ways`` slots, key is looked up only
+    in its own group, so every lookup reads at most ``ways`` slots and holds only the lock of that group's stripe.
+    When the group is full, bucket updated least recently is replaced, which keeps memory bounded under client churn.
+    """
+    __slots__ = ('_groups', '_ways', '_memory', '_locks', 'evictions')
+
+    def __init__(self, slots: int = 65536, ways: int = 8, stripes: int = 64) -> None:
+        self._ways = ways
+        self._groups = max(1, slots // ways)
+        self._memory = mmap.mmap(-1, self._groups * ways * _SLOT.size)
+        self._locks = tuple(multiprocessing.Lock() for _ in range(stripes))
+        # evictions made by the current process
+        self.evictions = 0
+
+    @property
+    def slots(self) -> int:
+        return self._groups * self._ways
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # python hash() of str is randomized per interpreter, workers started other way than fork would not agree on it
+        return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little') or 1
+
+    def consume(self, key: bytes, rate: float, burst: float, now: Optional[float] = None) -> float:
+        """Takes one token from the bucket of ``key``, returns 0 when it was available or seconds until it will be"""
+        key_hash = self._hash(key)
+        group = key_hash % self._groups
+        memory = self._memory
+        offset = group * self._ways * _SLOT.size
+
+        with self._locks[group % len(self._locks)]:
+            if now is None:
+                now = time.monotonic()
+            found = None
+            stalest = None
+            stalest_ts = math.inf
+            for _ in range(self._ways):
+                slot_key, tokens, updated = _SLOT.unpack_from(memory, offset)
+                if slot_key == key_hash:
+                    found = offset
+                    tokens = min(burst, tokens + (now - updated) * rate)
+                    break
+                if slot_key == 0:
+                    # slots are never emptied, so key is not stored after first free slot
+                    found = offset
+                    tokens = burst
+                    break
+                if updated < stalest_ts:
+                    stalest = offset
+                    stalest_ts = updated
+                offset += _SLOT.size
+
+            if found is None:
+                found = stalest
+                tokens = burst
+                self.evictions += 1
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            _SLOT.pack_into(memory, found, key_hash, tokens, now)
+        return wait
+
+
+class RateLimit:
+    """Token bucket definition of a route, ``url(r'/login', Handler, {'rate_limit': {'rate': 1, 'burst': 5}})``
+
+    ``rate`` is number of requests per second, ``burst`` number of requests allowed at once.
+    """
+    __slots__ = ('name', 'rate', 'burst', '_table')
+
+    def __init__(self, name: str, rate: float, burst: Optional[float] = None, table: Optional[SharedBucketTable] = None) -> None:
+        if rate <= 0:
+            raise ValueError(f'Rate limit of route "{name}" has to be positive')
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._table = table
+
+    @classmethod
+    def from_param(cls, name: str, param: Union[Dict[str, Any], Tuple[float, float], float], table: SharedBucketTable) -> 'RateLimit':
+        if isinstance(param, dict):
+            return cls(name, param['rate'], param.get('burst'), table)
+        if isinstance(param, (tuple, list)):
+            return cls(name, param[0], param[1], table)
+        return cls(name, param, None, table)
+
+    def check(self, client: str) -> int:
+        """Returns 0 when request of the client is allowed, otherwise seconds to send in Retry-After"""
+        wait = self._table.consume(f'{self.name}|{client}'.encode(), self.rate, self.burst)
+        if wait:
+            RATE_LIMIT_DECISIONS.inc((self.name, 'limited'))
+            return max(1, math.ceil(wait))
+        RATE_LIMIT_DECISIONS.inc((self.name, 'allowed'))
+        return 0
@@ -2,22 +2,39 @@
 import logging
 import time
 from collections import namedtuple
-from datetime import datetime
+from datetime import datetime, timedelta
 from inspect import isclass
-from typing import Type, List, Dict
-
-from tornado import httputil
-from tornado.ioloop import IOLoop
-from tornado.routing import ReversibleRuleRouter
+from itertools import chain
+from typing import Any, Type, List, Dict, Optional
+from weakref import WeakKeyDictionary
+
+from tornado import gen, httputil
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.locks import Event
+from tornado.process import fork_processes, task_id
+from tornado.routing import PathMatches, ReversibleRuleRouter
+from tornado.util import TimeoutError
 from tornado.web import Application, RequestHandler
 
+from maio.core.acl import PermissionIndex
+from maio.core.admission import AdmissionLimiter
+from maio.core.background import BackgroundExecutor
 from maio.core.configs import AppConfig
+from maio.core.cors import OriginMatcher
 from maio.core.di import DI, ApiService
+from maio.core.encoders import JsonBackend, get_json_backend
 from maio.core.handlers import AclMixin, RestHandler
-from maio.core.log import LOG_TORNADO_GENERAL
+from maio.core.log import LOG_SLOW, LOG_TORNADO_GENERAL
+from maio.core.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION, REGISTRY as METRICS
+from maio.core.offload import shutdown_pools, start_pools
+from maio.core.profiling import PROFILER
+from maio.core.ratelimit import RateLimit, SharedBucketTable
+from maio.core.supervisor import WORKER_START_TIME, Supervisor, notify_ready
+from maio.core.timing import stop_timer
+from maio.core.trie import RouteTrie
 
 ApiServicesCont = namedtuple('ApiServicesCont', ('clazz', 'is_async', 'config'))
-MAX_WAIT_SECONDS_BEFORE_SHUTDOWN = 3
 
 
 # monkey patching
@@ -66,23 +83,111 @@ class _RestApplicationRouter(ReversibleRuleRouter):
         return super(_RestApplicationRouter, self).get_target_delegate(target, request, **target_params)
 
 
-def sig_handler(server, sig, frame):
-    io_loop = IOLoop.instance()
+class _TrieRouter(_RestApplicationRouter):
+    """`_RestApplicationRouter` which finds rules of all nested routers in one `RouteTrie` instead of matching them in order.
 
-    def stop_loop(deadline):
-        now = time.time()
-        if now < deadline and (io_loop.readers and io_loop.writers):
-            logging.getLogger(LOG_TORNADO_GENERAL).info('Waiting for next tick')
-            io_loop.add_timeout(now + 1, stop_loop, deadline)
-        else:
-            io_loop.stop()
-            logging.getLogger(LOG_TORNADO_GENERAL).info('Shutdown finally')
+    Rules stay as they are, so reverse routing works the same. Candidates from the trie are matched with their own matchers
+    and matchers of the routers they are nested in, the first one matching wins like with ordered matching.
+    """
+
+    def __init__(self, application, rules=None):
+        self._trie: Optional[RouteTrie] = None
+        super(_TrieRouter, self).__init__(application, rules)
+
+    def add_rules(self, rules):
+        super(_TrieRouter, self).add_rules(rules)
+        self._trie = None
+
+    def compile(self) -> RouteTrie:
+        trie = RouteTrie()
+        walker = [((), rule) for rule in reversed(self.rules)]
+        while walker:
+            matchers, rule = walker.pop()
+            matchers += (rule.matcher,)
+            if isinstance(rule.target, _RestApplicationRouter):
+                walker += [(matchers, nested) for nested in reversed(rule.target.rules)]
+            else:
+                trie.add(rule.matcher.regex.pattern if isinstance(rule.matcher, PathMatches) else None, (matchers, rule))
+        self._trie = trie
+        return trie
+
+    def find_handler(self, request, **kwargs):
+        trie = self._trie
+        if trie is None:
+            trie = self.compile()
+        for matchers, rule in trie.candidates(request.path):
+            for matcher in matchers:
+                target_params = matcher.match(request)
+                if target_params is None:
+                    break
+            else:
+                if rule.target_kwargs:
+                    target_params['target_kwargs'] = rule.target_kwargs
+                delegate = self.get_target_delegate(rule.target, request, **target_params)
+                if delegate is not None:
+                    return delegate
+        return None
+
+
+class _LastRequestDelegate(httputil.HTTPMessageDelegate):
+    __slots__ = ('_delegate', '_connection')
+
+    def __init__(self, delegate, request_conn) -> None:
+        self._delegate = delegate
+        self._connection = request_conn
+
+    def headers_received(self, start_line, headers):
+        # set after the connection decided on keep-alive from request headers, response gets Connection: close
+        self._connection._disconnect_on_finish = True
+        return self._delegate.headers_received(start_line, headers)
+
+    def data_received(self, chunk):
+        return self._delegate.data_received(chunk)
+
+    def finish(self):
+        return self._delegate.finish()
+
+    def on_connection_close(self):
+        return self._delegate.on_connection_close()
+
+
+class RestHTTPServer(HTTPServer):
+    """HTTPServer closing keep-alive connections after ``max_requests_per_connection`` requests, 0 means no limit"""
+
+    def initialize(self, *args, max_requests_per_connection: int = 0, **kwargs) -> None:
+        super().initialize(*args, **kwargs)
+        self.max_requests_per_connection = max_requests_per_connection
+        self._served = WeakKeyDictionary()
+
+    def start_request(self, server_conn, request_conn):
+        delegate = super().start_request(server_conn, request_conn)
+        if self.max_requests_per_connection:
+            served = self._served[server_conn] = self._served.get(server_conn, 0) + 1
+            if served >= self.max_requests_per_connection:
+                delegate = _LastRequestDelegate(delegate, request_conn)
+        return delegate
+
+
+def sig_handler(server, sig, frame):
+    io_loop = IOLoop.current()
+    app = server.request_callback
 
-    def shutdown():
+    async def shutdown():
+        if app.stopping:
+            return
         logging.info('Stopping http server')
         server.stop()
-        logging.info('Will shutdown in %s seconds ...', MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
-        stop_loop(time.time() + MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
+        if isinstance(server, RestHTTPServer):
+            # requests still coming over keep-alive connections are answered with Connection: close
+            server.max_requests_per_connection = 1
+        timeout = app.config.web.shutdown_timeout
+        logging.info('Waiting up to %s seconds for %d requests and background tasks ...', timeout, app.active_requests)
+        if not await app.drain(timeout):
+            logging.warning('Shutdown timeout passed, %d requests still running', app.active_requests)
+        await app.stop_services()
+        shutdown_pools()
+        io_loop.stop()
+        logging.getLogger(LOG_TORNADO_GENERAL).info('Shutdown finally')
 
     logging.warning('Caught signal: %s', sig)
     io_loop.add_callback_from_signal(shutdown)
@@ -97,7 +202,7 @@ def _get_real_permissions_from_handler(clazz: Type[AclMixin], root_permissions):
         permissions.append(f"{root_permissions}_{AclMixin.METHOD_MAP['post']}")
     if clazz.put != RestHandler.put:
         permissions.append(f"{root_permissions}_{AclMixin.METHOD_MAP['put']}")
-    if clazz.delete != RestHandler.post:
+    if clazz.delete != RestHandler.delete:
         permissions.append(f"{root_permissions}_{AclMixin.METHOD_MAP['delete']}")
     extra = clazz.get_extra_permissions()
     if extra:
@@ -108,7 +213,9 @@ def _get_real_permissions_from_handler(clazz: Type[AclMixin], root_permissions):
 class RestAPIApp(Application):
     _config = None
 
-    __slots__ = ['_startDate', '_services', '_reverse_routing_map', '_acl_list']
+    __slots__ = ['_startDate', '_services', '_reverse_routing_map', '_acl_list', '_permission_index', '_json_backend', '_default_headers', '_allowed_methods',
+                 '_origin_matcher', '_request_timing', '_slow_threshold', '_admission', '_rate_limit_table', '_service_instances', '_active_requests', '_drained',
+                 '_ready', '_startup_errors']
 
     def __init__(self, config: AppConfig, routing, base_routing):
 
@@ -119,21 +226,48 @@ class RestAPIApp(Application):
 
         self._startDate = datetime.utcnow()
         self._services = []
+        self._service_instances = []
+        # set once services started and warmed up, ReadinessHandler answers 503 until then
+        self._ready = False
+        self._startup_errors = {}
+        self._active_requests = 0
+        # set once shutdown started, resolved when the last active request finishes
+        self._drained: Optional[Event] = None
         self._reverse_routing_map = {}
         self._acl_list = []
+        self._permission_index = PermissionIndex(())
+        self._json_backend = get_json_backend(config.json.backend)
+        self._default_headers = {}
+        self._allowed_methods = {}
+        allowed_origin = config.cors.get('allowed_origin')
+        self._origin_matcher = OriginMatcher(allowed_origin) if isinstance(allowed_origin, (tuple, set, list)) else None
+        METRICS.enabled = config.metrics.enabled
+        slow_requests = config.logging.slow_requests or {}
+        self._slow_threshold = slow_requests.get('threshold', 0) if slow_requests.get('enabled') else None
+        self._request_timing = bool(config.web.server_timing or self._slow_threshold is not None)
+        PROFILER.enabled = config.profiling.enabled
+        PROFILER.sample_rate = config.profiling.sample_rate
+        PROFILER.directory = config.logging.relpath
+        self._admission = AdmissionLimiter.from_params('global', {}, config.admission) if config.admission.max_in_flight else None
+        # created here, before start() forks workers, so all of them share the same buckets
+        self._rate_limit_table = None
         self._build_routing(routing)
 
     def _build_routing(self, routing):
-        from tornado.routing import Rule, AnyMatches, PathMatches
+        from tornado.routing import Rule, AnyMatches
 
         routes = [Rule(PathMatches(route), _RestApplicationRouter(self, subRoutes)) for route, subRoutes in routing.items()]
         routes.append(Rule(AnyMatches(), self.wildcard_router))
-        self.default_router = _RestApplicationRouter(self, routes)
+        self.default_router = (_TrieRouter if self._config.web.trie_router else _RestApplicationRouter)(self, routes)
         self._build_reverse_routing()
+        if isinstance(self.default_router, _TrieRouter):
+            # built before workers are forked instead of on the first request of each
+            self.default_router.compile()
 
     def _build_reverse_routing(self):
         temp_map = {}
         temp_acl = []
+        acl_rules = []
 
         walker = [self.default_router]
 
@@ -146,13 +280,46 @@ class RestAPIApp(Application):
                 else:
                     if rule.name:
                         temp_map[rule.name] = rule.handler_class
+                    if rule.handler_class and issubclass(rule.handler_class, RestHandler):
+                        # headers of every routed handler class are ready before the first request, preflights included
+                        self.get_default_headers(rule.handler_class)
+                        self.get_allowed_methods(rule.handler_class)
+                    if rule.target_kwargs and 'max_in_flight' in rule.target_kwargs:
+                        # one limiter shared by all requests of the route, 0 means no limit like for the global one
+                        limiter = AdmissionLimiter.from_params(rule.name or rule.handler_class.__name__, rule.target_kwargs, self._config.admission)
+                        if limiter.max_in_flight:
+                            rule.target_kwargs['admission'] = limiter
+                    if rule.target_kwargs and 'rate_limit' in rule.target_kwargs and not isinstance(rule.target_kwargs['rate_limit'], RateLimit):
+                        rule.target_kwargs['rate_limit'] = RateLimit.from_param(rule.name or rule.handler_class.__name__, rule.target_kwargs['rate_limit'],
+                                                                                self._get_rate_limit_table())
                     if rule.handler_class and issubclass(rule.handler_class, AclMixin) and rule.target_kwargs and 'permission' in rule.target_kwargs:
                         perm = _get_real_permissions_from_handler(rule.handler_class, rule.target_kwargs['permission'])
                         if perm:
                             temp_acl += perm
+                        acl_rules.append(rule)
 
         self._reverse_routing_map = temp_map
         self._acl_list = tuple(set(temp_acl))
+        self._build_permission_index(acl_rules)
+
+    def _build_permission_index(self, acl_rules):
+        # permission checked by every method of the route, so that handlers do not format the names on each request
+        route_acl = []
+        for rule in acl_rules:
+            permission = rule.target_kwargs['permission']
+            if permission:
+                methods = (method.upper() for method in rule.handler_class.SUPPORTED_METHODS)
+                route_acl.append((rule, {method: rule.handler_class.full_permission_name(permission, method) for method in methods}))
+
+        self._permission_index = index = PermissionIndex(chain(self._acl_list, (name for _, names in route_acl for name in names.values())))
+        for rule, names in route_acl:
+            rule.target_kwargs['acl'] = {method: (name, index.bit(name)) for method, name in names.items()}
+
+    def _get_rate_limit_table(self) -> SharedBucketTable:
+        if self._rate_limit_table is None:
+            cfg = self._config.rate_limit
+            self._rate_limit_table = SharedBucketTable(cfg.slots, cfg.ways, cfg.stripes)
+        return self._rate_limit_table
 
     @property
     def start_date(self) -> datetime:
@@ -166,6 +333,60 @@ class RestAPIApp(Application):
     def acl_list(self) -> List[str]:
         return self._acl_list
 
+    @property
+    def permission_index(self) -> PermissionIndex:
+        return self._permission_index
+
+    @property
+    def admission(self) -> Optional[AdmissionLimiter]:
+        return self._admission
+
+    @property
+    def request_timing(self) -> bool:
+        return self._request_timing
+
+    @property
+    def json_backend(self) -> JsonBackend:
+        return self._json_backend
+
+    def get_default_headers(self, handler_class: Type[RestHandler]) -> Dict[str, str]:
+        headers = self._default_headers.get(handler_class)
+        if headers is None:
+            headers = self._default_headers[handler_class] = handler_class.build_default_headers(self._config)
+        return headers
+
+    def get_allowed_methods(self, handler_class: Type[RestHandler]) -> str:
+        methods = self._allowed_methods.get(handler_class)
+        if methods is None:
+            methods = self._allowed_methods[handler_class] = handler_class.allowed_methods()
+        return methods
+
+    @property
+    def origin_matcher(self) -> Optional[OriginMatcher]:
+        return self._origin_matcher
+
+    def log_request(self, handler: RequestHandler) -> None:
+        super().log_request(handler)
+        is_rest = isinstance(handler, RestHandler)
+        if METRICS.enabled:
+            labels = (handler.get_rev_name() if is_rest else handler.__class__.__name__, handler.request.method, handler.get_status())
+            HTTP_REQUESTS.inc(labels)
+            HTTP_REQUEST_DURATION.observe(labels, handler.request.request_time())
+        if not is_rest:
+            return
+
+        if handler._active:
+            handler._active = False
+            DI.endRequestScope(handler._di_scope)
+            self.request_finished()
+        handler.on_request_done()
+        timer = handler.timer
+        if timer is not None:
+            stop_timer()
+            if self._slow_threshold is not None and timer.total >= self._slow_threshold:
+                logging.getLogger(LOG_SLOW).warning('%d %s %s %.1fms %s', handler.get_status(), handler.request.method, handler.request.uri,
+                                                    timer.total * 1000, timer.format())
+
     @classmethod
     def build(cls, config, routing, base_routing):
         cls._config = config
@@ -217,33 +438,168 @@ class RestAPIApp(Application):
                 inst = service.clazz(service.config)
 
             DI.add(inst.getDIKey() if inst.getDIKey() else service.clazz, inst)
+            self._service_instances.append(inst)
+
+    @property
+    def active_requests(self) -> int:
+        return self._active_requests
+
+    @property
+    def stopping(self) -> bool:
+        return self._drained is not None
+
+    def request_started(self) -> None:
+        self._active_requests += 1
+
+    def request_finished(self) -> None:
+        self._active_requests -= 1
+        if not self._active_requests and self._drained is not None:
+            self._drained.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits until active requests and then background tasks finish, returns False when timeout passed first"""
+        deadline = time.monotonic() + timeout
+        self._drained = Event()
+        if self._active_requests:
+            try:
+                await self._drained.wait(timedelta(seconds=timeout))
+            except TimeoutError:
+                return False
+
+        try:
+            executor: BackgroundExecutor = DI.get(BackgroundExecutor.getDIKey())
+        except RuntimeError:
+            return True
+        return await executor.drain(max(0.0, deadline - time.monotonic()))
+
+    @staticmethod
+    def _service_name(service: ApiService) -> str:
+        """DI key the service is registered with, unique among registered services unlike the class name"""
+        key = service.getDIKey()
+        return str(key) if key else f'{type(service).__module__}.{type(service).__qualname__}'
+
+    def _service_errors(self, services: List[ApiService], errors: List[Optional[str]]) -> Dict[str, str]:
+        return {self._service_name(service): error for service, error in zip(services, errors) if error is not None}
+
+    async def _call_services(self, hook: str, services: List[ApiService], timeout: float) -> List[Optional[str]]:
+        """Calls async ``hook`` of all services at once, returns error of every service, None when the call succeeded"""
+        async def call(service: ApiService) -> Optional[str]:
+            try:
+                result = await gen.with_timeout(timedelta(seconds=timeout), getattr(service, hook)())
+            except TimeoutError:
+                return f'{hook} timed out after {timeout:.1f}s'
+            except Exception as e:
+                logging.getLogger(LOG_TORNADO_GENERAL).warning('%s of service %s failed: %r', hook, self._service_name(service), e)
+                return repr(e)
+            return 'unhealthy' if result is False else None
+
+        return await gen.multi([call(service) for service in services])
+
+    async def start_services(self, timeout: float) -> bool:
+        """Starts and then warms up registered services, returns False when some of them did not start within timeout"""
+        deadline = time.monotonic() + timeout
+        services = list(self._service_instances)
+        errors = await self._call_services('start', services, timeout)
+        self._startup_errors = self._service_errors(services, errors)
+        # warming up a service which did not start would only wait for the timeout again
+        started = [service for service, error in zip(services, errors) if error is None]
+        cold = self._service_errors(started, await self._call_services('warmup', started, max(0.0, deadline - time.monotonic())))
+        if cold:
+            logging.getLogger(LOG_TORNADO_GENERAL).warning('Services not warmed up: %s', cold)
+        self._ready = True
+        return not self._startup_errors
+
+    async def check_services(self, timeout: float) -> Dict[str, str]:
+        """Runs health checks of all services at once, returns errors by DI key of the ones which failed, failed start included"""
+        services = list(self._service_instances)
+        errors = await self._call_services('health', services, timeout)
+        return {**self._service_errors(services, errors), **self._startup_errors}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready and not self.stopping
+
+    async def stop_services(self) -> None:
+        """Stops registered services in reverse order of registration, so services are stopped before the ones they use"""
+        self._ready = False
+        while self._service_instances:
+            service = self._service_instances.pop()
+            try:
+                await service.stop()
+            except Exception:
+                logging.getLogger(LOG_TORNADO_GENERAL).exception('Stopping service %s failed', type(service).__name__)
+
+    def server_options(self) -> Dict[str, Any]:
+        web = self._config.web
+        return {
+            'no_keep_alive': not web.keep_alive,
+            'idle_connection_timeout': web.idle_connection_timeout,
+            'max_requests_per_connection': web.max_requests_per_connection,
+            'max_buffer_size': web.max_buffer_size,
+            'max_body_size': web.max_body_size,
+        }
 
     def start(self):
         import asyncio
         import uvloop
+        import os
         import signal
+        import tempfile
         from functools import partial
-        from tornado.httpserver import HTTPServer
         asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
         host = self._config.web.host
         port = self._config.web.port
 
+        server = RestHTTPServer(self, **self.server_options())
         if not self.settings.get('debug'):
-            server = HTTPServer(self, no_keep_alive=True)
-            server.bind(port, host, 0, 2048, reuse_port=True)
-            server.start(num_processes=None)
+            server.bind(port, host, 0, self._config.web.backlog, reuse_port=True)
+            if self._config.metrics.enabled:
+                METRICS.set_directory(self._config.metrics.directory or os.path.join(tempfile.gettempdir(), f'maio-metrics-{port}'), clean=True)
+            if self._config.profiling.signal:
+                # parent process only waits for workers, toggle is handled by each worker separately
+                signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            workers = self._config.workers
+            if workers.supervisor:
+                worker_id = Supervisor(workers.processes, workers.cpu_affinity, workers.respawn_backoff, workers.max_respawn_backoff, workers.stop_timeout).run()
+            else:
+                # what HTTPServer.start(num_processes) does, sockets are added to the IOLoop only after services warmed up
+                if workers.processes != 1:
+                    fork_processes(workers.processes or None)
+                worker_id = task_id() or 0
+            # forked worker starts with values recorded by the parent process before fork
+            METRICS.reset()
+            WORKER_START_TIME.set((str(worker_id), str(os.getpid())), time.time())
         else:
-            server = self.listen(port)
+            server.bind(port)
 
         signal.signal(signal.SIGTERM, partial(sig_handler, server))
         signal.signal(signal.SIGINT, partial(sig_handler, server))
+        if self._config.profiling.signal:
+            signal.signal(signal.SIGUSR1, lambda sig, frame: IOLoop.current().add_callback_from_signal(PROFILER.toggle))
 
         msg = 'Starting %s webserver on %s:%d' % (self._config.web.name, host, port)
         logging.getLogger(LOG_TORNADO_GENERAL).info(msg)
         print(msg)
         loop = IOLoop.current()
+        start_pools(self._config.offload.threads, self._config.offload.processes)
+        if METRICS.directory:
+            PeriodicCallback(METRICS.write_snapshot, self._config.metrics.flush_interval * 1000).start()
+        PeriodicCallback(PROFILER.dump, self._config.profiling.dump_interval * 1000).start()
         self._initServices(loop)
+
+        async def serve():
+            started = time.monotonic()
+            if not await self.start_services(self._config.web.startup_timeout):
+                logging.getLogger(LOG_TORNADO_GENERAL).error('Services failed to start: %s', self._startup_errors)
+            if self.stopping:
+                return
+            logging.getLogger(LOG_TORNADO_GENERAL).info('Services started in %.2fs, accepting requests', time.monotonic() - started)
+            # bound sockets were listening already, connections waiting in the backlog are accepted now
+            server.start(1)
+            notify_ready()
+
+        loop.add_callback(serve)
         loop.start()
 
 
@@ -0,0 +1,304 @@
+# coding=utf-8
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from maio.core.log import LOG_MAIN
+from maio.core.metrics import REGISTRY as METRICS
+
+WORKER_START_TIME = METRICS.gauge('worker_start_time_seconds', 'Start time of the worker process in seconds since epoch', ('worker', 'pid'))
+
+_TICK = 0.1
+_READY_FD: Optional[int] = None
+
+
+def notify_ready() -> None:
+    """Tells the supervisor that the worker accepts requests, `RestAPIApp.start` calls it once the IOLoop runs"""
+    global _READY_FD
+    if _READY_FD is None:
+        return
+    try:
+        os.write(_READY_FD, b'1')
+    except OSError:
+        pass
+    os.close(_READY_FD)
+    _READY_FD = None
+
+
+def respawn_delay(failures: int, backoff: float, max_backoff: float) -> float:
+    """Seconds to wait before starting a worker which crashed ``failures`` times in a row"""
+    if failures <= 0:
+        return 0.0
+    return min(max_backoff, backoff * 2 ** (failures - 1))
+
+
+def _describe_status(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f'signal {os.WTERMSIG(status)}'
+    return f'exit code {os.WEXITSTATUS(status)}'
+
+
+class _Worker:
+    __slots__ = ('worker_id', 'pid', 'started', 'failures', 'restarts', 'ready_fd', 'ready', 'retiring', 'candidate', 'kill_at')
+
+    def __init__(self, worker_id: int, pid: int, ready_fd: int, failures: int = 0, restarts: int = 0) -> None:
+        self.worker_id = worker_id
+        self.pid = pid
+        self.started = time.time()
+        self.failures = failures
+        self.restarts = restarts
+        self.ready_fd = ready_fd
+        self.ready = False
+        # replaced by a newer worker and stopping
+        self.retiring = False
+        # started by reload, becomes the current worker once ready
+        self.candidate = False
+        self.kill_at = None
+
+    @property
+    def uptime(self) -> float:
+        return time.time() - self.started
+
+
+class Supervisor:
+    """Forks ``processes`` workers and keeps them running, alternative to ``HTTPServer.start(num_processes)``.
+
+    `run` returns the worker id in every forked worker and never returns in the supervisor process. Listening sockets bound
+    before `run` stay open in the supervisor, so the kernel keeps accepting connections while workers are replaced.
+
+    * crashed worker is started again after ``backoff`` seconds, doubled with every crash in a row up to ``max_backoff``
+    * SIGHUP replaces workers one at a time, the old one gets SIGTERM only after its replacement reported ready
+    * SIGUSR2 logs pid and uptime of every worker
+    * SIGTERM and SIGINT stop all workers, the ones not finished within ``stop_timeout`` seconds are killed
+    """
+
+    def __init__(self, processes: int = 0, cpu_affinity: bool = False, backoff: float = 1.0, max_backoff: float = 30.0,
+                 stop_timeout: float = 10.0) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stop_timeout = stop_timeout
+        self._cpus: Optional[List[int]] = None
+        if cpu_affinity:
+            if hasattr(os, 'sched_setaffinity'):
+                self._cpus = sorted(os.sched_getaffinity(0))
+            else:
+                logging.getLogger(LOG_MAIN).warning('CPU affinity is not supported on this platform')
+        # set in the forked worker
+        self.worker_id: Optional[int] = None
+        self._workers: Dict[int, _Worker] = {}
+        # worker id -> (start time, crashes in a row, restarts) of workers waiting for respawn
+        self._pending: Dict[int, tuple] = {}
+        self._reload: List[int] = []
+        self._replacing: Optional[_Worker] = None
+        # signal handlers only record the signal, supervisor loop acts on it
+        self._signals: List[int] = []
+        self._stopping = False
+        self._log = logging.getLogger(LOG_MAIN)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [{'worker': w.worker_id, 'pid': w.pid, 'uptime': round(w.uptime, 1), 'restarts': w.restarts, 'ready': w.ready}
+                for w in sorted(self._workers.values(), key=lambda w: (w.worker_id, w.started))]
+
+    def run(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR2):
+            signal.signal(sig, self._on_signal)
+
+        for worker_id in range(self.processes):
+            if self._spawn(worker_id):
+                return self.worker_id
+
+        while True:
+            time.sleep(_TICK)
+            self._handle_signals()
+            self._reap()
+            self._check_ready()
+            if self._stopping:
+                self._stop_tick()
+                continue
+
+            now = time.monotonic()
+            for worker_id, (start_at, failures, restarts) in list(self._pending.items()):
+                if start_at <= now:
+                    del self._pending[worker_id]
+                    if self._spawn(worker_id, failures, restarts):
+                        return self.worker_id
+
+            if self._reload_tick():
+                return self.worker_id
+
+    def _spawn(self, worker_id: int, failures: int = 0, restarts: int = 0, candidate: bool = False) -> bool:
+        """Forks a worker, returns True in the forked process"""
+        global _READY_FD
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for worker in self._workers.values():
+                if worker.ready_fd is not None:
+                    os.close(worker.ready_fd)
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+            # workers must not share the random sequence of the supervisor
+            random.seed()
+            if self._cpus:
+                os.sched_setaffinity(0, {self._cpus[worker_id % len(self._cpus)]})
+            _READY_FD = write_fd
+            self.worker_id = worker_id
+            return True
+
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = self._workers[pid] = _Worker(worker_id, pid, read_fd, failures, restarts)
+        worker.candidate = candidate
+        self._log.info('Worker %d started with pid %d', worker_id, pid)
+        return False
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+            self._close_ready(worker)
+            self._log.log(logging.INFO if worker.retiring or self._stopping else logging.WARNING,
+                          'Worker %d (pid %d) exited with %s after %.1fs', worker.worker_id, pid, _describe_status(status), worker.uptime)
+            if worker.retiring or self._stopping:
+                continue
+            if worker.candidate:
+                # replacement died before taking over, the old worker keeps running
+                self._log.error('Reload of worker %d failed, previous process keeps running', worker.worker_id)
+                self._replacing = None
+                continue
+            replacement = self._replacing
+            if replacement is not None and replacement.candidate and replacement.worker_id == worker.worker_id:
+                # worker died while being replaced, its replacement takes over right away
+                replacement.candidate = False
+                self._replacing = None
+                continue
+
+            crashed = status != 0
+            failures = (worker.failures if worker.uptime < self.max_backoff else 0) + 1 if crashed else 0
+            delay = respawn_delay(failures, self.backoff, self.max_backoff)
+            if delay:
+                self._log.warning('Worker %d will be started again in %.1fs', worker.worker_id, delay)
+            self._pending[worker.worker_id] = (time.monotonic() + delay, failures, worker.restarts + 1)
+
+    def _check_ready(self) -> None:
+        for worker in self._workers.values():
+            if worker.ready_fd is None:
+                continue
+            try:
+                data = os.read(worker.ready_fd, 1)
+            except BlockingIOError:
+                continue
+            worker.ready = bool(data)
+            self._close_ready(worker)
+
+    @staticmethod
+    def _close_ready(worker: _Worker) -> None:
+        if worker.ready_fd is not None:
+            os.close(worker.ready_fd)
+            worker.ready_fd = None
+
+    def _current(self, worker_id: int) -> Optional[_Worker]:
+        for worker in self._workers.values():
+            if worker.worker_id == worker_id and not worker.retiring and not worker.candidate:
+                return worker
+        return None
+
+    def _reload_tick(self) -> bool:
+        """Moves rolling reload forward, returns True in the forked replacement"""
+        replacing = self._replacing
+        if replacing is None:
+            while self._reload:
+                worker_id = self._reload.pop(0)
+                current = self._current(worker_id)
+                if current is None:
+                    # waiting for respawn, it will start fresh anyway
+                    continue
+                if self._spawn(worker_id, restarts=current.restarts + 1, candidate=True):
+                    return True
+                self._replacing = next(w for w in self._workers.values() if w.worker_id == worker_id and w.candidate)
+                self._replacing.kill_at = time.monotonic() + self.stop_timeout
+                return False
+            return False
+
+        if replacing.candidate:
+            if not replacing.ready and time.monotonic() < replacing.kill_at:
+                return False
+            if not replacing.ready:
+                self._log.warning('Worker %d (pid %d) not ready in %.1fs, replacing anyway', replacing.worker_id, replacing.pid, self.stop_timeout)
+            old = self._current(replacing.worker_id)
+            replacing.candidate = False
+            if old is not None:
+                self._retire(old)
+                self._replacing = old
+            else:
+                self._replacing = None
+            return False
+
+        # replaced worker has to exit before the next one is replaced
+        if replacing.pid not in self._workers:
+            self._replacing = None
+            if not self._reload:
+                self._log.info('Reload finished: %s', self.status())
+        elif time.monotonic() >= replacing.kill_at:
+            self._kill(replacing)
+        return False
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.retiring = True
+        worker.kill_at = time.monotonic() + self.stop_timeout
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _kill(self, worker: _Worker) -> None:
+        self._log.warning('Worker %d (pid %d) did not stop in %.1fs, killing it', worker.worker_id, worker.pid, self.stop_timeout)
+        worker.kill_at = None
+        try:
+            os.kill(worker.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _stop_tick(self) -> None:
+        if not self._workers:
+            self._log.info('All workers stopped')
+            sys.exit(0)
+        now = time.monotonic()
+        for worker in self._workers.values():
+            if worker.kill_at is not None and now >= worker.kill_at:
+                self._kill(worker)
+
+    def _on_signal(self, sig, frame) -> None:
+        self._signals.append(sig)
+
+    def _handle_signals(self) -> None:
+        while self._signals and not self._stopping:
+            sig = self._signals.pop(0)
+            if sig in (signal.SIGTERM, signal.SIGINT):
+                self._log.info('Stopping %d workers', len(self._workers))
+                self._stopping = True
+                self._pending.clear()
+                self._reload.clear()
+                for worker in self._workers.values():
+                    self._retire(worker)
+            elif sig == signal.SIGHUP:
+                self._log.info('Reloading workers')
+                self._reload += [worker_id for worker_id in range(self.processes) if worker_id not in self._reload]
+            else:
+                for worker in self.status():
+                    self._log.info('Worker %(worker)d: pid %(pid)d, uptime %(uptime).1fs, restarts %(restarts)d, ready %(ready)s', worker)
@@ -0,0 +1,72 @@
+# coding=utf-8
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+STAGE_PREPARE = 'prepare'
+STAGE_VALIDATE = 'validate'
+STAGE_MONGO = 'mongo'
+STAGE_ENCODE = 'encode'
+
+_CURRENT: ContextVar[Optional['RequestTimer']] = ContextVar('maio_request_timer', default=None)
+
+
+class RequestTimer:
+    """Time spent by single request in named stages.
+
+    Stages are summed, so concurrent Mongo operations of one request may add up to more than the request took.
+    """
+    __slots__ = ('started', 'stages')
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        parts = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in self.stages.items()]
+        parts.append(f'total;dur={self.total * 1000:.2f}')
+        return ', '.join(parts)
+
+    def format(self) -> str:
+        return ' '.join(f'{stage}={seconds * 1000:.1f}ms' for stage, seconds in self.stages.items())
+
+
+def start_timer() -> RequestTimer:
+    timer = RequestTimer()
+    _CURRENT.set(timer)
+    return timer
+
+
+def stop_timer() -> None:
+    _CURRENT.set(None)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Adds time of the block to the timer of the request being handled, if any"""
+    timer = _CURRENT.get()
+    if timer is None:
+        yield None
+    else:
+        with timer.stage(stage):
+            yield timer
@@ -0,0 +1,215 @@
+# coding=utf-8
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_METACHARACTERS = frozenset('.^$*+?{}[]()|\\')
+_QUANTIFIERS = frozenset('*+?{')
+# escapes matching '/' as well
+_UNSAFE_ESCAPES = frozenset('DWS')
+_INLINE_FLAGS = re.compile(r'\(\?[aiLmsux]')
+_SPECIAL = re.compile(r'[.^$*+?{}\[\]()|\\]')
+# escape, character class, group or alternative, separator and runs of anything else
+_TOKENS = re.compile(r'\\.|\[\^?\]?(?:\\.|[^\]\\])*\]|[()|/]|[^\\\[()|/]+|.', re.DOTALL)
+
+
+def _class_matches_slash(body: str) -> bool:
+    """True when character class body (without brackets and ``^``) contains ``/``, ranges included"""
+    position = 0
+    while position < len(body):
+        char = body[position]
+        if char == '\\' and position + 1 < len(body):
+            char = body[position + 1]
+            if char in _UNSAFE_ESCAPES:
+                return True
+            position += 1
+        if position + 2 < len(body) and body[position + 1] == '-':
+            if char <= '/' <= body[position + 2]:
+                return True
+            position += 3
+            continue
+        if char == '/':
+            return True
+        position += 1
+    return False
+
+
+def _segment_matches_slash(segment: str) -> bool:
+    """Conservative check whether regex of one path segment can match ``/``"""
+    position = 0
+    while position < len(segment):
+        char = segment[position]
+        if char == '\\':
+            escaped = segment[position + 1:position + 2]
+            if not escaped or escaped in _UNSAFE_ESCAPES or escaped == '/' or escaped.isdigit():
+                return True
+            position += 2
+        elif char == '.':
+            return True
+        elif char == '[':
+            end = position + 1
+            negated = segment[end:end + 1] == '^'
+            if negated:
+                end += 1
+            start = end
+            if segment[end:end + 1] == ']':
+                end += 1
+            while end < len(segment) and segment[end] != ']':
+                end += 2 if segment[end] == '\\' else 1
+            if end >= len(segment):
+                return True
+            if _class_matches_slash(segment[start:end]) != negated:
+                return True
+            position = end + 1
+        else:
+            position += 1
+    return False
+
+
+def _literal(segment: str) -> Optional[str]:
+    """Text matched by the segment when it has no regex syntax apart from escaped punctuation, otherwise None"""
+    if not _SPECIAL.search(segment):
+        return segment
+    chars = []
+    position = 0
+    while position < len(segment):
+        char = segment[position]
+        if char == '\\':
+            escaped = segment[position + 1:position + 2]
+            if not escaped or escaped.isalnum():
+                return None
+            chars.append(escaped)
+            position += 2
+            continue
+        if char in _METACHARACTERS:
+            return None
+        chars.append(char)
+        position += 1
+    return ''.join(chars)
+
+
+def split_pattern(pattern: str) -> Optional[List[str]]:
+    """Splits URL regex to regexes of path segments, returns None when a segment could match ``/`` or span more segments"""
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    if pattern.endswith('$') and not pattern.endswith('\\$'):
+        pattern = pattern[:-1]
+    if not pattern.startswith('/') or _INLINE_FLAGS.search(pattern):
+        return None
+
+    segments = []
+    current = []
+    depth = 0
+    for token in _TOKENS.findall(pattern):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token == '|' and not depth:
+            return None
+        elif token in ('/', '\\/'):
+            if depth:
+                return None
+            segments.append(''.join(current))
+            current = []
+            continue
+        elif token == '[':
+            # unterminated character class
+            return None
+        current.append(token)
+    segments.append(''.join(current))
+
+    for segment in segments:
+        if segment[:1] in _QUANTIFIERS or (_SPECIAL.search(segment) and _segment_matches_slash(segment)):
+            return None
+    return segments
+
+
+class _Node:
+    __slots__ = ('literals', 'params', 'routes')
+
+    def __init__(self) -> None:
+        self.literals: Dict[str, _Node] = {}
+        # segment regex -> (compiled fullmatch, child)
+        self.params: Dict[str, Tuple[Any, _Node]] = {}
+        self.routes: List[int] = []
+
+
+class RouteTrie:
+    """Finds URL routes which can match a path without trying their regexes one by one.
+
+    Patterns are split by ``/`` to segments, literal segments are looked up in dicts and only the others are matched with
+    regexes of single segment. Patterns which cannot be split that way (``.*``, ``/?``, alternatives over ``/``...) are
+    kept aside and returned for every path. `candidates` returns values in the order they were added and may contain
+    routes which do not match, so caller still matches them with their own regex and takes the first one that does.
+    """
+    __slots__ = ('_root', '_values', '_fallback', '_compiled')
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._values: List[Any] = []
+        self._fallback: List[int] = []
+        # routes of a large table mostly repeat the same parameter segments, re module caches only a few hundred patterns
+        self._compiled: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def fallback_count(self) -> int:
+        return len(self._fallback)
+
+    def add(self, pattern: Optional[str], value: Any) -> bool:
+        """Adds route, pattern None means any path. Returns False when the route has to be checked for every path"""
+        index = len(self._values)
+        self._values.append(value)
+        segments = split_pattern(pattern) if pattern is not None else None
+        compiled = []
+        if segments is not None:
+            try:
+                compiled = [(segment, _literal(segment)) for segment in segments]
+                for segment, literal in compiled:
+                    if literal is None and segment not in self._compiled:
+                        self._compiled[segment] = re.compile(segment).fullmatch
+            except re.error:
+                segments = None
+        if segments is None:
+            self._fallback.append(index)
+            return False
+
+        node = self._root
+        for segment, literal in compiled:
+            if literal is not None:
+                child = node.literals.get(literal)
+                if child is None:
+                    child = node.literals[literal] = _Node()
+                node = child
+            else:
+                param = node.params.get(segment)
+                if param is None:
+                    param = node.params[segment] = (self._compiled[segment], _Node())
+                node = param[1]
+        node.routes.append(index)
+        return True
+
+    def candidates(self, path: str) -> List[Any]:
+        segments = path.split('/')
+        last = len(segments)
+        found = list(self._fallback)
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth == last:
+                found += node.routes
+                continue
+            segment = segments[depth]
+            child = node.literals.get(segment)
+            if child is not None:
+                stack.append((child, depth + 1))
+            for fullmatch, child in node.params.values():
+                if fullmatch(segment) is not None:
+                    stack.append((child, depth + 1))
+
+        values = self._values
+        if len(found) == 1:
+            return [values[found[0]]]
+        return [values[index] for index in sorted(set(found))]
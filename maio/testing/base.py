@@ -82,9 +82,15 @@ class BaseRestTestCase(AsyncHTTPTestCase):
     def setUp(self):
         super().setUp()
         self._app._initServices(IOLoop.current())
+        # services are started and stopped like in a worker, e.g. ResponseCache invalidates entries only while started
+        self.run_as_sync(self._app.start_services, None, self._config.web.startup_timeout)
         # clean up database
         MongoUtils().drop_collections(MongoSyncConnection(self._config.mongo))
 
+    def tearDown(self):
+        self.run_as_sync(self._app.stop_services)
+        super().tearDown()
+
     def run_as_sync(self, fn, io_loop=None, *args, **kwargs):
         io_loop = self.io_loop if io_loop is None else io_loop
         return io_loop.run_sync(functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,33 @@
+# coding=utf-8
+import unittest
+
+from maio.core.acl import PermissionIndex
+
+
+class PermissionIndexUnitTests(unittest.TestCase):
+
+    def test_mask(self):
+        index = PermissionIndex(['users_fetch', 'users_save', 'orders_fetch', 'users_fetch'])
+        mask = index.mask(['users_fetch', 'orders_fetch', 'unknown'])
+
+        self.assertEqual(3, len(index))
+        self.assertTrue(mask & index.bit('users_fetch'))
+        self.assertFalse(mask & index.bit('users_save'))
+        self.assertEqual(['orders_fetch', 'users_fetch'], index.names(mask))
+        self.assertEqual(0, index.bit('unknown'))
+
+    def test_mask_passes_through(self):
+        index = PermissionIndex(['a', 'b'])
+
+        self.assertEqual(0, index.mask(None))
+        self.assertEqual(0, index.mask([]))
+        self.assertEqual(3, index.mask(3))
+        self.assertEqual(index.mask({'a', 'b'}), index.mask(('b', 'a')))
+
+    def test_bool_is_rejected(self):
+        index = PermissionIndex(['a', 'b'])
+
+        with self.assertRaises(TypeError):
+            index.mask(True)
+        with self.assertRaises(TypeError):
+            index.mask(False)
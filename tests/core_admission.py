@@ -0,0 +1,110 @@
+# coding=utf-8
+import asyncio
+import unittest
+
+from tornado.httpclient import HTTPError
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.admission import AdmissionLimiter
+from maio.core.handlers import RestHandler
+from maio.core.routing import url
+from tests.web import build_app
+
+
+class AdmissionLimiterUnitTests(unittest.TestCase):
+
+    def test_limit_without_queue(self):
+        limiter = AdmissionLimiter('route', 1)
+
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        self.assertFalse(asyncio.run(limiter.wait()))
+        limiter.release()
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_released_slot_goes_to_waiting_request(self):
+        limiter = AdmissionLimiter('route', 1, queue_size=1, queue_timeout=1)
+
+        async def scenario():
+            self.assertTrue(limiter.try_acquire())
+            waiting = asyncio.ensure_future(limiter.wait())
+            await asyncio.sleep(0)
+            rejected = await limiter.wait()
+            limiter.release()
+            return await waiting, rejected
+
+        self.assertEqual((True, False), asyncio.run(scenario()))
+        self.assertEqual(1, limiter.in_flight)
+
+    def test_wait_timeout(self):
+        limiter = AdmissionLimiter('route', 0, queue_size=1, queue_timeout=0.01)
+
+        self.assertFalse(asyncio.run(limiter.wait()))
+        self.assertEqual(0, limiter.waiting)
+
+    def test_from_params(self):
+        params = {'max_in_flight': 5, 'queue_size': 10, 'other': 1}
+        limiter = AdmissionLimiter.from_params('route', params)
+
+        self.assertEqual((5, 10, 0, 1), (limiter.max_in_flight, limiter.queue_size, limiter.queue_timeout, limiter.retry_after))
+        self.assertEqual({'other': 1}, params)
+
+
+class _Handler(RestHandler):
+    entered = None
+    released = None
+    disconnected = None
+
+    async def get(self):
+        _Handler.entered.set()
+        await _Handler.released.wait()
+        self.return_ok({'limited': self._admission is not None})
+
+    def on_connection_close(self):
+        super().on_connection_close()
+        _Handler.disconnected.set()
+
+
+class _UnlimitedHandler(_Handler):
+    pass
+
+
+class RouteAdmissionTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        _Handler.entered = Event()
+        _Handler.released = Event()
+        _Handler.disconnected = Event()
+        return build_app([url(r'/limited', _Handler, {'max_in_flight': 1}), url(r'/unlimited', _UnlimitedHandler, {'max_in_flight': 0})])
+
+    @gen_test
+    async def test_route_limit(self):
+        first = self.http_client.fetch(self.get_url('/limited'))
+        await _Handler.entered.wait()
+        rejected = await self.http_client.fetch(self.get_url('/limited'), raise_error=False)
+        _Handler.released.set()
+
+        self.assertEqual(503, rejected.code)
+        self.assertEqual('1', rejected.headers['Retry-After'])
+        self.assertEqual(200, (await first).code)
+
+    @gen_test
+    async def test_disconnected_client_keeps_slot(self):
+        with self.assertRaises(HTTPError):
+            await self.http_client.fetch(self.get_url('/limited'), request_timeout=0.05)
+        await _Handler.disconnected.wait()
+
+        # handler of the abandoned request still runs
+        rejected = await self.http_client.fetch(self.get_url('/limited'), raise_error=False)
+        _Handler.released.set()
+
+        self.assertEqual(503, rejected.code)
+        self.assertEqual(200, (await self.http_client.fetch(self.get_url('/limited'))).code)
+
+    def test_zero_disables_route_limit(self):
+        _Handler.released.set()
+        response = self.fetch('/unlimited')
+
+        self.assertEqual(200, response.code)
+        self.assertIn(b'"limited":false', response.body.replace(b' ', b''))
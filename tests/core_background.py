@@ -0,0 +1,120 @@
+# coding=utf-8
+import asyncio
+import unittest
+
+from maio.core.background import BACKGROUND_TASKS, BACKGROUND_TASKS_PENDING, BACKGROUND_TASK_DURATION, POLICY_DROP_NEW, POLICY_DROP_OLDEST, \
+    BackgroundExecutor, BackgroundQueueFullError
+
+
+class _Gate:
+    """Coroutine tasks waiting until the gate opens, records how many of them ran at once"""
+
+    def __init__(self) -> None:
+        self.opened = asyncio.Event()
+        self.running = 0
+        self.peak = 0
+        self.started = []
+        self.finished = []
+
+    async def task(self, name):
+        self.started.append(name)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await self.opened.wait()
+        self.running -= 1
+        self.finished.append(name)
+
+
+def _failing_task():
+    raise ValueError('failed')
+
+
+def _task():
+    pass
+
+
+class BackgroundExecutorUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        for metric in (BACKGROUND_TASKS, BACKGROUND_TASKS_PENDING, BACKGROUND_TASK_DURATION):
+            metric.clear()
+
+    def test_concurrency_limit(self):
+        executor = BackgroundExecutor({'concurrency': 2, 'queue_size': 10})
+
+        async def scenario(gate):
+            for name in range(5):
+                executor.submit(gate.task, name)
+            await asyncio.sleep(0.01)
+            pending = executor.pending
+            gate.opened.set()
+            return pending, await executor.drain(1)
+
+        gate = _Gate()
+        self.assertEqual((5, True), asyncio.run(scenario(gate)))
+        self.assertEqual(2, gate.peak)
+        # queued tasks start in order of submission
+        self.assertEqual([0, 1, 2, 3, 4], gate.started)
+        self.assertEqual(5, len(gate.finished))
+        self.assertEqual(0, executor.pending)
+
+    def test_reject_when_queue_is_full(self):
+        executor = BackgroundExecutor({'concurrency': 1, 'queue_size': 1})
+
+        async def scenario(gate):
+            executor.submit(gate.task, 'running')
+            executor.submit(gate.task, 'queued')
+            with self.assertRaises(BackgroundQueueFullError):
+                executor.submit(gate.task, 'rejected')
+            gate.opened.set()
+            await executor.drain(1)
+
+        gate = _Gate()
+        asyncio.run(scenario(gate))
+        self.assertEqual(['running', 'queued'], gate.finished)
+        self.assertEqual(1, BACKGROUND_TASKS.get(('_Gate.task', 'rejected')))
+
+    def test_drop_policies(self):
+        for policy, expected in ((POLICY_DROP_NEW, ['running', 'first']), (POLICY_DROP_OLDEST, ['running', 'second'])):
+            executor = BackgroundExecutor({'concurrency': 1, 'queue_size': 1, 'rejection_policy': policy})
+
+            async def scenario(gate):
+                executor.submit(gate.task, 'running')
+                executor.submit(gate.task, 'first')
+                accepted = executor.submit(gate.task, 'second')
+                gate.opened.set()
+                await executor.drain(1)
+                return accepted
+
+            gate = _Gate()
+            self.assertEqual(policy == POLICY_DROP_OLDEST, asyncio.run(scenario(gate)))
+            self.assertEqual(expected, gate.finished, policy)
+            self.assertEqual(1, executor.dropped)
+
+    def test_metrics(self):
+        executor = BackgroundExecutor()
+
+        async def scenario():
+            executor.submit(_failing_task)
+            executor.submit(_task)
+            self.assertEqual(2, BACKGROUND_TASKS_PENDING.get())
+            await executor.drain(1)
+
+        asyncio.run(scenario())
+        self.assertEqual(1, executor.failed)
+        self.assertEqual(1, BACKGROUND_TASKS.get(('_failing_task', 'failed')))
+        self.assertEqual(1, BACKGROUND_TASKS.get(('_task', 'ok')))
+        self.assertEqual(1, sum(BACKGROUND_TASK_DURATION.get(('_failing_task',))[:-1]))
+        self.assertEqual(0, BACKGROUND_TASKS_PENDING.get())
+
+    def test_drain_timeout(self):
+        executor = BackgroundExecutor()
+
+        async def scenario(gate):
+            executor.submit(gate.task, 'stuck')
+            drained = await executor.drain(0.01)
+            gate.opened.set()
+            return drained, await executor.drain(1)
+
+        self.assertEqual((False, True), asyncio.run(scenario(_Gate())))
+        self.assertTrue(asyncio.run(executor.drain()))
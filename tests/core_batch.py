@@ -0,0 +1,118 @@
+# coding=utf-8
+import json
+
+from tornado import gen
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.batch import BatchHandler, _BatchConnection
+from maio.core.handlers import RestHandler
+from maio.core.routing import url
+from tests.web import build_app, build_config
+
+
+class _ItemHandler(RestHandler):
+    started = []
+
+    async def get(self, item_id):
+        _ItemHandler.started.append(item_id)
+        # later items finish first
+        await gen.sleep((5 - int(item_id)) * 0.005)
+        self.return_ok({'id': int(item_id)})
+
+
+class _StuckHandler(RestHandler):
+    released = None
+    finished = None
+
+    async def get(self):
+        await _StuckHandler.released.wait()
+        self.return_ok()
+
+    def on_finish(self):
+        _StuckHandler.finished.set()
+
+
+class _LargeHandler(RestHandler):
+    async def get(self):
+        self.set_header('Content-Type', 'text/plain')
+        for _ in range(int(self.get_argument('chunks', '1'))):
+            self.write(b'x' * 60)
+            await self.flush()
+        self.finish()
+
+
+class BatchHandlerTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        _ItemHandler.started = []
+        _StuckHandler.released = Event()
+        _StuckHandler.finished = Event()
+        config = build_config()
+        config.batch.timeout = 0.05
+        config.batch.max_response_size = 100
+        config.batch.max_body_size = 20
+        return build_app([url(r'/batch', BatchHandler), url(r'/items/(\d+)', _ItemHandler), url(r'/stuck', _StuckHandler),
+                          url(r'/large', _LargeHandler)], config)
+
+    def tearDown(self):
+        _StuckHandler.released.set()
+        super().tearDown()
+
+    async def _batch(self, *requests):
+        response = await self.http_client.fetch(self.get_url('/batch'), method='POST', body=json.dumps({'requests': list(requests)}),
+                                                headers={'Content-Type': 'application/json'})
+        return [(item['status'], item['body']) for item in json.loads(response.body)['data']]
+
+    @gen_test
+    async def test_results_in_order_of_requests(self):
+        results = await self._batch(*({'path': f'/items/{item_id}'} for item_id in range(5)))
+
+        self.assertEqual([200] * 5, [status for status, _ in results])
+        self.assertEqual(list(range(5)), [body['id'] for _, body in results])
+
+    @gen_test
+    async def test_invalid_and_nested_requests(self):
+        results = await self._batch({'path': '/batch', 'method': 'POST', 'body': {}}, {'path': 'items/1'}, {'path': '/items/1', 'method': 'HEAD'},
+                                    {'path': '/items/1', 'method': 'POST', 'body': 'x' * 20})
+
+        self.assertEqual([400] * 4, [status for status, _ in results])
+        self.assertEqual('Batch requests cannot be nested', results[0][1]['details'])
+        self.assertEqual({'body': 'Body larger than 20 bytes'}, results[3][1]['details'])
+        self.assertEqual([], _ItemHandler.started)
+
+    @gen_test
+    async def test_timed_out_item_keeps_its_slot(self):
+        self._app.config.batch.concurrency = 1
+
+        results = await self._batch({'path': '/stuck'}, {'path': '/items/1'})
+
+        self.assertEqual([504, 504], [status for status, _ in results])
+        # stuck request still runs, so the next one never got the only slot
+        self.assertEqual([], _ItemHandler.started)
+        self.assertFalse(_StuckHandler.finished.is_set())
+        _StuckHandler.released.set()
+        await _StuckHandler.finished.wait()
+
+        results = await self._batch({'path': '/items/1'}, {'path': '/items/2'})
+        self.assertEqual([200, 200], [status for status, _ in results])
+
+    @gen_test
+    async def test_response_size_limit(self):
+        results = await self._batch({'path': '/large'}, {'path': '/large?chunks=2'})
+
+        self.assertEqual(200, results[0][0])
+        self.assertEqual('x' * 60, results[0][1])
+        self.assertEqual(413, results[1][0])
+        self.assertEqual('Response larger than 100 bytes', results[1][1]['details'])
+
+    def test_connection_stops_buffering_over_limit(self):
+        connection = _BatchConnection(None, 100)
+
+        connection.write(b'x' * 60)
+        self.assertEqual([b'x' * 60], connection.chunks)
+        connection.write(b'x' * 60)
+        connection.write(b'x')
+
+        self.assertEqual([], connection.chunks)
+        self.assertEqual(121, connection.size)
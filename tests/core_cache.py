@@ -0,0 +1,100 @@
+# coding=utf-8
+import asyncio
+import time
+import unittest
+
+from maio.core.cache import LRUCache, ResponseCache
+from maio.core.mongo import MongoRepository
+
+
+class _FakeCollection:
+    def insert_one(self, data):
+        return data
+
+    def update_one(self, filtering, changes, upsert=False):
+        return changes
+
+
+class _Repo(MongoRepository):
+    __collection__ = 'items'
+
+    @classmethod
+    def getCollection(cls):
+        return _FakeCollection()
+
+
+class LRUCacheUnitTests(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_entries=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(1, cache.evictions)
+
+    def test_size_limit(self):
+        cache = LRUCache(max_entries=10, ttl=None, max_size=10)
+        cache.set('a', b'12345', size=5)
+        cache.set('b', b'12345', size=5)
+        cache.set('c', b'123', size=3)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(8, cache.size)
+        self.assertFalse(cache.set('d', b'x' * 11, size=11))
+        self.assertEqual(2, len(cache))
+
+    def test_ttl(self):
+        cache = LRUCache(max_entries=10, ttl=0.01)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=10)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(2, cache.get('b'))
+        self.assertEqual(1, cache.expirations)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+
+class ResponseCacheUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache({'ttl': 60, 'max_entries': 10})
+        asyncio.run(self.cache.start())
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_invalidation_on_write(self):
+        self.cache.set('k1', b'{"a": 1}', ('items',))
+        self.cache.set('k2', b'{"b": 1}', ('other',))
+
+        _Repo.updateOne({'_id': 1}, {'a': 2})
+
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(b'{"b": 1}', self.cache.get('k2'))
+        self.assertEqual(1, self.cache.stats['invalidations'])
+
+    def test_stale_generation_is_not_stored(self):
+        generation = self.cache.generation(('items',))
+        _Repo.updateOne({'_id': 1}, {'a': 3})
+        self.cache.set('k1', b'{}', ('items',), generation=generation)
+
+        self.assertIsNone(self.cache.get('k1'))
+
+    def test_stopped_cache_is_not_invalidated(self):
+        replaced = ResponseCache({'ttl': 60})
+        asyncio.run(replaced.start())
+        asyncio.run(replaced.stop())
+        replaced.set('k1', b'{}', ('items',))
+
+        _Repo.updateOne({'_id': 1}, {'a': 4})
+
+        self.assertEqual(b'{}', replaced.get('k1'))
+        self.assertEqual(0, replaced.stats['invalidations'])
+        self.assertEqual(1, self.cache.generation(('items',))[0])
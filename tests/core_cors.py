@@ -0,0 +1,32 @@
+# coding=utf-8
+import unittest
+
+from maio.core.cors import OriginMatcher
+
+
+class OriginMatcherUnitTests(unittest.TestCase):
+
+    def test_exact_origins(self):
+        matcher = OriginMatcher(['https://app.example.com', 'http://localhost:3000'])
+
+        self.assertEqual('http://localhost:3000', matcher.resolve('http://localhost:3000'))
+        self.assertEqual('https://app.example.com', matcher.resolve('https://evil.com'))
+        self.assertFalse(matcher.match('https://app.example.com.evil.com'))
+
+    def test_wildcard_subdomains(self):
+        matcher = OriginMatcher(['https://*.example.com', 'https://example.com'])
+
+        self.assertTrue(matcher.match('https://app.example.com'))
+        self.assertTrue(matcher.match('https://a.b.example.com'))
+        self.assertTrue(matcher.match('https://example.com'))
+        self.assertFalse(matcher.match('http://app.example.com'))
+        self.assertFalse(matcher.match('https://app.example.com.evil.com'))
+        self.assertFalse(matcher.match('https://appexample.com'))
+        # wildcard entries are never sent as header value
+        self.assertEqual('https://example.com', matcher.resolve('https://evil.com'))
+
+    def test_no_fallback(self):
+        matcher = OriginMatcher(['https://*.example.com'])
+
+        self.assertIsNone(matcher.resolve('https://evil.com'))
+        self.assertIsNone(OriginMatcher([]).resolve('https://evil.com'))
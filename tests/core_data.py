@@ -1,7 +1,10 @@
 # coding=utf-8
+import subprocess
+import sys
 import unittest
+from os import path
 
-from maio.core.data import VO
+from maio.core.data import VO, json_default
 
 
 class DataUnitTests(unittest.TestCase):
@@ -90,3 +93,15 @@ class DataUnitTests(unittest.TestCase):
         self.assertTrue(obj1 == data1)
         self.assertFalse(obj1 == obj3)
         self.assertFalse(obj1 == data2)
+
+    def test_bson_imported_lazily(self):
+        code = 'import sys, maio.core.data, maio.core.helpers; print("bson" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True,
+                                cwd=path.dirname(path.dirname(path.abspath(__file__)))).stdout
+        self.assertEqual(output.strip(), b'False')
+
+    def test_json_default_object_id(self):
+        from maio.core.data import ObjectId
+        oid = ObjectId()
+
+        self.assertEqual(json_default(oid), str(oid))
@@ -0,0 +1,89 @@
+# coding=utf-8
+import unittest
+
+from maio.core.di import DI, REQUEST, SINGLETON, TRANSIENT
+
+
+class _Service:
+    created = 0
+
+    def __init__(self) -> None:
+        _Service.created += 1
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class DIUnitTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        DI.clear()
+        _Service.created = 0
+
+    def tearDown(self) -> None:
+        DI.clear()
+
+    def test_default_lifetimes(self):
+        instance = _Service()
+        DI.add('instance', instance)
+        DI.add('factory', _Service)
+
+        self.assertIs(instance, DI.get('instance'))
+        self.assertIsNot(DI.get('factory'), DI.get('factory'))
+
+    def test_singleton_factory(self):
+        DI.add(_Service, _Service, SINGLETON)
+
+        self.assertIs(DI.get(_Service), DI.get(_Service))
+        self.assertIs(DI.get(_Service), DI.get(str(_Service)))
+        self.assertEqual(1, _Service.created)
+
+    def test_replace(self):
+        DI.add('service', _Service, SINGLETON)
+        first = DI.get('service')
+        DI.replace('service', _Service, TRANSIENT)
+
+        self.assertIsNot(first, DI.get('service'))
+        self.assertIsNot(DI.get('service'), DI.get('service'))
+        with self.assertRaises(NameError):
+            DI.add('service', _Service)
+        with self.assertRaises(ValueError):
+            DI.replace('service', _Service, 'scoped')
+
+    def test_missing_binding(self):
+        with self.assertRaises(RuntimeError):
+            DI.get('missing')
+
+    def test_request_scope(self):
+        DI.add('service', _Service, REQUEST)
+        with self.assertRaises(RuntimeError):
+            DI.get('service')
+
+        scope = DI.beginRequestScope()
+        instance = DI.get('service')
+        self.assertIs(instance, DI.get('service'))
+        DI.endRequestScope(scope)
+        self.assertTrue(instance.closed)
+
+        scope = DI.beginRequestScope()
+        self.assertIsNot(instance, DI.get('service'))
+        DI.endRequestScope(scope)
+        self.assertEqual(2, _Service.created)
+
+    def test_closed_request_scope(self):
+        DI.add('service', _Service, REQUEST)
+        scope = DI.beginRequestScope()
+        DI.get('service')
+        DI.endRequestScope(scope)
+
+        # work spawned by the finished request must not create instances nobody closes
+        with self.assertRaises(RuntimeError):
+            scope.get('service', _Service)
+        self.assertEqual(1, _Service.created)
+
+    def test_no_scope_without_request_bindings(self):
+        DI.add('service', _Service, SINGLETON)
+
+        self.assertIsNone(DI.beginRequestScope())
+        DI.endRequestScope(None)
@@ -0,0 +1,74 @@
+# coding=utf-8
+import json
+import unittest
+from datetime import date, datetime, timezone
+from uuid import uuid4
+
+from bson import ObjectId
+
+from maio.core.data import CustomJsonEncoder, VO
+from maio.core.encoders import BACKEND_AUTO, BACKEND_ORJSON, BACKEND_STDLIB, BACKEND_UJSON, get_json_backend, _create_backend
+
+
+class EncodersUnitTests(unittest.TestCase):
+    class TestVo(VO):
+        __slots__ = ('a', 'b')
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.a = None
+            self.b = None
+
+    def _payload(self):
+        vo = self.TestVo.from_dict({'a': uuid4(), 'b': datetime(2020, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)})
+        return {
+            'status': 'OK',
+            'data': [{
+                'uuid': uuid4(),
+                'oid': ObjectId(),
+                'day': date(2020, 2, 29),
+                'created': datetime(2020, 1, 2, 3, 4, 5, 678),
+                'tags': {'a'},
+                'raw': b'bytes',
+                'vo': vo,
+                'text': u'zażółć </script>',
+                1: 'int key',
+            }]
+        }
+
+    def _backends(self):
+        for name in (BACKEND_STDLIB, BACKEND_ORJSON, BACKEND_UJSON):
+            backend = _create_backend(name)
+            if backend is not None:
+                yield backend
+
+    def test_backends_match_custom_encoder(self):
+        payload = self._payload()
+        expected = json.loads(json.dumps(payload, cls=CustomJsonEncoder, ensure_ascii=False))
+
+        for backend in self._backends():
+            with self.subTest(backend=backend.name):
+                out = backend.dumps(payload)
+
+                self.assertIsInstance(out, bytes)
+                self.assertEqual(expected, json.loads(out.decode('utf-8')))
+
+    def test_backends_fallback_to_stdlib(self):
+        payload = {'big': 2 ** 70}
+
+        for backend in self._backends():
+            with self.subTest(backend=backend.name):
+                self.assertEqual(payload, json.loads(backend.dumps(payload)))
+
+    def test_backends_raise_on_unknown_type(self):
+        for backend in self._backends():
+            with self.subTest(backend=backend.name):
+                with self.assertRaises(TypeError):
+                    backend.dumps({'a': object()})
+
+    def test_get_backend(self):
+        self.assertEqual(BACKEND_STDLIB, get_json_backend(BACKEND_STDLIB).name)
+        self.assertIs(get_json_backend(BACKEND_AUTO), get_json_backend(BACKEND_AUTO))
+        self.assertIsNotNone(get_json_backend(BACKEND_UJSON))
+        with self.assertRaises(ValueError):
+            get_json_backend('unknown')
@@ -0,0 +1,51 @@
+# coding=utf-8
+from tornado.testing import AsyncHTTPTestCase
+
+from maio.core.handlers import RestHandler
+from maio.core.routing import url
+from tests.web import build_app, build_config
+
+
+class _Handler(RestHandler):
+    async def get(self, size):
+        self.return_ok({'data': 'x' * int(size)})
+
+
+class _PlainHandler(_Handler):
+    pass
+
+
+class ETagTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        config = build_config()
+        config.json.etag_min_size = 100
+        return build_app([url(r'/etag/(\d+)', _Handler, {'etag': True}), url(r'/plain/(\d+)', _PlainHandler)], config)
+
+    def test_not_modified(self):
+        etag = self.fetch('/etag/200').headers['Etag']
+        response = self.fetch('/etag/200', headers={'If-None-Match': etag})
+
+        self.assertEqual(304, response.code)
+        self.assertEqual(b'', response.body)
+        self.assertEqual(304, self.fetch('/etag/200', headers={'If-None-Match': 'W/%s, "other"' % etag}).code)
+
+    def test_mismatch(self):
+        etag = self.fetch('/etag/200').headers['Etag']
+        response = self.fetch('/etag/201', headers={'If-None-Match': etag})
+
+        self.assertEqual(200, response.code)
+        self.assertNotEqual(etag, response.headers['Etag'])
+        self.assertIn(b'xxx', response.body)
+
+    def test_body_below_min_size(self):
+        response = self.fetch('/etag/10', headers={'If-None-Match': '*'})
+
+        self.assertEqual(200, response.code)
+        self.assertNotIn('Etag', response.headers)
+
+    def test_route_without_etag(self):
+        response = self.fetch('/plain/200', headers={'If-None-Match': '*'})
+
+        self.assertEqual(200, response.code)
+        self.assertNotIn('Etag', response.headers)
@@ -0,0 +1,232 @@
+# coding=utf-8
+from datetime import datetime
+
+from gridfs import NoFile
+from tornado import httputil
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.di import DI
+from maio.core.handlers import ReqUtils, RestHandler
+from maio.core.mongo import AbstractMongoConnection, MongoFileStorage
+from maio.core.routing import url
+from tests.web import build_app
+
+_DATA = bytes(range(100))
+_MD5 = '0123456789abcdef'
+_UPLOAD_DATE = datetime(2020, 1, 2, 3, 4, 5, 600000)
+
+
+class _GridOut:
+    """Synchronous GridOut look-alike recording reads"""
+    content_type = 'application/octet-stream'
+    metadata = {}
+    upload_date = _UPLOAD_DATE
+    chunk_size = 255 * 1024
+
+    def __init__(self, data: bytes = _DATA, md5: str = _MD5) -> None:
+        self.data = data
+        self.md5 = md5
+        self.length = len(data)
+        self.position = 0
+        self.reads = []
+
+    def seek(self, position):
+        self.position = position
+
+    def read(self, size):
+        self.reads.append(size)
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+class _FileHandler(RestHandler):
+    files = []
+
+    async def get(self):
+        fp = _GridOut()
+        _FileHandler.files.append(fp)
+        chunk_size = int(self.get_argument('chunk_size', '1024'))
+        await ReqUtils.send_file(self, fp, chunk_size=chunk_size, read_ahead=self.get_bool_param('read_ahead', False))
+
+    async def head(self):
+        await self.get()
+
+
+class _Bucket:
+    def __init__(self) -> None:
+        # file id -> (data, md5)
+        self.files = {}
+
+    def open_download_stream(self, file_id):
+        if file_id not in self.files:
+            raise NoFile(file_id)
+        return _GridOut(*self.files[file_id])
+
+
+class _Connection:
+    """Files collection and bucket, changed by tests the way another worker would, without invalidating the cache"""
+
+    def __init__(self) -> None:
+        self.bucket = _Bucket()
+        self.reads = 0
+
+    def getDatabase(self):
+        return {'fs.files': self}
+
+    def find_one(self, filtering):
+        self.reads += 1
+        file_id = filtering['_id']
+        if file_id not in self.bucket.files:
+            return None
+        data, md5 = self.bucket.files[file_id]
+        return {'_id': file_id, 'filename': 'a.bin', 'length': len(data), 'chunkSize': 255 * 1024, 'uploadDate': _UPLOAD_DATE, 'md5': md5}
+
+    def getFileBucket(self, bucket_name):
+        return self.bucket
+
+    def verify_bucket(self, bucket):
+        return True
+
+
+class _Storage(MongoFileStorage):
+    pass
+
+
+class _StoredFileHandler(RestHandler):
+    async def get(self, file_id):
+        await ReqUtils.send_stored_file(self, _Storage, file_id)
+
+
+class SendFileTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        _FileHandler.files = []
+        return build_app([url(r'/file', _FileHandler)])
+
+    def test_whole_file(self):
+        response = self.fetch('/file')
+
+        self.assertEqual(200, response.code)
+        self.assertEqual(_DATA, response.body)
+        self.assertEqual('bytes', response.headers['Accept-Ranges'])
+        self.assertEqual('"%s"' % _MD5, response.headers['Etag'])
+        self.assertEqual('100', response.headers['Content-Length'])
+        self.assertEqual(httputil.format_timestamp(_UPLOAD_DATE.replace(microsecond=0)), response.headers['Last-Modified'])
+
+    def test_range(self):
+        response = self.fetch('/file', headers={'Range': 'bytes=10-19'})
+
+        self.assertEqual(206, response.code)
+        self.assertEqual(_DATA[10:20], response.body)
+        self.assertEqual('bytes 10-19/100', response.headers['Content-Range'])
+        self.assertEqual([10], _FileHandler.files[-1].reads)
+
+    def test_suffix_and_open_ranges(self):
+        response = self.fetch('/file', headers={'Range': 'bytes=-10'})
+        self.assertEqual(206, response.code)
+        self.assertEqual(_DATA[-10:], response.body)
+
+        response = self.fetch('/file', headers={'Range': 'bytes=95-'})
+        self.assertEqual(206, response.code)
+        self.assertEqual('bytes 95-99/100', response.headers['Content-Range'])
+
+        response = self.fetch('/file', headers={'Range': 'bytes=0-500'})
+        self.assertEqual(200, response.code)
+        self.assertEqual(_DATA, response.body)
+
+    def test_not_satisfiable_range(self):
+        response = self.fetch('/file', headers={'Range': 'bytes=100-'})
+
+        self.assertEqual(416, response.code)
+        self.assertEqual('bytes */100', response.headers['Content-Range'])
+        self.assertEqual(b'', response.body)
+        self.assertEqual([], _FileHandler.files[-1].reads)
+
+    def test_invalid_range_is_ignored(self):
+        response = self.fetch('/file', headers={'Range': 'items=1-2'})
+
+        self.assertEqual(200, response.code)
+        self.assertEqual(_DATA, response.body)
+
+    def test_if_range(self):
+        last_modified = httputil.format_timestamp(_UPLOAD_DATE.replace(microsecond=0))
+
+        self.assertEqual(206, self.fetch('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"%s"' % _MD5}).code)
+        self.assertEqual(206, self.fetch('/file', headers={'Range': 'bytes=0-9', 'If-Range': last_modified}).code)
+        # changed file is sent whole
+        response = self.fetch('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+        self.assertEqual(200, response.code)
+        self.assertEqual(_DATA, response.body)
+        self.assertEqual(200, self.fetch('/file', headers={'Range': 'bytes=0-9', 'If-Range': 'W/"%s"' % _MD5}).code)
+
+    def test_conditional_request(self):
+        response = self.fetch('/file', headers={'If-None-Match': '"%s"' % _MD5})
+
+        self.assertEqual(304, response.code)
+        self.assertEqual([], _FileHandler.files[-1].reads)
+
+    def test_head(self):
+        response = self.fetch('/file', method='HEAD')
+
+        self.assertEqual(200, response.code)
+        self.assertEqual('100', response.headers['Content-Length'])
+        self.assertEqual([], _FileHandler.files[-1].reads)
+
+    @gen_test
+    async def test_chunked_streaming(self):
+        for read_ahead in ('0', '1'):
+            chunks = []
+            await self.http_client.fetch(self.get_url(f'/file?chunk_size=16&read_ahead={read_ahead}'), headers={'Range': 'bytes=4-'},
+                                         streaming_callback=chunks.append)
+
+            self.assertEqual(_DATA[4:], b''.join(chunks))
+            self.assertGreater(len(chunks), 1)
+            # never reads beyond the requested range
+            self.assertEqual([16] * 6, _FileHandler.files[-1].reads)
+
+
+class SendStoredFileTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        app = build_app([url(r'/stored/(.*)', _StoredFileHandler)])
+        self.connection = _Connection()
+        self.connection.bucket.files['a'] = (_DATA, _MD5)
+        DI.add(AbstractMongoConnection.getDIKey(), self.connection)
+        _Storage.__bucket__ = None
+        _Storage._file_meta_cache = None
+        return app
+
+    def tearDown(self):
+        super().tearDown()
+        DI.clear()
+
+    def test_conditional_request_uses_cached_meta(self):
+        self.assertEqual(_DATA, self.fetch('/stored/a').body)
+        self.assertEqual(304, self.fetch('/stored/a', headers={'If-None-Match': '"%s"' % _MD5}).code)
+        self.assertEqual(1, self.connection.reads)
+
+    def test_file_replaced_by_other_worker(self):
+        self.fetch('/stored/a')
+        self.connection.bucket.files['a'] = (b'replaced', 'fedcba9876543210')
+
+        response = self.fetch('/stored/a', headers={'Range': 'bytes=0-49'})
+
+        # range of the cached length is ignored, the whole new file is sent
+        self.assertEqual(200, response.code)
+        self.assertEqual(b'replaced', response.body)
+        self.assertEqual('8', response.headers['Content-Length'])
+        self.assertEqual('"fedcba9876543210"', response.headers['Etag'])
+        self.assertNotIn('Content-Range', response.headers)
+        # stale metadata was dropped
+        self.assertEqual(304, self.fetch('/stored/a', headers={'If-None-Match': '"fedcba9876543210"'}).code)
+        self.assertEqual(2, self.connection.reads)
+
+    def test_file_deleted_by_other_worker(self):
+        self.fetch('/stored/a')
+        del self.connection.bucket.files['a']
+
+        self.assertEqual(404, self.fetch('/stored/a').code)
+        # metadata was dropped, next request does not open the file
+        self.assertEqual(404, self.fetch('/stored/a').code)
+        self.assertEqual(2, self.connection.reads)
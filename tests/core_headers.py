@@ -0,0 +1,73 @@
+# coding=utf-8
+import time
+from email.utils import parsedate_to_datetime
+
+from tornado.testing import AsyncHTTPTestCase
+
+from maio.core.handlers import RestHandler
+from maio.core.routing import url
+from tests.web import build_app, build_config
+
+
+class _Handler(RestHandler):
+    async def get(self):
+        self.return_ok()
+
+
+class _UploadHandler(RestHandler):
+    CORS_HEADERS = ['X-Upload-Id']
+
+    async def post(self):
+        self.return_ok()
+
+
+class DefaultHeadersTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return build_app([url(r'/h', _Handler), url(r'/upload', _UploadHandler)])
+
+    def test_default_headers(self):
+        headers = self.fetch('/h').headers
+
+        self.assertEqual('Rest API Server', headers['Server'])
+        self.assertEqual('application/json; charset=UTF-8', headers['Content-Type'])
+        self.assertEqual('*', headers['Access-Control-Allow-Origin'])
+        self.assertEqual('X-Lang, Content-Type, Authorization, X-Filename, x-requested-with', headers['Access-Control-Allow-Headers'])
+        self.assertEqual('86400', headers['Access-Control-Max-Age'])
+        self.assertEqual('true', headers['Access-Control-Allow-Credentials'])
+
+    def test_headers_of_handler_class(self):
+        headers = self.fetch('/upload', method='OPTIONS').headers
+
+        self.assertTrue(headers['Access-Control-Allow-Headers'].endswith(', X-Upload-Id'))
+        self.assertEqual('POST', headers['Access-Control-Allow-Methods'])
+        # template of the class is copied, headers set while handling a request do not leak into the next one
+        self.assertNotIn('Access-Control-Allow-Methods', self.fetch('/h').headers)
+
+    def test_date_header(self):
+        before = int(time.time())
+        date = parsedate_to_datetime(self.fetch('/h').headers['Date']).timestamp()
+
+        self.assertTrue(before <= date <= time.time(), date)
+        self.assertEqual(1, len(self.fetch('/h').headers.get_list('Date')))
+
+
+class OriginHeadersTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        config = build_config()
+        config.cors.allowed_origin = ['https://example.com', 'https://*.example.org']
+        return build_app([url(r'/h', _Handler)], config)
+
+    def test_allowed_origin(self):
+        headers = self.fetch('/h', headers={'Origin': 'https://app.example.org'}).headers
+
+        self.assertEqual('https://app.example.org', headers['Access-Control-Allow-Origin'])
+
+    def test_not_allowed_origin(self):
+        headers = self.fetch('/h', headers={'Origin': 'https://evil.com'}).headers
+
+        self.assertEqual('https://example.com', headers['Access-Control-Allow-Origin'])
+
+    def test_no_origin(self):
+        self.assertNotIn('Access-Control-Allow-Origin', self.fetch('/h').headers)
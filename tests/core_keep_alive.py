@@ -0,0 +1,59 @@
+# coding=utf-8
+import asyncio
+
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.handlers import RestHandler
+from maio.core.restapi import RestHTTPServer
+from maio.core.routing import url
+from tests.web import build_app
+
+_REQUEST = b'GET /ping HTTP/1.1\r\nHost: localhost\r\n\r\n'
+
+
+class _PingHandler(RestHandler):
+    async def get(self):
+        self.return_ok({'pong': True})
+
+
+class MaxRequestsPerConnectionTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return build_app([url(r'/ping', _PingHandler)])
+
+    def get_http_server(self):
+        return RestHTTPServer(self._app, max_requests_per_connection=3, **self.get_httpserver_options())
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        headers = dict(line.split(b': ', 1) for line in head.split(b'\r\n')[1:-2])
+        await reader.readexactly(int(headers[b'Content-Length']))
+        return headers
+
+    @gen_test
+    async def test_last_request_closes_connection(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.get_http_port())
+        try:
+            responses = []
+            for _ in range(3):
+                writer.write(_REQUEST)
+                responses.append(await self._read_response(reader))
+
+            self.assertEqual([None, None, b'close'], [headers.get(b'Connection') for headers in responses])
+            # server closed the connection after the third response
+            self.assertEqual(b'', await reader.read())
+        finally:
+            writer.close()
+
+    @gen_test
+    async def test_counted_per_connection(self):
+        connections = [await asyncio.open_connection('127.0.0.1', self.get_http_port()) for _ in range(2)]
+        try:
+            for _ in range(2):
+                for reader, writer in connections:
+                    writer.write(_REQUEST)
+                    self.assertIsNone((await self._read_response(reader)).get(b'Connection'))
+        finally:
+            for _, writer in connections:
+                writer.close()
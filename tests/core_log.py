@@ -0,0 +1,105 @@
+# coding=utf-8
+import logging
+import os
+import queue
+import tempfile
+import time
+import unittest
+
+from maio.core.log import QUEUE_DROP_NEW, QUEUE_DROP_OLDEST, _BoundedQueueHandler, _QueuedLogging, get_logging_stats
+
+
+def _record(msg):
+    return logging.LogRecord('app.main.sub', logging.INFO, __file__, 1, msg, None, None)
+
+
+def _read(file_path):
+    with open(file_path) as fp:
+        return fp.read()
+
+
+class _RacingQueue(queue.Queue):
+    """Queue whose slot freed by get_nowait is taken by another process before the handler puts its record"""
+
+    def get_nowait(self):
+        record = super().get_nowait()
+        if record.msg != 'other worker':
+            super().put_nowait(_record('other worker'))
+        return record
+
+
+class QueuedLoggingUnitTests(unittest.TestCase):
+
+    def _fill(self, policy):
+        log_queue = queue.Queue(2)
+        handler = _BoundedQueueHandler(log_queue, 'app.main', policy)
+        for msg in ('a', 'b', 'c'):
+            handler.handle(_record(msg))
+        return [log_queue.get_nowait() for _ in range(log_queue.qsize())]
+
+    def test_drop_new(self):
+        dropped = get_logging_stats()['dropped']
+        records = self._fill(QUEUE_DROP_NEW)
+
+        self.assertEqual(['a', 'b'], [r.msg for r in records])
+        self.assertEqual(dropped + 1, get_logging_stats()['dropped'])
+        self.assertEqual('app.main', records[0].log_route)
+
+    def test_drop_oldest(self):
+        dropped = get_logging_stats()['dropped']
+        records = self._fill(QUEUE_DROP_OLDEST)
+
+        self.assertEqual(['b', 'c'], [r.msg for r in records])
+        self.assertEqual(dropped + 1, get_logging_stats()['dropped'])
+
+    def test_drop_oldest_when_freed_slot_is_taken(self):
+        log_queue = _RacingQueue(1)
+        log_queue.put_nowait(_record('a'))
+        handler = _BoundedQueueHandler(log_queue, 'app.main', QUEUE_DROP_OLDEST)
+        stats = get_logging_stats()
+
+        handler.handle(_record('b'))
+
+        self.assertEqual(['other worker'], [log_queue.get_nowait().msg])
+        self.assertEqual(stats['dropped'] + 2, get_logging_stats()['dropped'])
+        self.assertEqual(stats['enqueued'], get_logging_stats()['enqueued'])
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is required')
+class QueuedLoggingForkTests(unittest.TestCase):
+
+    def test_records_of_forked_worker_are_written(self):
+        pipeline = _QueuedLogging(100)
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'fork.log')
+            file_handler = logging.FileHandler(log_path)
+            pipeline.routes['maio.test.fork'] = [file_handler]
+            logger = logging.getLogger('maio.test.fork')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(_BoundedQueueHandler(pipeline.queue, 'maio.test.fork', QUEUE_DROP_NEW))
+            try:
+                # starts feeder thread of the queue in this process, like tornado logging "Starting processes" before fork
+                logger.info('parent')
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        for position in range(20):
+                            logger.info('child %d', position)
+                        # what multiprocessing finalizers do when the worker exits
+                        pipeline.queue.close()
+                        pipeline.queue.join_thread()
+                    finally:
+                        os._exit(0)
+                os.waitpid(pid, 0)
+
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline and 'child 19' not in _read(log_path):
+                    time.sleep(0.01)
+                pipeline.stop()
+                lines = _read(log_path).splitlines()
+            finally:
+                logger.handlers.clear()
+                file_handler.close()
+
+        self.assertEqual(['parent'] + [f'child {position}' for position in range(20)], lines)
@@ -0,0 +1,60 @@
+# coding=utf-8
+import os
+import tempfile
+import unittest
+
+from maio.core.metrics import MetricsRegistry, merge_snapshots, render_text
+
+
+class MetricsUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter('requests_total', 'Requests', ('route', 'status'))
+        self.in_flight = self.registry.gauge('in_flight', 'In flight', ('route',))
+        self.latency = self.registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+
+    def test_render(self):
+        self.requests.inc(('Users', 200))
+        self.requests.inc(('Users', 200))
+        self.latency.observe(('Users',), 0.1)
+        self.latency.observe(('Users',), 5)
+
+        text = render_text(self.registry.snapshot())
+
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{route="Users",status="200"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="Users",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="Users",le="1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="Users",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_sum{route="Users"} 5.1', text)
+        self.assertIn('latency_seconds_count{route="Users"} 2', text)
+
+    def test_register_type_conflict(self):
+        self.assertIs(self.requests, self.registry.counter('requests_total', 'Requests', ('route', 'status')))
+        with self.assertRaises(ValueError):
+            self.registry.gauge('requests_total', 'Requests')
+
+    def test_merge_skips_gauges_of_dead_workers(self):
+        self.requests.inc(('Users', 200))
+        self.in_flight.inc(('Users',))
+        self.latency.observe(('Users',), 0.5)
+        snapshot = self.registry.snapshot()
+
+        # pid which surely does not exist anymore
+        merged = merge_snapshots([{'pid': os.getpid(), 'metrics': snapshot}, {'pid': 2 ** 22 + 1, 'metrics': snapshot}])
+
+        self.assertEqual([(('Users', 200), 2)], merged['requests_total']['values'])
+        self.assertEqual([(('Users',), 1)], merged['in_flight']['values'])
+        self.assertEqual([(('Users',), [0, 2, 0, 1.0])], merged['latency_seconds']['values'])
+
+    def test_collect_from_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.registry.set_directory(directory, clean=True)
+            self.requests.inc(('Users', 200))
+            self.registry.write_snapshot()
+            self.requests.inc(('Users', 200))
+
+            text = self.registry.render()
+
+        self.assertIn('requests_total{route="Users",status="200"} 2', text)
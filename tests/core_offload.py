@@ -0,0 +1,142 @@
+# coding=utf-8
+import asyncio
+import json
+import os
+import threading
+import unittest
+from unittest import mock
+
+from tornado.testing import AsyncHTTPTestCase
+
+from maio.core import handlers
+from maio.core.data import VO
+from maio.core.exceptions import HTTP400BadRequestError
+from maio.core.handlers import ReqUtils, RestHandler, _estimate_size
+from maio.core.offload import has_process_pool, run_in_process, run_in_thread, shutdown_pools, start_pools
+from maio.core.routing import url
+from maio.core.validators import Val
+from tests.web import build_app, build_config
+
+
+def _where():
+    return os.getpid(), threading.current_thread().name
+
+
+def _run(offload):
+    async def call():
+        return await offload(_where)
+    return asyncio.run(call())
+
+
+class _Upload(VO):
+    __slots__ = ('name', 'image', 'size')
+
+
+class OffloadUnitTests(unittest.TestCase):
+
+    def tearDown(self):
+        shutdown_pools()
+
+    def test_thread_pool(self):
+        start_pools(threads=1)
+
+        pid, thread = _run(run_in_thread)
+
+        self.assertEqual(os.getpid(), pid)
+        self.assertTrue(thread.startswith('offload'))
+        self.assertFalse(has_process_pool())
+
+    def test_process_falls_back_to_thread(self):
+        start_pools(threads=1)
+
+        self.assertEqual(os.getpid(), _run(run_in_process)[0])
+
+    def test_process_pool(self):
+        start_pools(threads=1, processes=1)
+
+        self.assertTrue(has_process_pool())
+        self.assertNotEqual(os.getpid(), _run(run_in_process)[0])
+        shutdown_pools()
+        self.assertFalse(has_process_pool())
+
+    def test_estimate_size(self):
+        upload = _Upload.from_dict({'name': 'a.png', 'image': b'x' * 100, 'size': 100})
+
+        self.assertEqual(105, _estimate_size(upload))
+        self.assertEqual(105, _estimate_size(upload.to_dict()))
+        self.assertEqual(0, _estimate_size({'nested': {'image': 'x' * 100}}))
+        self.assertEqual(0, _estimate_size(['x' * 100]))
+
+
+class _EchoHandler(RestHandler):
+    async def post(self):
+        self.return_ok({'body': self.request.json_body})
+
+
+class _ValidateHandler(RestHandler):
+    async def post(self):
+        self.return_ok(await ReqUtils.validate_async(self.request.json_body, {'image': [Val.required()]}))
+
+
+class OffloadRequestTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        start_pools(threads=1, processes=1)
+        config = build_config()
+        config.offload.json_threshold = 20
+        config.offload.validate_threshold = 20
+        return build_app([url(r'/echo', _EchoHandler), url(r'/validate', _ValidateHandler)], config)
+
+    def tearDown(self):
+        super().tearDown()
+        shutdown_pools()
+
+    def _post(self, path, body):
+        return self.fetch(path, method='POST', body=body, headers={'Content-Type': 'application/json'})
+
+    def test_large_body_is_parsed_in_process(self):
+        with mock.patch.object(handlers, 'run_in_process', wraps=run_in_process) as offloaded:
+            small = self._post('/echo', '{"a": 1}')
+            large = self._post('/echo', json.dumps({'image': 'x' * 100}))
+            invalid = self._post('/echo', '{"image": "' + 'x' * 100)
+
+        self.assertEqual({'a': 1}, json.loads(small.body)['body'])
+        self.assertEqual({'image': 'x' * 100}, json.loads(large.body)['body'])
+        self.assertEqual(400, invalid.code)
+        self.assertEqual(2, offloaded.call_count)
+
+    def test_large_body_without_process_pool(self):
+        start_pools(threads=1)
+
+        with mock.patch.object(handlers, 'run_in_thread', wraps=run_in_thread) as offloaded:
+            response = self._post('/echo', json.dumps({'image': 'x' * 100}))
+
+        # a thread would not help, json.loads keeps the GIL
+        self.assertEqual(200, response.code)
+        self.assertEqual(0, offloaded.call_count)
+
+    def test_validate_async(self):
+        with mock.patch.object(handlers, 'run_in_thread', wraps=run_in_thread) as offloaded:
+            small = self._post('/validate', '{"image": "x"}')
+            large = self._post('/validate', json.dumps({'image': 'x' * 100}))
+            invalid = self._post('/validate', json.dumps({'name': 'x' * 100}))
+
+        self.assertEqual(200, small.code)
+        self.assertEqual('x' * 100, json.loads(large.body)['image'])
+        self.assertEqual(400, invalid.code)
+        self.assertEqual(2, offloaded.call_count)
+
+
+class ValidateAsyncUnitTests(unittest.TestCase):
+
+    def test_explicit_size(self):
+        config = build_config()
+        config.offload.validate_threshold = 20
+        build_app([], config)
+
+        with mock.patch.object(handlers, 'run_in_thread', wraps=run_in_thread) as offloaded:
+            self.assertEqual({'image': 'x'}, asyncio.run(ReqUtils.validate_async({'image': 'x'}, {'image': []}, size=100)))
+            with self.assertRaises(HTTP400BadRequestError):
+                asyncio.run(ReqUtils.validate_async({}, {'image': [Val.required()]}, size=100))
+
+        self.assertEqual(2, offloaded.call_count)
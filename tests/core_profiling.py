@@ -0,0 +1,46 @@
+# coding=utf-8
+import glob
+import os
+import pstats
+import tempfile
+import unittest
+
+from maio.core.profiling import RequestProfiler
+
+
+class RequestProfilerUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = RequestProfiler()
+        self.profiler.enabled = True
+        self.profiler.sample_rate = 1.0
+
+    def test_single_request_at_a_time(self):
+        profile = self.profiler.start_request()
+
+        self.assertIsNotNone(profile)
+        self.assertIsNone(self.profiler.start_request())
+        self.profiler.finish_request('Users', profile)
+        self.assertIsNotNone(self.profiler.start_request())
+
+    def test_disabled_or_not_sampled(self):
+        self.profiler.sample_rate = 0
+        self.assertIsNone(self.profiler.start_request())
+        self.profiler.sample_rate = 1.0
+        self.profiler.enabled = False
+        self.assertIsNone(self.profiler.start_request())
+
+    def test_dump_per_route(self):
+        for _ in range(2):
+            profile = self.profiler.start_request()
+            sorted(range(1000), key=str)
+            self.profiler.finish_request('Users', profile)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.profiler.directory = directory
+            self.profiler.dump()
+            files = glob.glob(os.path.join(directory, 'profile.Users.*.pstats'))
+
+            self.assertEqual(1, len(files))
+            self.assertTrue(any('sorted' in func[2] for func in pstats.Stats(files[0]).stats))
+        self.assertEqual({'Users': 2}, self.profiler.requests)
@@ -0,0 +1,111 @@
+# coding=utf-8
+import os
+import unittest
+
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.handlers import RestHandler
+from maio.core.ratelimit import RateLimit, SharedBucketTable
+from maio.core.routing import url
+from tests.web import build_app
+
+
+class SharedBucketTableUnitTests(unittest.TestCase):
+
+    def test_burst_and_refill(self):
+        table = SharedBucketTable(64, 4, 2)
+
+        self.assertEqual([0, 0, 0], [table.consume(b'a', 1, 3, now=10) for _ in range(3)])
+        self.assertAlmostEqual(1.0, table.consume(b'a', 1, 3, now=10))
+        self.assertAlmostEqual(0.5, table.consume(b'a', 1, 3, now=10.5))
+        self.assertEqual(0, table.consume(b'a', 1, 3, now=11))
+        # other keys have own buckets
+        self.assertEqual(0, table.consume(b'b', 1, 3, now=11))
+
+    def test_refill_is_capped_by_burst(self):
+        table = SharedBucketTable(64, 4, 2)
+
+        table.consume(b'a', 10, 2, now=0)
+        self.assertEqual([0, 0], [table.consume(b'a', 10, 2, now=100) for _ in range(2)])
+        self.assertGreater(table.consume(b'a', 10, 2, now=100), 0)
+
+    def test_stalest_bucket_evicted(self):
+        table = SharedBucketTable(2, 2, 1)
+
+        for ts, key in enumerate((b'a', b'b', b'c')):
+            table.consume(key, 1, 1, now=ts)
+        self.assertEqual(1, table.evictions)
+        # bucket of 'a' was replaced, it starts full again
+        self.assertEqual(0, table.consume(b'a', 1, 1, now=3))
+        self.assertEqual(2, table.evictions)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_buckets_shared_with_forked_process(self):
+        table = SharedBucketTable(64, 4, 2)
+
+        pid = os.fork()
+        if pid == 0:
+            code = 0 if table.consume(b'a', 0.001, 1) == 0 else 1
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(0, os.WEXITSTATUS(status))
+        self.assertGreater(table.consume(b'a', 0.001, 1), 0)
+
+
+class RateLimitUnitTests(unittest.TestCase):
+
+    def test_check(self):
+        limit = RateLimit.from_param('login', {'rate': 0.5, 'burst': 1}, SharedBucketTable(64, 4, 2))
+
+        self.assertEqual(0, limit.check('10.0.0.1'))
+        self.assertEqual(2, limit.check('10.0.0.1'))
+        self.assertEqual(0, limit.check('10.0.0.2'))
+
+    def test_from_param(self):
+        table = SharedBucketTable(64, 4, 2)
+
+        self.assertEqual((5.0, 5.0), (RateLimit.from_param('r', 5, table).rate, RateLimit.from_param('r', 5, table).burst))
+        self.assertEqual(10.0, RateLimit.from_param('r', (5, 10), table).burst)
+        self.assertEqual(1.0, RateLimit.from_param('r', {'rate': 0.1}, table).burst)
+        with self.assertRaises(ValueError):
+            RateLimit('r', 0)
+
+
+class _LoginHandler(RestHandler):
+    entered = None
+    released = None
+
+    async def get(self):
+        _LoginHandler.entered.set()
+        await _LoginHandler.released.wait()
+        self.return_ok()
+
+
+class RouteRateLimitTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        _LoginHandler.entered = Event()
+        _LoginHandler.released = Event()
+        return build_app([url(r'/login', _LoginHandler, {'rate_limit': {'rate': 0.01, 'burst': 2}, 'max_in_flight': 1})])
+
+    def tearDown(self):
+        _LoginHandler.released.set()
+        super().tearDown()
+
+    @gen_test
+    async def test_preflight_passes_limits(self):
+        first = self.http_client.fetch(self.get_url('/login'))
+        await _LoginHandler.entered.wait()
+
+        # only slot of the route is taken, preflights still get their answer without spending tokens
+        preflights = [await self.http_client.fetch(self.get_url('/login'), method='OPTIONS') for _ in range(3)]
+        _LoginHandler.released.set()
+
+        self.assertEqual([204] * 3, [response.code for response in preflights])
+        self.assertEqual(200, (await first).code)
+        self.assertEqual(200, (await self.http_client.fetch(self.get_url('/login'))).code)
+        limited = await self.http_client.fetch(self.get_url('/login'), raise_error=False)
+        self.assertEqual(429, limited.code)
+        self.assertIn('Retry-After', limited.headers)
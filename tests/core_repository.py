@@ -0,0 +1,112 @@
+# coding=utf-8
+import asyncio
+import unittest
+
+from maio.core.di import DI
+from maio.core.metrics import MONGO_OPERATION_DURATION, REGISTRY as METRICS
+from maio.core.mongo import AbstractMongoConnection, MongoRepository
+from maio.core.timing import STAGE_MONGO, start_timer, stop_timer
+
+
+class _Cursor:
+    def __init__(self, rows) -> None:
+        self._rows = list(rows)
+
+    def limit(self, limit):
+        self._rows = self._rows[:limit]
+        return self
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class _AsyncCursor(_Cursor):
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self._rows:
+            await asyncio.sleep(0)
+            yield row
+
+    async def to_list(self, length):
+        return self._rows[:length] if length else list(self._rows)
+
+
+class _Collection:
+    cursor_class = _Cursor
+
+    def find(self, filtering, projection=None):
+        return self.cursor_class({'_id': i} for i in range(3))
+
+    def aggregate(self, pipeline, **kwargs):
+        return self.cursor_class([{'count': 3}])
+
+
+class _Connection:
+    @classmethod
+    def find(cls, clazz, cursor):
+        return cursor
+
+
+class _Repo(MongoRepository):
+    __collection__ = 'items'
+    collection = _Collection()
+
+    @classmethod
+    def getCollection(cls):
+        return cls.collection
+
+
+def _observations(operation: str) -> int:
+    entry = MONGO_OPERATION_DURATION.get(('items', operation))
+    return sum(entry[:-1]) if entry else 0
+
+
+class CursorTimingUnitTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        DI.clear()
+        DI.add(AbstractMongoConnection.getDIKey(), _Connection())
+        MONGO_OPERATION_DURATION.clear()
+        _Collection.cursor_class = _Cursor
+        self._metrics_enabled = METRICS.enabled
+
+    def tearDown(self) -> None:
+        METRICS.enabled = self._metrics_enabled
+        stop_timer()
+        DI.clear()
+
+    def test_find_is_observed_once_exhausted(self):
+        METRICS.enabled = True
+        cursor = _Repo.find({}, limit=2)
+        rows = iter(cursor)
+
+        self.assertEqual({'_id': 0}, next(rows))
+        self.assertEqual(0, _observations('find'))
+        self.assertEqual([{'_id': 1}], list(rows))
+        self.assertEqual(1, _observations('find'))
+
+    def test_request_timer(self):
+        METRICS.enabled = False
+        timer = start_timer()
+
+        self.assertEqual([{'count': 3}], list(_Repo.aggregate([])))
+        self.assertGreater(timer.stages[STAGE_MONGO], 0)
+        self.assertEqual(0, _observations('aggregate'))
+
+    def test_async_cursor(self):
+        METRICS.enabled = True
+        _Collection.cursor_class = _AsyncCursor
+
+        async def consume():
+            return [row async for row in _Repo.find({})], await _Repo.aggregate([]).to_list(None)
+
+        self.assertEqual(([{'_id': 0}, {'_id': 1}, {'_id': 2}], [{'count': 3}]), asyncio.run(consume()))
+        self.assertEqual(1, _observations('find'))
+        self.assertEqual(1, _observations('aggregate'))
+
+    def test_not_wrapped_without_metrics_and_timer(self):
+        METRICS.enabled = False
+
+        self.assertIsInstance(_Repo.find({}), _Cursor)
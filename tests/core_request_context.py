@@ -0,0 +1,157 @@
+# coding=utf-8
+import json
+
+from tornado import gen
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.background import BackgroundExecutor
+from maio.core.di import DI, REQUEST
+from maio.core.handlers import ReqUtils, RestHandler
+from maio.core.routing import url
+from maio.core.timing import current_timer, timed_stage
+from tests.web import build_app, build_config
+
+_EVENTS = {}
+# (timer, session) seen by background tasks
+_SEEN = []
+
+
+class _SlowTimerHandler(RestHandler):
+    async def get(self):
+        _EVENTS['slow started'].set()
+        await _EVENTS['fast finished'].wait()
+        with timed_stage('slow'):
+            pass
+        self.return_ok({'own': current_timer() is self.timer, 'stages': sorted(self.timer.stages)})
+
+
+class _FastTimerHandler(RestHandler):
+    async def get(self):
+        await _EVENTS['slow started'].wait()
+        with timed_stage('fast'):
+            pass
+        self.return_ok({'own': current_timer() is self.timer, 'stages': sorted(self.timer.stages)})
+
+    def on_finish(self):
+        _EVENTS['fast finished'].set()
+
+
+class _Session:
+    created = []
+
+    def __init__(self) -> None:
+        self.closed = False
+        _Session.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+class _SlowScopeHandler(RestHandler):
+    async def get(self):
+        session = DI.get('session')
+        _EVENTS['slow started'].set()
+        await _EVENTS['fast finished'].wait()
+        self.return_ok({'same': DI.get('session') is session, 'session': _Session.created.index(session)})
+
+
+class _FastScopeHandler(RestHandler):
+    async def get(self):
+        await _EVENTS['slow started'].wait()
+        self.return_ok({'same': True, 'session': _Session.created.index(DI.get('session'))})
+
+    def on_finish(self):
+        _EVENTS['fast finished'].set()
+
+
+class OverlappingRequestsTests(AsyncHTTPTestCase):
+    """Values kept in context variables for the request being handled must not leak into requests handled meanwhile"""
+
+    def get_app(self):
+        config = build_config()
+        config.web.server_timing = True
+        app = build_app([url(r'/timer/slow', _SlowTimerHandler), url(r'/timer/fast', _FastTimerHandler), url(r'/scope/slow', _SlowScopeHandler),
+                         url(r'/scope/fast', _FastScopeHandler)], config)
+        DI.add('session', _Session, REQUEST)
+        return app
+
+    def setUp(self):
+        super().setUp()
+        _EVENTS.update({'slow started': Event(), 'fast finished': Event()})
+        _Session.created = []
+
+    async def _fetch_overlapping(self, slow: str, fast: str):
+        responses = await gen.multi([self.http_client.fetch(self.get_url(slow)), self.http_client.fetch(self.get_url(fast))])
+        return [json.loads(response.body) for response in responses]
+
+    @gen_test
+    async def test_request_timer(self):
+        slow, fast = await self._fetch_overlapping('/timer/slow', '/timer/fast')
+
+        self.assertEqual((True, ['slow']), (slow['own'], slow['stages']))
+        self.assertEqual((True, ['fast']), (fast['own'], fast['stages']))
+
+    @gen_test
+    async def test_request_scope(self):
+        slow, fast = await self._fetch_overlapping('/scope/slow', '/scope/fast')
+
+        # request handled meanwhile got its own instance, the slow one kept its instance across the wait
+        self.assertEqual((True, 0), (slow['same'], slow['session']))
+        self.assertEqual(1, fast['session'])
+        self.assertEqual([True, True], [session.closed for session in _Session.created])
+
+
+async def _background_task():
+    await _EVENTS['released'].wait()
+    try:
+        session = DI.get('session')
+    except RuntimeError:
+        session = None
+    _SEEN.append((current_timer(), session))
+
+
+class _SubmitHandler(RestHandler):
+    async def get(self):
+        DI.get('session')
+        ReqUtils.run_in_background(_background_task)
+        self.return_ok()
+
+
+class BackgroundTaskContextTests(AsyncHTTPTestCase):
+    """Background tasks outlive requests submitting them, they must not see the DI scope nor the timer of any of them"""
+    executor = {'concurrency': 1}
+
+    def get_app(self):
+        app = build_app([url(r'/submit', _SubmitHandler)])
+        DI.add('session', _Session, REQUEST)
+        if self.executor is not None:
+            app.registerService(BackgroundExecutor, self.executor)
+            app._initServices(self.io_loop)
+        return app
+
+    def setUp(self):
+        super().setUp()
+        _EVENTS['released'] = Event()
+        _Session.created = []
+        _SEEN.clear()
+
+    def tearDown(self):
+        _EVENTS['released'].set()
+        super().tearDown()
+
+    @gen_test
+    async def test_tasks_of_finished_requests(self):
+        for _ in range(2):
+            await self.http_client.fetch(self.get_url('/submit'))
+        _EVENTS['released'].set()
+        while len(_SEEN) < 2:
+            await gen.sleep(0.001)
+
+        self.assertEqual([(None, None)] * 2, _SEEN)
+        self.assertEqual([True, True], [session.closed for session in _Session.created])
+
+
+class SpawnedTaskContextTests(BackgroundTaskContextTests):
+    # run_in_background spawns the task on the IOLoop without BackgroundExecutor
+    executor = None
@@ -0,0 +1,125 @@
+# coding=utf-8
+import json
+
+from tornado import gen
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.di import ApiService
+from maio.core.handlers import ReadinessHandler
+from maio.core.routing import url
+from tests.web import build_app, build_config
+
+# (service name, hook) -> 'fail', 'slow' or 'down'
+_BEHAVIOUR = {}
+_CALLS = []
+_RELEASED = {}
+
+
+class _Service(ApiService):
+    name = None
+
+    @classmethod
+    def getDIKey(cls):
+        return cls.name
+
+    async def _call(self, hook: str) -> bool:
+        name = self.name or type(self).__name__
+        _CALLS.append((name, hook))
+        behaviour = _BEHAVIOUR.get((name, hook))
+        if behaviour == 'fail':
+            raise RuntimeError(f'{hook} failed')
+        if behaviour == 'slow':
+            await _RELEASED['event'].wait()
+        return behaviour != 'down'
+
+    async def start(self):
+        await self._call('start')
+
+    async def warmup(self):
+        await self._call('warmup')
+
+    async def health(self):
+        return await self._call('health')
+
+
+class _First:
+    class Service(_Service):
+        name = 'first'
+
+
+class _Second:
+    # same class name as the first one, told apart by its DI key
+    class Service(_Service):
+        name = 'second'
+
+
+class _UnkeyedService(_Service):
+    pass
+
+
+class ServicesLifecycleTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        _BEHAVIOUR.clear()
+        _CALLS.clear()
+        _RELEASED['event'] = Event()
+        config = build_config()
+        config.web.health_timeout = 0.1
+        app = build_app([url(r'/ready', ReadinessHandler)], config)
+        for service in (_First.Service, _Second.Service, _UnkeyedService):
+            app.registerService(service)
+        app._initServices(self.io_loop)
+        return app
+
+    def tearDown(self):
+        # lets services still waiting finish before the loop is closed
+        _RELEASED['event'].set()
+        self.io_loop.run_sync(lambda: gen.sleep(0))
+        super().tearDown()
+
+    async def _readiness(self):
+        response = await self.http_client.fetch(self.get_url('/ready'), raise_error=False)
+        return response.code, json.loads(response.body).get('details')
+
+    def _called(self, hook: str):
+        return sorted(name for name, called in _CALLS if called == hook)
+
+    @gen_test
+    async def test_ready_once_started(self):
+        self.assertEqual((503, {'ready': False}), await self._readiness())
+
+        self.assertTrue(await self._app.start_services(1))
+
+        self.assertEqual(['_UnkeyedService', 'first', 'second'], self._called('warmup'))
+        self.assertEqual((200, None), await self._readiness())
+
+    @gen_test
+    async def test_failing_and_slow_start(self):
+        _BEHAVIOUR.update({('first', 'start'): 'fail', ('_UnkeyedService', 'start'): 'slow'})
+
+        self.assertFalse(await self._app.start_services(0.1))
+
+        errors = {'first': "RuntimeError('start failed')", 'tests.core_services._UnkeyedService': 'start timed out after 0.1s'}
+        self.assertEqual(errors, await self._app.check_services(1))
+        # only services which started are warmed up, whatever their class is named
+        self.assertEqual(['second'], self._called('warmup'))
+        self.assertEqual((503, {'ready': True, 'services': errors}), await self._readiness())
+
+    @gen_test
+    async def test_health_timeout(self):
+        self.assertTrue(await self._app.start_services(1))
+        _BEHAVIOUR.update({('first', 'health'): 'down', ('second', 'health'): 'slow'})
+
+        code, details = await self._readiness()
+
+        self.assertEqual(503, code)
+        self.assertEqual({'first': 'unhealthy', 'second': 'health timed out after 0.1s'}, details['services'])
+        self.assertEqual(['_UnkeyedService', 'first', 'second'], self._called('health'))
+
+    @gen_test
+    async def test_not_ready_while_stopping(self):
+        self.assertTrue(await self._app.start_services(1))
+        self.assertTrue(await self._app.drain(1))
+
+        self.assertEqual((503, {'ready': False}), await self._readiness())
@@ -0,0 +1,105 @@
+# coding=utf-8
+import signal
+
+from tornado.locks import Event
+from tornado.testing import AsyncHTTPTestCase
+
+from maio.core.di import ApiService
+from maio.core.handlers import RestHandler
+from maio.core.restapi import RestHTTPServer, sig_handler
+from maio.core.routing import url
+from tests.web import build_app
+
+_EVENTS = []
+
+
+class _SlowHandler(RestHandler):
+    entered = None
+    released = None
+
+    async def get(self):
+        _SlowHandler.entered.set()
+        await _SlowHandler.released.wait()
+        self.return_ok()
+
+    def on_finish(self):
+        _EVENTS.append('request finished')
+
+
+class _FirstService(ApiService):
+    def close(self):
+        _EVENTS.append('first stopped')
+
+
+class _FailingService(ApiService):
+    async def stop(self):
+        _EVENTS.append('failing stopped')
+        raise RuntimeError('stop failed')
+
+
+class _LastService(ApiService):
+    async def stop(self):
+        _EVENTS.append('last stopped')
+
+
+class ShutdownTests(AsyncHTTPTestCase):
+    """SIGTERM handler runs in the IOLoop of the test, it stops the loop once services are stopped"""
+
+    def get_app(self):
+        _EVENTS.clear()
+        _SlowHandler.entered = Event()
+        _SlowHandler.released = Event()
+        app = build_app([url(r'/slow', _SlowHandler)])
+        for service in (_FirstService, _FailingService, _LastService):
+            app.registerService(service)
+        app._initServices(self.io_loop)
+        return app
+
+    def get_http_server(self):
+        return RestHTTPServer(self._app, **self.get_httpserver_options())
+
+    def tearDown(self):
+        _SlowHandler.released.set()
+        super().tearDown()
+
+    def _shutdown_during_request(self):
+        response = self.http_client.fetch(self.get_url('/slow'))
+        self.io_loop.run_sync(_SlowHandler.entered.wait)
+
+        sig_handler(self.http_server, signal.SIGTERM, None)
+        timeout = self.io_loop.call_later(5, self.io_loop.stop)
+        self.io_loop.start()
+        self.io_loop.remove_timeout(timeout)
+        return response
+
+    def test_in_flight_request_outlives_sigterm(self):
+        self.io_loop.call_later(0.05, _SlowHandler.released.set)
+
+        response = self._shutdown_during_request()
+
+        # services are stopped in reverse order of registration once the request finished, failed stop does not skip the rest
+        self.assertEqual(['request finished', 'last stopped', 'failing stopped', 'first stopped'], _EVENTS)
+        self.assertTrue(self._app.stopping)
+        self.assertEqual(0, self._app.active_requests)
+        self.assertEqual(200, self.io_loop.run_sync(lambda: response).code)
+
+    def test_drain_timeout(self):
+        self._app.config.web.shutdown_timeout = 0.05
+
+        response = self._shutdown_during_request()
+
+        self.assertEqual(['last stopped', 'failing stopped', 'first stopped'], _EVENTS)
+        self.assertEqual(1, self._app.active_requests)
+        _SlowHandler.released.set()
+        self.assertEqual(200, self.io_loop.run_sync(lambda: response).code)
+        self.assertEqual(0, self._app.active_requests)
+
+    def test_drain_returns_once_requests_finished(self):
+        response = self.http_client.fetch(self.get_url('/slow'))
+        self.io_loop.run_sync(_SlowHandler.entered.wait)
+
+        self.assertFalse(self.io_loop.run_sync(lambda: self._app.drain(0.05)))
+        self.assertFalse(self._app.ready)
+        self.io_loop.call_later(0.05, _SlowHandler.released.set)
+        self.assertTrue(self.io_loop.run_sync(lambda: self._app.drain(5)))
+        self.assertEqual(200, self.io_loop.run_sync(lambda: response).code)
@@ -0,0 +1,113 @@
+# coding=utf-8
+import asyncio
+import unittest
+from datetime import datetime
+
+from maio.core.di import DI
+from maio.core.mongo import AbstractMongoConnection, FileMeta, MongoFileStorage
+
+
+class _FilesCollection:
+    def __init__(self) -> None:
+        self.documents = {}
+        self.reads = 0
+
+    def find_one(self, filtering):
+        self.reads += 1
+        return self.documents.get(filtering['_id'])
+
+
+class _Bucket:
+    def __init__(self, files: _FilesCollection, pending=None) -> None:
+        self._files = files
+        # future returned by operations, like motor does, None for synchronous pymongo behaviour
+        self.pending = pending
+
+    def _store(self, file_id, filename, source, metadata):
+        data = source.read()
+        self._files.documents[file_id] = {'_id': file_id, 'filename': filename, 'length': len(data), 'chunkSize': 255 * 1024,
+                                          'uploadDate': datetime(2020, 1, 1), 'md5': '%08x' % hash(data), 'metadata': metadata}
+
+    def upload_from_stream_with_id(self, file_id, filename, source, metadata=None):
+        self._store(file_id, filename, source, metadata)
+        return self.pending
+
+    def delete(self, file_id):
+        self._files.documents.pop(file_id, None)
+        return self.pending
+
+
+class _Connection:
+    def __init__(self) -> None:
+        self.files = _FilesCollection()
+        self.bucket = _Bucket(self.files)
+
+    def getDatabase(self):
+        return {'fs.files': self.files}
+
+    def getFileBucket(self, bucket_name):
+        return self.bucket
+
+    def verify_bucket(self, bucket):
+        return True
+
+
+class _Storage(MongoFileStorage):
+    pass
+
+
+class FileMetaCacheUnitTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        DI.clear()
+        self.connection = _Connection()
+        DI.add(AbstractMongoConnection.getDIKey(), self.connection)
+        _Storage.__bucket__ = None
+        _Storage._file_meta_cache = None
+
+    def tearDown(self) -> None:
+        DI.clear()
+
+    def test_meta_is_cached(self):
+        _Storage.uploadFile('a.txt', b'first', 'text/plain', file_id='a')
+
+        meta = asyncio.run(_Storage.getFileMeta('a'))
+
+        self.assertEqual(FileMeta('a', 'a.txt', 5, 255 * 1024, datetime(2020, 1, 1), '%08x' % hash(b'first'), 'text/plain'), meta)
+        self.assertIs(meta, asyncio.run(_Storage.getFileMeta('a')))
+        self.assertEqual(1, self.connection.files.reads)
+        self.assertIsNone(asyncio.run(_Storage.getFileMeta('missing')))
+
+    def test_upload_with_id_invalidates(self):
+        _Storage.uploadFile('a.txt', b'first', 'text/plain', file_id='a')
+        first = asyncio.run(_Storage.getFileMeta('a'))
+
+        _Storage.uploadFile('a.txt', b'second version', 'text/plain', file_id='a')
+        second = asyncio.run(_Storage.getFileMeta('a'))
+
+        self.assertEqual(14, second.length)
+        self.assertNotEqual(first.md5, second.md5)
+
+    def test_delete_invalidates(self):
+        _Storage.uploadFile('a.txt', b'first', 'text/plain', file_id='a')
+        asyncio.run(_Storage.getFileMeta('a'))
+
+        _Storage.delete('a')
+
+        self.assertIsNone(asyncio.run(_Storage.getFileMeta('a')))
+
+    def test_meta_cached_during_async_delete_is_dropped(self):
+        _Storage.uploadFile('a.txt', b'first', 'text/plain', file_id='a')
+
+        async def scenario():
+            self.connection.bucket.pending = asyncio.get_running_loop().create_future()
+            _Storage.delete('a')
+            # request served while delete is running caches what the database still returned
+            self.connection.files.documents['a'] = {'_id': 'a', 'length': 5, 'uploadDate': datetime(2020, 1, 1)}
+            self.assertIsNotNone(await _Storage.getFileMeta('a'))
+            del self.connection.files.documents['a']
+            self.connection.bucket.pending.set_result(None)
+            await asyncio.sleep(0)
+            return await _Storage.getFileMeta('a')
+
+        self.assertIsNone(asyncio.run(scenario()))
@@ -0,0 +1,83 @@
+# coding=utf-8
+import json
+
+from tornado.httpclient import HTTPClientError
+from tornado.simple_httpclient import HTTPStreamClosedError
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from maio.core.commands import AbstractListCommand, ListBuilder
+from maio.core.handlers import RestHandler
+from maio.core.routing import url
+from tests.web import build_app
+
+_ROWS = [{'id': i, 'name': 'row %d </script>' % i} for i in range(100)]
+
+
+async def _cursor(rows):
+    for row in rows:
+        yield row
+
+
+def _failing_rows(count):
+    yield from _ROWS[:count]
+    raise ValueError('cursor lost')
+
+
+class _ListCommand(AbstractListCommand):
+    @classmethod
+    def get_cursor(cls, filtering, sort, limit, offset, projection):
+        return _cursor(_ROWS)
+
+
+class _StreamHandler(RestHandler):
+    async def get(self):
+        await self.return_stream(_ROWS, total_count=len(_ROWS), chunk_size=256)
+
+
+class _ListHandler(RestHandler):
+    async def get(self):
+        builder = ListBuilder(_ListCommand).with_serialization(lambda row: {'name': row['name']}, row_as_dict=True)
+        await self.return_stream(builder.stream_data())
+
+
+class _FailingHandler(RestHandler):
+    async def get(self, count):
+        await self.return_stream(_failing_rows(int(count)), chunk_size=256)
+
+
+class StreamTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return build_app([url(r'/stream', _StreamHandler), url(r'/list', _ListHandler), url(r'/failing/(\d+)', _FailingHandler)])
+
+    @gen_test
+    async def test_stream_in_chunks(self):
+        chunks = []
+        response = await self.http_client.fetch(self.get_url('/stream'), streaming_callback=chunks.append)
+
+        self.assertEqual('chunked', response.headers.get('Transfer-Encoding'))
+        self.assertGreater(len(chunks), 1)
+        body = json.loads(b''.join(chunks))
+        self.assertEqual({'status': 'OK', 'totalCount': 100, 'data': _ROWS}, body)
+        self.assertNotIn(b'</', b''.join(chunks))
+
+    def test_list_builder_stream(self):
+        response = self.fetch('/list')
+
+        self.assertEqual(200, response.code)
+        self.assertEqual([{'name': row['name']} for row in _ROWS], json.loads(response.body)['data'])
+
+    def test_error_before_first_chunk(self):
+        response = self.fetch('/failing/1')
+
+        self.assertEqual(500, response.code)
+        self.assertEqual('ERROR', json.loads(response.body)['status'])
+
+    @gen_test
+    async def test_error_after_first_chunk_aborts_response(self):
+        chunks = []
+        with self.assertRaises((HTTPStreamClosedError, HTTPClientError)):
+            await self.http_client.fetch(self.get_url('/failing/50'), streaming_callback=chunks.append)
+
+        self.assertTrue(chunks)
+        self.assertFalse(b''.join(chunks).endswith(b']}'))
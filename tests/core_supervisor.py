@@ -0,0 +1,110 @@
+# coding=utf-8
+import logging
+import os
+import select
+import signal
+import time
+import unittest
+
+from maio.core import supervisor
+from maio.core.log import LOG_MAIN
+from maio.core.supervisor import Supervisor, respawn_delay
+
+
+class SupervisorUnitTests(unittest.TestCase):
+
+    def test_respawn_delay(self):
+        self.assertEqual([0.0, 0.5, 1.0, 2.0, 4.0, 5.0, 5.0], [respawn_delay(failures, 0.5, 5) for failures in range(7)])
+
+    def test_notify_ready(self):
+        read_fd, write_fd = os.pipe()
+        supervisor._READY_FD = write_fd
+        try:
+            supervisor.notify_ready()
+            supervisor.notify_ready()
+            self.assertEqual(b'1', os.read(read_fd, 2))
+            # write end was closed after the first notification
+            self.assertEqual(b'', os.read(read_fd, 1))
+        finally:
+            os.close(read_fd)
+            supervisor._READY_FD = None
+
+
+def _worker(events_fd: int, worker_id: int) -> None:
+    def on_term(sig, frame):
+        os.write(events_fd, b'stop %d %d\n' % (worker_id, os.getpid()))
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, on_term)
+    os.write(events_fd, b'start %d %d\n' % (worker_id, os.getpid()))
+    # replacement is not ready right away, previous worker has to keep running meanwhile
+    time.sleep(0.2)
+    os.write(events_fd, b'ready %d %d\n' % (worker_id, os.getpid()))
+    supervisor.notify_ready()
+    while True:
+        time.sleep(1)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is required')
+class SupervisorProcessTests(unittest.TestCase):
+    """Supervisor runs in a forked process, its workers report start, ready and stop through a pipe"""
+
+    def setUp(self):
+        read_fd, events_fd = os.pipe()
+        self._pid = os.fork()
+        if self._pid == 0:
+            code = 1
+            try:
+                os.close(read_fd)
+                logging.getLogger(LOG_MAIN).setLevel(logging.CRITICAL)
+                worker_id = Supervisor(2, backoff=0.05, max_backoff=1, stop_timeout=5).run()
+                _worker(events_fd, worker_id)
+            except SystemExit as e:
+                code = e.code or 0
+            finally:
+                os._exit(code)
+        os.close(events_fd)
+        self._events = os.fdopen(read_fd, 'rb')
+        self.addCleanup(self._stop)
+        self._workers = {}
+        for kind, worker_id, pid in self._wait(4):
+            if kind == 'start':
+                self._workers[worker_id] = pid
+        self.assertEqual([0, 1], sorted(self._workers))
+
+    def _stop(self):
+        os.kill(self._pid, signal.SIGTERM)
+        _, status = os.waitpid(self._pid, 0)
+        self._events.close()
+        self.assertEqual(0, status)
+
+    def _wait(self, count: int, timeout: float = 5):
+        events = []
+        deadline = time.monotonic() + timeout
+        while len(events) < count:
+            if not select.select([self._events], [], [], max(0.0, deadline - time.monotonic()))[0]:
+                self.fail(f'Expected {count} events, got {events}')
+            kind, worker_id, pid = self._events.readline().split()
+            events.append((kind.decode(), int(worker_id), int(pid)))
+        return events
+
+    def test_crashed_worker_is_respawned(self):
+        os.kill(self._workers[0], signal.SIGKILL)
+
+        (started, worker_id, pid), ready = self._wait(2)
+
+        self.assertEqual(('start', 0), (started, worker_id))
+        self.assertNotIn(pid, self._workers.values())
+        self.assertEqual(('ready', 0, pid), ready)
+        # the other worker was left running
+        os.kill(self._workers[1], 0)
+
+    def test_reload_replaces_workers_one_at_a_time(self):
+        os.kill(self._pid, signal.SIGHUP)
+
+        events = self._wait(6)
+
+        self.assertEqual([('start', 0), ('ready', 0), ('stop', 0), ('start', 1), ('ready', 1), ('stop', 1)], [event[:2] for event in events])
+        # stopped workers are the previous ones, started are new
+        self.assertEqual([self._workers[0], self._workers[1]], [pid for kind, _, pid in events if kind == 'stop'])
+        self.assertFalse({pid for kind, _, pid in events if kind == 'start'} & set(self._workers.values()))
@@ -0,0 +1,33 @@
+# coding=utf-8
+import unittest
+
+from maio.core.timing import RequestTimer, current_timer, start_timer, stop_timer, timed_stage
+
+
+class RequestTimerUnitTests(unittest.TestCase):
+
+    def tearDown(self):
+        stop_timer()
+
+    def test_stages_are_summed(self):
+        timer = RequestTimer()
+        timer.add('mongo', 0.001)
+        timer.add('mongo', 0.002)
+        with timer.stage('encode'):
+            pass
+
+        self.assertAlmostEqual(0.003, timer.stages['mongo'])
+        self.assertIn('mongo;dur=3.00', timer.server_timing())
+        self.assertTrue(timer.server_timing().split(', ')[-1].startswith('total;dur='))
+        self.assertEqual(['mongo', 'encode'], list(timer.stages))
+
+    def test_timed_stage_uses_current_timer(self):
+        with timed_stage('validate') as timer:
+            self.assertIsNone(timer)
+
+        timer = start_timer()
+        with timed_stage('validate'):
+            pass
+
+        self.assertIs(timer, current_timer())
+        self.assertIn('validate', timer.stages)
@@ -0,0 +1,50 @@
+# coding=utf-8
+import random
+import re
+import unittest
+
+from maio.core.trie import RouteTrie, split_pattern
+
+
+class RouteTrieUnitTests(unittest.TestCase):
+
+    def test_split_pattern(self):
+        self.assertEqual(['', 'users'], split_pattern(r'/users$'))
+        self.assertEqual(['', 'users', '(?P<id>[^/]+)', 'items'], split_pattern(r'^/users/(?P<id>[^/]+)/items'))
+        self.assertEqual(['', 'v1', 'x'], split_pattern(r'/v1\/x'))
+        self.assertEqual(['', 'docs', r'([a-z.]+)\.json'], split_pattern(r'/docs/([a-z.]+)\.json'))
+
+    def test_split_pattern_spanning_segments(self):
+        for pattern in (r'/files/(.*)', r'/users/?', r'/a|/b', r'/x(/y)?', r'/c/[!-0]+', r'/c/[^a]+', r'/c/\S+', r'(?i)/a', r'.*', r'/a/[b'):
+            self.assertIsNone(split_pattern(pattern), pattern)
+
+    def test_candidates_keep_order(self):
+        trie = RouteTrie()
+        trie.add(r'/users/(?P<id>[0-9]+)', 'numeric')
+        trie.add(r'/users/me', 'me')
+        trie.add(r'/users/(?P<id>[^/]+)', 'any')
+        trie.add(r'/files/(.*)', 'files')
+        trie.add(None, 'not found')
+
+        self.assertEqual(['numeric', 'any', 'files', 'not found'], trie.candidates('/users/12'))
+        self.assertEqual(['me', 'any', 'files', 'not found'], trie.candidates('/users/me'))
+        self.assertEqual(['files', 'not found'], trie.candidates('/users/me/items'))
+        self.assertEqual(2, trie.fallback_count)
+        self.assertEqual(5, len(trie))
+
+    def test_same_match_as_regex_scan(self):
+        patterns = [r'/r{}'.format(i) for i in range(20)] + [r'/r{}/(?P<id>[^/]+)'.format(i) for i in range(20)] + \
+                   [r'/r{}/(\d+)/items'.format(i) for i in range(20)] + [r'/r1/(.*)', r'/r2/x/?', r'/(?P<a>\w+)/(?P<b>\w+)/(?P<c>\w+)']
+        rnd = random.Random(0)
+        rnd.shuffle(patterns)
+        regexes = [re.compile(pattern + '$') for pattern in patterns]
+        trie = RouteTrie()
+        for position, pattern in enumerate(patterns):
+            trie.add(pattern, position)
+
+        segments = ['r1', 'r2', 'r19', 'x', '12', 'items', '', 'a.b']
+        for _ in range(2000):
+            path = '/' + '/'.join(rnd.choice(segments) for _ in range(rnd.randint(1, 4)))
+            expected = next((position for position, regex in enumerate(regexes) if regex.match(path)), None)
+            found = next((position for position in trie.candidates(path) if regexes[position].match(path)), None)
+            self.assertEqual(expected, found, path)
@@ -0,0 +1,18 @@
+# coding=utf-8
+import tempfile
+
+from maio.core.configs import AppConfig
+from maio.core.di import DI
+from maio.core.restapi import RestAPIApp
+
+
+def build_config() -> AppConfig:
+    config = AppConfig(tempfile.gettempdir())
+    config.logging.output_console = False
+    config.tornado.security.xsrf_cookies = False
+    return config
+
+
+def build_app(routes, config: AppConfig = None) -> RestAPIApp:
+    DI.clear()
+    return RestAPIApp.build(config or build_config(), {r'/.*': routes}, [])